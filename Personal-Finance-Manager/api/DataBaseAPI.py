@@ -1,9 +1,391 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel
 from dataBase.FinanceDB import FinanceDB,FinanceService,Direction,SortField
+from dataBase.FinanceMetrics import FinanceMetrics
+from contextlib import asynccontextmanager
 from datetime import datetime
-router = APIRouter()
+from decimal import Decimal
+import base64
+import json
+import os
+# 資料庫在應用啟動時（lifespan）依環境變數開啟，匯入此模組不會連線或升級資料庫
+# 路由為同步 def，由 FastAPI 在 threadpool 中執行；AsyncFinanceService 只涵蓋部分功能，目前不在 API 中使用
+# FINANCE_DB_URL 預設為專案內的 dataBase/DB/finance.db（與目前工作目錄無關）
+DEFAULT_DB_URL = "sqlite:///" + os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dataBase", "DB", "finance.db")
+
+def open_finance_service() -> FinanceService:
+    """依環境變數建立整個應用共用的 FinanceService（一個 engine；每個請求透過 get_service 取得獨立 session）
+
+    FINANCE_DB_URL 可改為 PostgreSQL（postgresql+psycopg2://...），連線池以 FINANCE_POOL_SIZE / FINANCE_MAX_OVERFLOW 設定；
+    查詢量測為選用：FINANCE_METRICS=1 啟用，FINANCE_SLOW_QUERY_MS 設定慢查詢門檻；
+    報表可改讀唯讀來源：FINANCE_READ_REPLICA=wal 或 backup（副本最長存活秒數 FINANCE_REPLICA_MAX_AGE，只支援 SQLite）
+    """
+    finance_metrics = (
+        FinanceMetrics(slow_query_ms=float(os.environ.get("FINANCE_SLOW_QUERY_MS", "100")))
+        if os.environ.get("FINANCE_METRICS") == "1" else None
+    )
+    finance_db = FinanceDB(
+        db_url=os.environ.get("FINANCE_DB_URL", DEFAULT_DB_URL),
+        journal_mode="WAL",
+        busy_timeout=5000,
+        check_same_thread=False,
+        pool_size=int(os.environ["FINANCE_POOL_SIZE"]) if os.environ.get("FINANCE_POOL_SIZE") else None,
+        max_overflow=int(os.environ["FINANCE_MAX_OVERFLOW"]) if os.environ.get("FINANCE_MAX_OVERFLOW") else None,
+        metrics=finance_metrics,
+        read_replica=os.environ.get("FINANCE_READ_REPLICA") or None,
+        replica_max_age=float(os.environ.get("FINANCE_REPLICA_MAX_AGE", "5")),
+    )
+    return FinanceService(finance_db)
+
+@asynccontextmanager
+async def lifespan(app):
+    """應用啟動時開啟資料庫，關閉時釋放連線（include_router 會併入應用的 lifespan）"""
+    service = open_finance_service()
+    try:
+        yield {"finance_service": service}
+    finally:
+        service.close()
+
+router = APIRouter(lifespan=lifespan)
+
+def app_service(request: Request) -> FinanceService:
+    """FastAPI 依賴：整個應用共用的 FinanceService（快取統計、量測與串流回應使用）"""
+    return request.state.finance_service
+
+def get_service(shared: FinanceService = Depends(app_service)):
+    """FastAPI 依賴：每個請求一個工作單元"""
+    with shared.unit_of_work() as service:
+        yield service
+
+# 請求資料模型
+class CategoryIn(BaseModel):
+    name: str
+    default_type: Direction
+
+class CategoryUpdate(BaseModel):
+    name: str | None = None
+    default_type: Direction | None = None
+
+class LogIn(BaseModel):
+    category_name: str
+    amount: Decimal
+    actual_type: Direction | None = None
+    note: str | None = None
+    actuall_time: datetime | None = None
+
+class LogUpdate(BaseModel):
+    category_name: str | None = None
+    actual_type: Direction | None = None
+    amount: Decimal | None = None
+    note: str | None = None
+    timestamp: datetime | None = None
+
+class LogBatchUpdate(LogUpdate):
+    id: int
+
+class OpenItemIn(BaseModel):
+    category_name: str
+    direction: Direction
+    amount: Decimal
+    counterparty: str | None = None
+    note: str | None = None
+    actuall_time: datetime | None = None
+
+class OpenItemUpdate(BaseModel):
+    counterparty: str | None = None
+
+class SettlementIn(BaseModel):
+    settlement_log_id: int | None = None  # 既有的沖銷日誌；None 表示新增一筆
+    amount: Decimal | None = None
+    note: str | None = None
+    actuall_time: datetime | None = None
+    category_name: str | None = None
+
+# 過濾參數與游標
+def log_filters(
+    category_name: str | None = None,
+    direction: Direction | None = None,
+    min_amount: Decimal | None = None,
+    max_amount: Decimal | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    note_keyword: str | None = None,
+) -> dict:
+    """FastAPI 依賴：與 get_filtered_and_sorted_logs 相同的過濾參數"""
+    return {
+        "category_name": category_name,
+        "direction": direction,
+        "min_amount": min_amount,
+        "max_amount": max_amount,
+        "start_date": start_date,
+        "end_date": end_date,
+        "note_keyword": note_keyword,
+    }
+
+def encode_cursor(cursor: tuple | None, sort_by: SortField) -> str | None:
+    """將 keyset 游標 (排序值, id) 編碼為不透明字串"""
+    if cursor is None:
+        return None
+    value, log_id = cursor
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Direction):
+        value = value.value
+    raw = json.dumps([sort_by.value, value, log_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(token: str | None, sort_by: SortField) -> tuple | None:
+    """解析 encode_cursor 產生的字串"""
+    if not token:
+        return None
+    try:
+        field, value, log_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor 格式錯誤")
+    if field != sort_by.value:
+        raise HTTPException(status_code=400, detail="cursor 與 sort_by 不一致")
+    return FinanceService.log_cursor({sort_by.value: value, "id": log_id}, sort_by)
 
 @router.get("/")
 async def db_index():
     return {"message": 'This is data base api'}
 
+@router.get("/cache")
+def cache_stats(shared: FinanceService = Depends(app_service)):
+    """類別快取與查詢結果快取統計（整個應用共用）"""
+    return {
+        "categories": shared.category_cache_stats(),
+        "results": shared.result_cache_stats(),
+    }
+
+@router.get("/metrics")
+def metrics(format: str = Query("json", pattern="^(json|prometheus)$"), shared: FinanceService = Depends(app_service)):
+    """查詢量測：方法延遲、每次呼叫的語句數與慢查詢（需以 FINANCE_METRICS=1 啟動）"""
+    finance_metrics = shared.metrics
+    if finance_metrics is None:
+        raise HTTPException(status_code=404, detail="未啟用查詢量測（FINANCE_METRICS=1）")
+    if format == "prometheus":
+        return PlainTextResponse(finance_metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+    return finance_metrics.snapshot()
+
+@router.delete("/metrics", status_code=204)
+def reset_metrics(shared: FinanceService = Depends(app_service)):
+    """清除查詢量測統計"""
+    finance_metrics = shared.metrics
+    if finance_metrics is None:
+        raise HTTPException(status_code=404, detail="未啟用查詢量測（FINANCE_METRICS=1）")
+    finance_metrics.reset()
+
+# Category
+@router.get("/categories")
+def list_categories(service: FinanceService = Depends(get_service)):
+    return service.get_all_categories()
+
+@router.post("/categories", status_code=201)
+def create_category(body: CategoryIn, service: FinanceService = Depends(get_service)):
+    return service.add_category(body.name, body.default_type)
+
+@router.patch("/categories/{category_id}")
+def update_category(category_id: int, body: CategoryUpdate, service: FinanceService = Depends(get_service)):
+    cat = service.update_category(category_id, body.name, body.default_type)
+    if cat is None:
+        raise HTTPException(status_code=404, detail="找不到類別")
+    return cat
+
+@router.delete("/categories/{name}")
+def delete_category(name: str, service: FinanceService = Depends(get_service)):
+    if not service.delete_category(name):
+        raise HTTPException(status_code=404, detail="找不到類別")
+    return {"deleted": name}
+
+@router.post("/categories/{name}/merge")
+def merge_category(name: str, into: str = Query(..., description="目標類別名稱"), service: FinanceService = Depends(get_service)):
+    """把類別的日誌併入 into 並刪除此類別"""
+    result = service.merge_categories(name, into)
+    if result is None:
+        raise HTTPException(status_code=404, detail="找不到類別")
+    return result
+
+# Log
+@router.get("/logs")
+def list_logs(
+    filters: dict = Depends(log_filters),
+    sort_by: SortField = SortField.TIMESTAMP,
+    reverse: bool = True,
+    limit: int = Query(50, gt=0, le=1000),
+    cursor: str | None = None,
+    service: FinanceService = Depends(get_service),
+):
+    """keyset 分頁列表；回傳的 next_cursor 傳回 cursor 參數即可取得下一頁"""
+    page = service.get_logs_page(limit=limit, after=decode_cursor(cursor, sort_by), sort_by=sort_by, reverse=reverse, **filters)
+    return {"items": page["items"], "next_cursor": encode_cursor(page["next_after"], sort_by)}
+
+@router.get("/logs/stream")
+def stream_logs(
+    filters: dict = Depends(log_filters),
+    sort_by: SortField = SortField.TIMESTAMP,
+    reverse: bool = True,
+    shared: FinanceService = Depends(app_service),
+):
+    """以 NDJSON 串流回傳所有符合條件的日誌（不建立完整 JSON 本體）"""
+    def generate():
+        # 回應送出期間需要自己的工作單元，不能使用請求結束就關閉的依賴
+        with shared.unit_of_work() as service:
+            lines = []
+            for row in service.iter_logs(sort_by, reverse, **filters):
+                lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+                # 每次送出一批，減少 threadpool 往返
+                if len(lines) >= 500:
+                    yield "".join(lines)
+                    lines = []
+            if lines:
+                yield "".join(lines)
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/logs/search")
+def search_logs(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, gt=0, le=1000),
+    filters: dict = Depends(log_filters),
+    service: FinanceService = Depends(get_service),
+):
+    """全文搜尋備註；q 以空白分隔多個詞，每個詞為不分大小寫的子字串比對"""
+    return service.search_notes(q, limit, **filters)
+
+@router.get("/logs/balance")
+def running_balance(
+    filters: dict = Depends(log_filters),
+    limit: int | None = Query(None, gt=0),
+    service: FinanceService = Depends(get_service),
+):
+    """依時間升序列出日誌與累計餘額"""
+    return service.running_balance(limit=limit, **filters)
+
+@router.patch("/logs")
+def update_logs_where(body: LogUpdate, filters: dict = Depends(log_filters), service: FinanceService = Depends(get_service)):
+    """以過濾參數（query string）批次修改所有符合的日誌"""
+    return service.update_logs_where(filters, **body.model_dump(exclude_none=True))
+
+@router.delete("/logs")
+def delete_logs_where(filters: dict = Depends(log_filters), service: FinanceService = Depends(get_service)):
+    """以過濾參數（query string）批次刪除所有符合的日誌"""
+    return service.delete_logs_where(filters)
+
+@router.post("/logs", status_code=201)
+def create_log(body: LogIn, service: FinanceService = Depends(get_service)):
+    return service.add_log(body.category_name, body.amount, body.actual_type, body.note, body.actuall_time)
+
+@router.post("/logs/batch", status_code=201)
+def create_logs_batch(body: list[LogIn], service: FinanceService = Depends(get_service)):
+    return service.add_logs_bulk(item.model_dump() for item in body)
+
+@router.patch("/logs/batch")
+def update_logs_batch(body: list[LogBatchUpdate], service: FinanceService = Depends(get_service)):
+    return service.update_logs_bulk(item.model_dump() for item in body)
+
+@router.get("/logs/{log_id}")
+def get_log(log_id: int, service: FinanceService = Depends(get_service)):
+    log = service.get_log_by_id(log_id)
+    if log is None:
+        raise HTTPException(status_code=404, detail="找不到日誌")
+    return log
+
+@router.patch("/logs/{log_id}")
+def update_log(log_id: int, body: LogUpdate, service: FinanceService = Depends(get_service)):
+    log = service.update_log(log_id, body.category_name, body.actual_type, body.amount, body.note, body.timestamp)
+    if log is None:
+        raise HTTPException(status_code=404, detail="找不到日誌")
+    return log
+
+# 彙總
+@router.get("/totals")
+def get_totals(
+    group_by: str = Query("direction", pattern="^(direction|category|day|month|year)$"),
+    filters: dict = Depends(log_filters),
+    service: FinanceService = Depends(get_service),
+):
+    """各方向總金額；其他分組為淨額（收入 − 支出）"""
+    return service.get_totals(group_by, **filters)
+
+@router.get("/balance")
+def balance_at(at: datetime, service: FinanceService = Depends(get_service)):
+    """指定時間點（含）的淨餘額"""
+    return {"at": at, "balance": service.balance_at(at)}
+
+@router.get("/summary/{year}")
+def get_summary(
+    year: int,
+    granularity: str = Query("month", pattern="^(month|year)$"),
+    service: FinanceService = Depends(get_service),
+):
+    return service.period_summary(year, granularity)
+
+# 應收應付
+@router.post("/open-items", status_code=201)
+def create_open_item(body: OpenItemIn, service: FinanceService = Depends(get_service)):
+    return service.add_open_item(body.category_name, body.direction, body.amount, body.counterparty, body.note, body.actuall_time)
+
+@router.get("/open-items")
+def list_open_items(
+    as_of: datetime | None = None,
+    direction: Direction | None = None,
+    counterparty: str | None = None,
+    category_name: str | None = None,
+    limit: int | None = Query(None, gt=0),
+    service: FinanceService = Depends(get_service),
+):
+    """指定時間點（預設目前）的未結項目"""
+    return service.open_items(as_of, direction, counterparty, category_name, limit)
+
+@router.get("/open-items/aging")
+def open_items_aging(
+    as_of: datetime | None = None,
+    buckets: list[int] = Query([30, 60, 90]),
+    direction: Direction | None = None,
+    counterparty: str | None = None,
+    category_name: str | None = None,
+    group_by: str | None = Query(None, pattern="^(counterparty|category)$"),
+    service: FinanceService = Depends(get_service),
+):
+    """帳齡分析"""
+    return service.aging(as_of, tuple(buckets), direction, counterparty, category_name, group_by)
+
+@router.get("/open-items/balances")
+def outstanding_balances(
+    group_by: str | None = Query("counterparty", pattern="^(counterparty|category)$"),
+    direction: Direction | None = None,
+    service: FinanceService = Depends(get_service),
+):
+    """目前各交易對象（或類別）的未結金額"""
+    return service.outstanding_balances(group_by, direction)
+
+@router.patch("/open-items/{item_id}")
+def update_open_item(item_id: int, body: OpenItemUpdate, service: FinanceService = Depends(get_service)):
+    if not service.set_counterparty(item_id, body.counterparty):
+        raise HTTPException(status_code=404, detail="找不到應收應付項目")
+    return {"id": item_id, "counterparty": body.counterparty}
+
+@router.post("/open-items/{item_id}/settlements", status_code=201)
+def settle_open_item(item_id: int, body: SettlementIn, service: FinanceService = Depends(get_service)):
+    """沖銷項目：指定 settlement_log_id 時分配既有日誌，否則新增沖銷日誌"""
+    if body.settlement_log_id is not None:
+        result = service.settle(item_id, body.settlement_log_id, body.amount)
+    else:
+        result = service.record_settlement(item_id, body.amount, body.note, body.actuall_time, body.category_name)
+    if result is None:
+        raise HTTPException(status_code=404, detail="找不到應收應付項目或日誌")
+    return result
+
+@router.post("/logs/{log_id}/settle")
+def auto_settle(
+    log_id: int,
+    counterparty: str | None = None,
+    category_name: str | None = None,
+    service: FinanceService = Depends(get_service),
+):
+    """把收入／支出日誌依先進先出沖銷未結項目"""
+    result = service.auto_settle(log_id, counterparty, category_name)
+    if result is None:
+        raise HTTPException(status_code=404, detail="找不到日誌")
+    return result
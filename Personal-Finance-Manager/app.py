@@ -1,9 +1,22 @@
-from fastapi import FastAPI
-from api import api_model_ex
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from api import api_model_ex, DataBaseAPI
 app = FastAPI()
 
 app.include_router(api_model_ex.router,prefix='/test',tags=['Test'])
+app.include_router(DataBaseAPI.router,prefix='/db',tags=['DataBase'])
+
+@app.exception_handler(ValueError)
+async def value_error_handler(request: Request, exc: ValueError):
+    """FinanceService 的驗證錯誤回傳 400"""
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(IntegrityError)
+async def integrity_error_handler(request: Request, exc: IntegrityError):
+    """違反資料庫約束（例如修改已沖銷的應收應付日誌）回傳 409"""
+    return JSONResponse(status_code=409, content={"detail": str(exc.orig)})
 
 @app.get('/')
 def index():
-    return 'hello'
\ No newline at end of file
+    return 'hello'
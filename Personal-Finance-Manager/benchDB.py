@@ -0,0 +1,10 @@
+"""舊的進入點：情境比較已移到 benchmarks.scenarios
+
+    python benchDB.py reports --rows 200000   等同於   python -m benchmarks.scenarios reports --rows 200000
+
+可跨提交比較的基準測試見 python -m benchmarks（benchmarks.suite）。
+"""
+from benchmarks.scenarios import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""可重現的 FinanceDB / FinanceService 基準測試
+
+用法：
+    python -m benchmarks run --sizes 10000 100000 --years 2 --out base.json
+    python -m benchmarks run --sizes 100000 --groups list aggregate --storage memory --out new.json
+    python -m benchmarks compare base.json new.json --threshold 1.1
+
+每個資料量都在新的暫存（或記憶體）SQLite 資料庫上，以 benchmarks.ledger 的合成帳本
+（相同參數產生相同資料）執行；結果 JSON 含執行環境與 git 提交，可跨提交比較。
+
+benchmarks.scenarios 是改寫前後的情境比較（舊寫法 vs 目前寫法、報表與寫入同時執行等）：
+    python -m benchmarks.scenarios reports --rows 200000 --seconds 5
+"""
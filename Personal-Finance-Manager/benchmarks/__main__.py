@@ -0,0 +1,68 @@
+from benchmarks.ledger import LedgerSpec
+from benchmarks.suite import GROUPS, run_suite, compare
+from datetime import datetime
+import argparse
+import json
+import sys
+
+
+def print_results(results: list[dict]):
+    print(f"  {'size':>9}  {'name':<28} {'median':>10} {'min':>10} {'rows':>9} {'rows/s':>12}")
+    for r in results:
+        rate = f"{r['rows_per_sec']:12.0f}" if r["rows_per_sec"] else f"{'-':>12}"
+        rows = r["rows"] if r["rows"] is not None else "-"
+        print(f"  {r['size']:>9}  {r['name']:<28} {r['median_s'] * 1000:8.2f}ms {r['min_s'] * 1000:8.2f}ms {rows:>9} {rate}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="FinanceDB 基準測試")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("run", help="執行基準測試")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="每次的日誌筆數")
+    p.add_argument("--categories", type=int, default=12)
+    p.add_argument("--years", type=float, default=1.0)
+    p.add_argument("--start", type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--storage", choices=["file", "memory"], default="file")
+    p.add_argument("--db-url", help="改用指定的空資料庫（例如本機可拋棄的 PostgreSQL），結束時刪除所有資料表")
+    p.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS), help="寫入一定會執行（其他組需要資料）")
+    p.add_argument("--out", help="結果 JSON 檔")
+
+    p = sub.add_parser("compare", help="比較兩個結果檔（中位數）")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=1.10, help="new/base 超過此比例視為退步")
+    args = parser.parse_args()
+
+    if args.cmd == "run":
+        if args.repeat <= 0:
+            parser.error("--repeat 必須為正整數")
+        spec = LedgerSpec(categories=args.categories, years=args.years, start=args.start, seed=args.seed)
+        report = run_suite(args.sizes, spec, args.repeat, args.storage, args.groups,
+                           progress=lambda msg: print(msg, file=sys.stderr), db_url=args.db_url)
+        print_results(report["results"])
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as fp:
+                json.dump(report, fp, ensure_ascii=False, indent=2)
+            print(f"結果已寫入 {args.out}")
+        return 0
+
+    with open(args.base, encoding="utf-8") as fp:
+        base = json.load(fp)
+    with open(args.new, encoding="utf-8") as fp:
+        new = json.load(fp)
+    print(f"base: {base['environment'].get('git_commit')}  new: {new['environment'].get('git_commit')}")
+    rows = compare(base, new, args.threshold)
+    print(f"  {'size':>9}  {'name':<28} {'base':>10} {'new':>10} {'ratio':>7}")
+    for r in rows:
+        flag = "  退步" if r["regression"] else ""
+        print(f"  {r['size']:>9}  {r['name']:<28} {r['base_s'] * 1000:8.2f}ms {r['new_s'] * 1000:8.2f}ms {r['ratio']:6.2f}x{flag}")
+    regressions = sum(r["regression"] for r in rows)
+    print(f"{len(rows)} 項，{regressions} 項退步（> {args.threshold:.2f}x）")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""合成帳本產生器：依參數產生可重現的類別與日誌（add_logs_bulk 格式）"""
+from dataBase.FinanceDB import FinanceService, Direction
+from datetime import datetime, timedelta
+from typing import Iterator, NamedTuple
+import random
+
+
+class CategoryProfile(NamedTuple):
+    """類別的產生參數"""
+    name: str
+    default_type: Direction
+    weight: float          # 相對出現頻率
+    median: float          # 金額中位數（對數常態分布）
+    sigma: float           # 金額對數標準差
+    flip_rate: float = 0.0 # 與預設方向相反的比例（退款、賣出等）
+
+
+# 依一般個人帳本的比例：小額餐飲交通最多，薪資房租每月少數幾筆但金額大
+PROFILES = (
+    CategoryProfile("Food", Direction.Expenditure, 30, 12, 0.6, 0.01),
+    CategoryProfile("Transport", Direction.Expenditure, 15, 6, 0.5),
+    CategoryProfile("Groceries", Direction.Expenditure, 6, 70, 0.4, 0.02),
+    CategoryProfile("Shopping", Direction.Expenditure, 5, 50, 1.0, 0.05),
+    CategoryProfile("Entertainment", Direction.Expenditure, 4, 40, 0.7),
+    CategoryProfile("Health", Direction.Expenditure, 1, 80, 0.9, 0.1),
+    CategoryProfile("Utilities", Direction.Expenditure, 1, 150, 0.3),
+    CategoryProfile("Stocks", Direction.Expenditure, 1.5, 600, 0.8, 0.45),
+    CategoryProfile("Freelance", Direction.Income, 0.8, 700, 0.6),
+    CategoryProfile("Salary", Direction.Income, 0.5, 4500, 0.15),
+    CategoryProfile("Rent", Direction.Expenditure, 0.5, 1200, 0.05),
+    CategoryProfile("Dividends", Direction.Income, 0.3, 60, 0.5),
+)
+
+MERCHANTS = (
+    "7-Eleven", "FamilyMart", "Uber Eats", "Foodpanda", "Starbucks", "MRT", "Taxi", "Costco",
+    "Carrefour", "PChome", "Momo", "Netflix", "Spotify", "Pharmacy", "Clinic", "Taipower",
+    "Chunghwa Telecom", "Broker", "Landlord", "Employer", "Client", "Bank",
+)
+
+
+class LedgerSpec(NamedTuple):
+    """合成帳本參數"""
+    logs: int = 100_000
+    categories: int = len(PROFILES)
+    years: float = 1.0
+    start: datetime = datetime(2024, 1, 1)
+    seed: int = 0
+    note_rate: float = 0.9  # 有備註的比例
+
+    @property
+    def end(self) -> datetime:
+        return self.start + timedelta(days=365.25 * self.years)
+
+
+def category_profiles(n: int) -> list[CategoryProfile]:
+    """取前 n 個內建類別，不足的以一般支出類別補上"""
+    if n <= 0:
+        raise ValueError("categories 必須為正整數")
+    profiles = list(PROFILES[:n])
+    profiles.extend(
+        CategoryProfile(f"Misc {i:03d}", Direction.Expenditure, 1, 30, 0.8, 0.02)
+        for i in range(len(profiles), n)
+    )
+    return profiles
+
+
+def generate_logs(spec: LedgerSpec) -> Iterator[dict]:
+    """依時間順序產生 spec.logs 筆日誌字典（相同 spec 產生相同資料）
+
+    時間平均分布在 spec.years 年內並加上隨機偏移；類別依權重抽樣，
+    金額為對數常態分布四捨五入到分，方向依類別預設值並有 flip_rate 比例相反。
+    """
+    if spec.logs < 0:
+        raise ValueError("logs 不可為負數")
+    rnd = random.Random(spec.seed)
+    profiles = category_profiles(spec.categories)
+    weights = [p.weight for p in profiles]
+    span = (spec.end - spec.start).total_seconds()
+    step = span / spec.logs if spec.logs else 0
+    chosen = rnd.choices(profiles, weights=weights, k=spec.logs)
+    for i, p in enumerate(chosen):
+        actual_type = p.default_type
+        if p.flip_rate and rnd.random() < p.flip_rate:
+            actual_type = Direction.Income if actual_type == Direction.Expenditure else Direction.Expenditure
+        note = None
+        if rnd.random() < spec.note_rate:
+            note = f"{rnd.choice(MERCHANTS)} {p.name.lower()} #{i}"
+        yield {
+            "category_name": p.name,
+            "amount": round(max(0.01, rnd.lognormvariate(0, p.sigma) * p.median), 2),
+            "actual_type": actual_type,
+            "note": note,
+            "actuall_time": spec.start + timedelta(seconds=(i + rnd.random()) * step),
+        }
+
+
+def seed_service(service: FinanceService, spec: LedgerSpec, chunk_size: int = 5000) -> int:
+    """在 service 建立 spec 的類別（已存在的略過）並寫入日誌，回傳寫入筆數"""
+    for p in category_profiles(spec.categories):
+        if service.get_category(p.name) is None:
+            service.add_category(p.name, p.default_type)
+    return service.add_logs_bulk(generate_logs(spec), chunk_size=chunk_size)["count"]
@@ -0,0 +1,927 @@
+"""改寫前後的情境比較：舊寫法（逐筆、載入 ORM、Python 端彙總）與目前寫法的耗時、記憶體與延遲
+
+與 benchmarks.suite 不同，這裡不產生可跨提交比較的結果檔，而是在同一次執行中對照兩種做法。
+
+用法：
+    python -m benchmarks.scenarios bulk --sizes 10000 1000000
+    python -m benchmarks.scenarios summary --years 3 --logs-per-day 20
+    python -m benchmarks.scenarios indexes --rows 1000000
+    python -m benchmarks.scenarios export --sizes 10000 100000 500000
+    python -m benchmarks.scenarios rows --rows 100000
+    python -m benchmarks.scenarios concurrency --workers 1 2 4 8
+    python -m benchmarks.scenarios reports --rows 200000 --seconds 5
+    python -m benchmarks.scenarios async-http --clients 50 --requests 2000
+    python -m benchmarks.scenarios rollup --rows 1000000
+    python -m benchmarks.scenarios search --rows 1000000
+    python -m benchmarks.scenarios arrays --rows 1000000 （需要 numpy）
+    python -m benchmarks.scenarios dashboard --rows 200000 --refreshes 500 --write-every 20
+    python -m benchmarks.scenarios recategorize --rows 200000
+    python -m benchmarks.scenarios category --rows 300000
+    python -m benchmarks.scenarios open-items --rows 200000
+    python -m benchmarks.scenarios api --url http://127.0.0.1:8000 （需先以 FINANCE_DB_URL 指向測試資料庫啟動 uvicorn app:app）
+"""
+from dataBase.FinanceDB import FinanceDB, FinanceService, FinanceLog, Category, Direction, SortField, Settlement
+from sqlalchemy import text, insert
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import argparse
+import asyncio
+import json
+import calendar
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+CATEGORIES = {
+    "Salary": Direction.Income,
+    "Rent": Direction.Expenditure,
+    "Food": Direction.Expenditure,
+    "Transport": Direction.Expenditure,
+    "Groceries": Direction.Expenditure,
+    "Dividends": Direction.Income,
+}
+
+
+def open_temp_service(tmpdir: str, name: str = "bench.db", result_cache_size: int = 0, **db_kwargs) -> FinanceService:
+    """在暫存資料夾建立獨立的 SQLite 檔案（預設停用查詢結果快取，量測的是資料庫路徑）"""
+    path = os.path.join(tmpdir, name)
+    if os.path.exists(path):
+        os.remove(path)
+    service = FinanceService(FinanceDB(db_url=f"sqlite:///{path}", **db_kwargs), result_cache_size=result_cache_size)
+    for cat_name, d in CATEGORIES.items():
+        service.add_category(cat_name, d)
+    return service
+
+
+def make_logs(n: int, seed: int = 0, start: datetime = datetime(2025, 1, 1), step: timedelta = timedelta(minutes=1)):
+    """產生 n 筆 add_log 參數字典"""
+    rnd = random.Random(seed)
+    names = list(CATEGORIES)
+    for i in range(n):
+        yield {
+            "category_name": rnd.choice(names),
+            "amount": round(rnd.uniform(1, 500), 2),
+            "note": f"note {i}",
+            "actuall_time": start + step * i,
+        }
+
+
+def _report(label: str, n: int, elapsed: float):
+    print(f"  {label:<10} {n:>9} 筆  {elapsed:8.2f} s  {n / elapsed:12.0f} rows/s")
+
+
+def bench_bulk(sizes: list[int], per_row_max: int, chunk_size: int):
+    """比較 add_log 逐筆寫入與 add_logs_bulk 批次寫入的吞吐量"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in sizes:
+            print(f"\n== {n} 筆 ==")
+            # 逐筆路徑每筆都 commit，超過上限時只量測前 per_row_max 筆的速率
+            m = min(n, per_row_max)
+            service = open_temp_service(tmpdir)
+            t0 = time.perf_counter()
+            for item in make_logs(m):
+                service.add_log(**item)
+            _report("add_log", m, time.perf_counter() - t0)
+            service.close()
+
+            service = open_temp_service(tmpdir)
+            t0 = time.perf_counter()
+            service.add_logs_bulk(make_logs(n), chunk_size=chunk_size)
+            _report("bulk", n, time.perf_counter() - t0)
+            service.close()
+
+
+def round_half_up(value, ndigits=2):
+    quantize_str = '1.' + '0' * ndigits
+    return Decimal(str(value)).quantize(Decimal(quantize_str), rounding=ROUND_HALF_UP)
+
+
+def legacy_monthly_summary(year, service):
+    """原 testDB2.generate_monthly_summary：每月兩次查詢並逐筆以 Decimal 累加"""
+    monthly_summary = {}
+    for month in range(1, 13):
+        start_date = datetime(year, month, 1)
+        last_day = calendar.monthrange(year, month)[1]
+        end_date = datetime(year, month, last_day, 23, 59, 59)
+        income_logs = service.get_filtered_and_sorted_logs(start_date=start_date, end_date=end_date, direction=Direction.Income)
+        expenditure_logs = service.get_filtered_and_sorted_logs(start_date=start_date, end_date=end_date, direction=Direction.Expenditure)
+        total_income = Decimal("0.00")
+        total_expenditure = Decimal("0.00")
+        income_totals = {}
+        expenditure_totals = {}
+        for log in income_logs:
+            amount = round_half_up(log['amount'], 2)
+            total_income = round_half_up(total_income + amount, 2)
+            income_totals[log['category']] = round_half_up(income_totals.get(log['category'], Decimal("0.00")) + amount, 2)
+        for log in expenditure_logs:
+            amount = round_half_up(log['amount'], 2)
+            total_expenditure = round_half_up(total_expenditure + amount, 2)
+            expenditure_totals[log['category']] = round_half_up(expenditure_totals.get(log['category'], Decimal("0.00")) + amount, 2)
+        monthly_summary[f"{year}-{month:02d}"] = {
+            "Totals": {
+                "Total Income": total_income,
+                "Total Expenditure": total_expenditure,
+                "Remaining Amount": round_half_up(total_income - total_expenditure, 2),
+            },
+            "Income Categories": income_totals,
+            "Expenditure Categories": expenditure_totals,
+        }
+    return monthly_summary
+
+
+def bench_summary(years: int, logs_per_day: int):
+    """比較每月 24 次查詢的舊報表與 period_summary 單一分組查詢"""
+    first_year = 2025 - years + 1
+    n = years * 365 * logs_per_day
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        service.add_logs_bulk(make_logs(n, start=datetime(first_year, 1, 1), step=timedelta(days=1) / logs_per_day))
+        print(f"\n== {years} 年 / {n} 筆 ==")
+        legacy_total = fast_total = 0.0
+        for year in range(first_year, 2026):
+            t0 = time.perf_counter()
+            legacy = legacy_monthly_summary(year, service)
+            t1 = time.perf_counter()
+            fast = service.period_summary(year, granularity="month")
+            t2 = time.perf_counter()
+            legacy_total += t1 - t0
+            fast_total += t2 - t1
+            if legacy != fast:
+                print(f"  {year}: 結果不一致！")
+            print(f"  {year}  legacy {t1 - t0:7.3f} s   period_summary {t2 - t1:7.3f} s")
+        print(f"  合計  legacy {legacy_total:7.3f} s   period_summary {fast_total:7.3f} s   x{legacy_total / fast_total:.1f}")
+        service.close()
+
+
+INDEX_FILTERS = {
+    "無": {},
+    "category": {"category_id": 1},
+    "direction": {"actual_type": Direction.Income},
+    "amount": {"min_amount": 100, "max_amount": 110},
+    "date": {"start_date": datetime(2025, 3, 1), "end_date": datetime(2025, 3, 2)},
+    "category+date": {"category_id": 1, "start_date": datetime(2025, 3, 1), "end_date": datetime(2025, 3, 8)},
+}
+
+
+def bench_indexes(rows: int):
+    """列出每個 SortField × 過濾組合的查詢計畫，並比較有無索引的耗時（判定規則同 tests/test_query_plans.py）"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        db = service.db
+        service.add_logs_bulk(make_logs(rows, start=datetime(2025, 1, 1), step=timedelta(seconds=30)))
+        db.session.execute(text("ANALYZE"))
+
+        timings = {}
+        print(f"\n== {rows} 筆：查詢計畫 ==")
+        for sf in SortField:
+            for label, filters in INDEX_FILTERS.items():
+                plan = db.explain_query_plan(db.logs_query(sf, True, filters))
+                # 依 rowid（主鍵）排序時的 SCAN 本身就是索引順序（排序欄位被等號條件固定時也只剩 id）
+                by_rowid = sf is SortField.ID or {SortField.CATEGORY: "category_id", SortField.DIRECTION: "actual_type"}.get(sf) in filters
+                indexed = all("USING" in p or "TEMP B-TREE" in p or (by_rowid and p == "SCAN finance_log") for p in plan)
+                print(f"  {'OK ' if indexed else 'NG '} {sf.name:<10} {label:<14} {' | '.join(plan)}")
+                t0 = time.perf_counter()
+                db.logs_query(sf, True, filters).limit(50).all()
+                timings[(sf, label)] = time.perf_counter() - t0
+
+        for index in FinanceLog.__table__.indexes:
+            db.session.execute(text(f"DROP INDEX {index.name}"))
+        print(f"\n== {rows} 筆：前 50 筆耗時（有索引 / 無索引）==")
+        for (sf, label), with_index in timings.items():
+            t0 = time.perf_counter()
+            db.logs_query(sf, True, INDEX_FILTERS[label]).limit(50).all()
+            without = time.perf_counter() - t0
+            print(f"  {sf.name:<10} {label:<14} {with_index * 1000:9.2f} ms  {without * 1000:9.2f} ms")
+        service.close()
+
+
+def _peak_memory(fn) -> tuple[float, float]:
+    """執行 fn，回傳 (秒數, tracemalloc 峰值 MB)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def bench_export(sizes: list[int], batch_size: int):
+    """比較一次載入清單與 export_logs 串流匯出的記憶體峰值"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out_path = os.path.join(tmpdir, "export.jsonl")
+        for n in sizes:
+            service = open_temp_service(tmpdir)
+            service.add_logs_bulk(make_logs(n))
+            service.db.session.expunge_all()
+            print(f"\n== {n} 筆 ==")
+
+            def load_all():
+                with open(out_path, "w", encoding="utf-8") as fp:
+                    for row in service.get_filtered_and_sorted_logs():
+                        fp.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+            def stream():
+                with open(out_path, "w", encoding="utf-8") as fp:
+                    service.export_logs(fp, fmt="jsonl", batch_size=batch_size)
+
+            elapsed, peak = _peak_memory(load_all)
+            service.db.session.expunge_all()
+            print(f"  list       {elapsed:8.2f} s  峰值 {peak:8.1f} MB")
+            elapsed, peak = _peak_memory(stream)
+            print(f"  stream     {elapsed:8.2f} s  峰值 {peak:8.1f} MB")
+            service.close()
+
+
+def bench_rows(rows: int, repeat: int):
+    """比較 ORM 物件路徑與欄位投影路徑的讀取速度"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        db = service.db
+        service.add_logs_bulk(make_logs(rows))
+        print(f"\n== {rows} 筆，取最佳 {repeat} 次 ==")
+
+        def orm_path():
+            db.session.expunge_all()
+            return [service._log_to_dict(l) for l in db.get_logs_with_sorting()]
+
+        def row_path():
+            db.session.expunge_all()
+            return service.get_filtered_and_sorted_logs()
+
+        assert orm_path() == row_path()
+        for label, fn in (("ORM", orm_path), ("projection", row_path)):
+            best = min(_timed(fn) for _ in range(repeat))
+            _report(label, rows, best)
+        service.close()
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def bench_concurrency(workers: list[int], seconds: float, rows: int):
+    """多個讀取執行緒 + 一個寫入執行緒，各自使用 unit_of_work"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir, journal_mode="WAL", busy_timeout=5000, pool_size=max(workers) + 2)
+        service.add_logs_bulk(make_logs(rows))
+        print(f"\n== {rows} 筆，每輪 {seconds} 秒 ==")
+        for n in workers:
+            stop = threading.Event()
+            reads = [0] * n
+            writes = [0]
+            errors = []
+
+            def reader(i):
+                after = None
+                while not stop.is_set():
+                    try:
+                        with service.unit_of_work() as svc:
+                            page = svc.get_logs_page(limit=50, after=after)
+                        after = page["next_after"]
+                        reads[i] += 1
+                    except Exception as e:
+                        errors.append(e)
+
+            def writer():
+                while not stop.is_set():
+                    try:
+                        with service.unit_of_work() as svc:
+                            svc.add_log("Food", 12.5, note="concurrent")
+                        writes[0] += 1
+                    except Exception as e:
+                        errors.append(e)
+
+            threads = [threading.Thread(target=reader, args=(i,)) for i in range(n)]
+            threads.append(threading.Thread(target=writer))
+            for t in threads:
+                t.start()
+            time.sleep(seconds)
+            stop.set()
+            for t in threads:
+                t.join()
+            print(f"  readers {n:>3}  讀取 {sum(reads) / seconds:9.0f} pages/s  寫入 {writes[0] / seconds:7.0f} logs/s  錯誤 {len(errors)}")
+            if errors:
+                print(f"    第一個錯誤：{errors[0]!r}")
+        service.close()
+
+
+REPORT_MODES = {
+    # 模式: (寫入端設定, 報表端設定)
+    "delete": ({}, {}),
+    "wal": ({"journal_mode": "WAL"}, {"journal_mode": "WAL"}),
+    "replica-wal": ({"journal_mode": "WAL"}, {"read_replica": "wal"}),
+    "replica-backup": ({}, {"read_replica": "backup", "replica_max_age": 1.0}),
+}
+
+
+def _report_worker(path: str, config: dict, seconds: float, ready, results):
+    """報表程序：重複執行年度 running_balance、period_summary 與年底餘額，回傳每次耗時（毫秒）與錯誤
+
+    寫入端每次都會讓 12 月的餘額檢查點失效，年底餘額因此每次都在主資料庫補建檢查點
+    （唯讀副本模式也一樣，見 FinanceDB._ensure_balance_checkpoints），報表端並非完全唯讀。
+    """
+    service = FinanceService(FinanceDB(db_url=f"sqlite:///{path}", busy_timeout=5000, **config), result_cache_size=0)
+    times, errors = [], []
+    ready.set()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            service.running_balance(start_date=datetime(2025, 1, 1), end_date=datetime(2026, 1, 1))
+            service.period_summary(2025)
+            service.balance_at(datetime(2026, 1, 1))
+            times.append((time.perf_counter() - t0) * 1000)
+        except Exception as e:
+            errors.append(repr(e))
+    service.close()
+    results.put((times, errors))
+
+
+def run_report_mode(tmpdir: str, mode: str, rows: int, seconds: float) -> tuple[list[float], list[float], list[str]]:
+    """以 REPORT_MODES[mode] 同時執行寫入（本程序逐筆 add_log）與報表（另一個程序）
+
+    Returns:
+        (每次寫入耗時毫秒, 每次報表耗時毫秒, 兩端的錯誤)
+    """
+    ctx = multiprocessing.get_context("spawn")
+    writer_config, report_config = REPORT_MODES[mode]
+    service = open_temp_service(tmpdir, f"{mode}.db", busy_timeout=5000, **writer_config)
+    try:
+        service.add_logs_bulk(make_logs(rows, step=timedelta(minutes=5)))
+        ready, results = ctx.Event(), ctx.Queue()
+        worker = ctx.Process(target=_report_worker,
+                             args=(os.path.join(tmpdir, f"{mode}.db"), report_config, seconds, ready, results))
+        worker.start()
+        ready.wait()
+        write_ms, errors = [], []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                service.add_log("Food", 12.5, note="concurrent", actuall_time=datetime(2025, 12, 15))
+                write_ms.append((time.perf_counter() - t0) * 1000)
+            except Exception as e:
+                errors.append(repr(e))
+        report_ms, report_errors = results.get()
+        worker.join()
+        return write_ms, report_ms, errors + report_errors
+    finally:
+        service.close()
+
+
+def bench_reports(rows: int, seconds: float, modes: list[str]):
+    """寫入（本程序逐筆 add_log）與報表（另一個程序）同時執行，比較報表讀主資料庫與讀唯讀來源
+
+    任一方被另一方的鎖阻塞時，最大延遲會接近對方單次執行的時間（或 busy_timeout）。
+    報表放在獨立程序，量到的是資料庫鎖而不是 GIL 的影響。斷言版本見 tests/test_concurrent_reports.py。
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f"\n== {rows} 筆，每種設定 {seconds} 秒 ==")
+        print(f"  {'mode':<15} {'寫入/s':>8} {'寫入 p99':>10} {'寫入 max':>10} {'報表/s':>8} {'報表 p99':>10} {'報表 max':>10}  錯誤")
+        for mode in modes:
+            write_ms, report_ms, errors = run_report_mode(tmpdir, mode, rows, seconds)
+            p99 = [_percentile(ms, 99) if ms else 0.0 for ms in (write_ms, report_ms)]
+            print(f"  {mode:<15} {len(write_ms) / seconds:8.0f} {p99[0]:8.1f}ms {max(write_ms, default=0):8.1f}ms"
+                  f" {len(report_ms) / seconds:8.1f} {p99[1]:8.1f}ms {max(report_ms, default=0):8.1f}ms  {len(errors)}")
+            if errors:
+                print(f"    第一個錯誤：{errors[0]}")
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_async_http(clients: int, requests: int, rows: int, port: int):
+    """以並行 HTTP 客戶端比較 AsyncFinanceService 與 threadpool 中同步 FinanceService 的延遲"""
+    from contextlib import asynccontextmanager
+    from fastapi import Depends, FastAPI
+    from dataBase.AsyncFinanceDB import AsyncFinanceDB, AsyncFinanceService
+    import httpx
+    import uvicorn
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir, journal_mode="WAL", pool_size=clients, max_overflow=clients)
+        service.add_logs_bulk(make_logs(rows))
+        path = os.path.join(tmpdir, "bench.db")
+        state = {}
+
+        @asynccontextmanager
+        async def lifespan(app):
+            adb = AsyncFinanceDB(f"sqlite+aiosqlite:///{path}", journal_mode="WAL", pool_size=clients, max_overflow=clients)
+            await adb.init_schema()
+            state["async"] = AsyncFinanceService(adb)
+            yield
+            await adb.close()
+
+        def get_service():
+            with service.unit_of_work() as svc:
+                yield svc
+
+        app = FastAPI(lifespan=lifespan)
+
+        @app.get("/sync/logs")
+        def sync_logs(category: str = "Food", svc: FinanceService = Depends(get_service)):
+            return svc.get_logs_page(limit=50, category_name=category)["items"]
+
+        @app.get("/async/logs")
+        async def async_logs(category: str = "Food"):
+            return (await state["async"].get_logs_page(limit=50, category_name=category))["items"]
+
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        async def run(url: str) -> list[float]:
+            latencies: list[float] = []
+            remaining = iter(range(requests))
+            limits = httpx.Limits(max_connections=clients)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+                async def worker():
+                    for _ in remaining:
+                        t0 = time.perf_counter()
+                        resp = await client.get(url)
+                        resp.raise_for_status()
+                        latencies.append(time.perf_counter() - t0)
+                await asyncio.gather(*[worker() for _ in range(clients)])
+            return latencies
+
+        print(f"\n== {rows} 筆，{clients} 個並行客戶端，各 {requests} 次請求 ==")
+        for label, url in (("sync", "/sync/logs"), ("async", "/async/logs")):
+            asyncio.run(run(url))  # 暖身
+            t0 = time.perf_counter()
+            latencies = asyncio.run(run(url))
+            elapsed = time.perf_counter() - t0
+            print(f"  {label:<6} p50 {_percentile(latencies, 50) * 1000:8.1f} ms  p99 {_percentile(latencies, 99) * 1000:8.1f} ms  {requests / elapsed:8.0f} req/s")
+        server.should_exit = True
+        thread.join()
+        service.close()
+
+
+def bench_api(url: str, clients: int, requests: int, batch: int):
+    """對本機 uvicorn 上的 /db API 做混合負載（分頁列表、彙總、批次新增、NDJSON 串流）"""
+    import httpx
+
+    async def run():
+        async with httpx.AsyncClient(base_url=url, timeout=120, limits=httpx.Limits(max_connections=clients)) as client:
+            await client.post("/db/categories", json={"name": "Bench", "default_type": "Expenditure"})
+            rnd = random.Random(0)
+            t0 = time.perf_counter()
+            for i in range(0, requests * batch, batch):
+                body = [{"category_name": "Bench", "amount": round(rnd.uniform(1, 500), 2), "note": f"bench {i + j}"} for j in range(batch)]
+                (await client.post("/db/logs/batch", json=body)).raise_for_status()
+            elapsed = time.perf_counter() - t0
+            print(f"  POST /db/logs/batch  {requests * batch / elapsed:9.0f} logs/s（每批 {batch} 筆）")
+
+            scenarios = {
+                "GET /db/logs": ("/db/logs", {"limit": 50, "category_name": "Bench"}),
+                "GET /db/totals": ("/db/totals", {"group_by": "category"}),
+            }
+            for label, (path, params) in scenarios.items():
+                latencies: list[float] = []
+                remaining = iter(range(requests))
+
+                async def worker():
+                    for _ in remaining:
+                        t = time.perf_counter()
+                        (await client.get(path, params=params)).raise_for_status()
+                        latencies.append(time.perf_counter() - t)
+
+                t0 = time.perf_counter()
+                await asyncio.gather(*[worker() for _ in range(clients)])
+                elapsed = time.perf_counter() - t0
+                print(f"  {label:<20} p50 {_percentile(latencies, 50) * 1000:7.1f} ms  p99 {_percentile(latencies, 99) * 1000:7.1f} ms  {requests / elapsed:7.0f} req/s")
+
+            t0 = time.perf_counter()
+            count = 0
+            async with client.stream("GET", "/db/logs/stream", params={"category_name": "Bench"}) as resp:
+                async for _line in resp.aiter_lines():
+                    count += 1
+            elapsed = time.perf_counter() - t0
+            print(f"  GET /db/logs/stream  {count} 筆  {count / elapsed:9.0f} rows/s")
+
+    print(f"\n== {url}，{clients} 個並行客戶端 ==")
+    asyncio.run(run())
+
+
+def bench_rollup(rows: int, repeat: int):
+    """比較 daily_rollup 與直接掃描 finance_log 的儀表板彙總查詢"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        db = service.db
+        t0 = time.perf_counter()
+        service.add_logs_bulk(make_logs(rows, start=datetime(2023, 1, 1), step=timedelta(minutes=3)))
+        _report("insert", rows, time.perf_counter() - t0)
+        queries = {
+            "月×類別": (("month", "category"), None),
+            "日×方向（一年）": (("day", "direction"), {"start_date": datetime(2024, 1, 1), "end_date": datetime(2024, 12, 31, 23, 59, 59, 999999)}),
+            "類別（單月）": ("category", {"start_date": datetime(2024, 6, 1), "end_date": datetime(2024, 6, 30, 23, 59, 59, 999999)}),
+        }
+        print(f"\n== {rows} 筆，取最佳 {repeat} 次（rollup / 掃描）==")
+        for label, (group_by, filters) in queries.items():
+            fast = min(_timed(lambda: db.sum_by(group_by, filters)) for _ in range(repeat))
+            slow = min(_timed(lambda: db.sum_by(group_by, filters, use_rollup=False)) for _ in range(repeat))
+            print(f"  {label:<12} {fast * 1000:9.2f} ms  {slow * 1000:9.2f} ms")
+        service.close()
+
+
+NOTE_WORDS = ["coffee", "lunch", "dinner", "taxi", "metro", "rent", "grocery", "bonus", "refund", "gift",
+              "book", "movie", "pharmacy", "insurance", "parking", "snack", "market", "online", "subscription", "repair"]
+
+
+def bench_search(rows: int, repeat: int):
+    """比較 FTS5 trigram search_notes 與 note_keyword（ILIKE '%kw%'）的備註搜尋"""
+    rnd = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        logs = (
+            dict(item, note=f"{rnd.choice(NOTE_WORDS)} {rnd.choice(NOTE_WORDS)} shop{rnd.randrange(5000)}")
+            for item in make_logs(rows, start=datetime(2023, 1, 1), step=timedelta(minutes=3))
+        )
+        t0 = time.perf_counter()
+        service.add_logs_bulk(logs)
+        _report("insert", rows, time.perf_counter() - t0)
+        june = {"start_date": datetime(2024, 6, 1), "end_date": datetime(2024, 6, 30, 23, 59, 59)}
+        # (標籤, FTS 查詢, ILIKE 關鍵字, 其他過濾條件)
+        cases = [
+            ("罕見詞", "shop1234", "shop1234", {}),
+            ("常見詞", "coffee", "coffee", {}),
+            ("前綴", "pharm*", "pharm", {}),
+            ("多詞", "coffee shop42", None, {}),
+            ("常見詞+類別+月份", "coffee", "coffee", {"category_name": "Food", **june}),
+        ]
+        print(f"\n== {rows} 筆，limit 50，取最佳 {repeat} 次（search_notes / ILIKE）==")
+        for label, query, keyword, filters in cases:
+            fts = min(_timed(lambda: service.search_notes(query, 50, **filters)) for _ in range(repeat))
+            hits = len(service.search_notes(query, None, **filters))
+            if keyword is None:
+                print(f"  {label:<16} {fts * 1000:9.2f} ms  {'-':>12}  {hits:>8} 筆")
+                continue
+            scan = min(_timed(lambda: service.get_filtered_and_sorted_logs(note_keyword=keyword, limit=50, **filters)) for _ in range(repeat))
+            print(f"  {label:<16} {fts * 1000:9.2f} ms  {scan * 1000:9.2f} ms  {hits:>8} 筆")
+        service.close()
+
+
+def dict_month_category_totals(logs: list[dict]) -> dict:
+    """以逐筆字典在 Python 端累加（月份, 類別）合計，作為欄位式路徑的對照"""
+    totals = {}
+    for log in logs:
+        key = (log["timestamp"][:7], log["category"])
+        totals[key] = totals.get(key, Decimal("0.00")) + round_half_up(log["amount"], 2)
+    return totals
+
+
+def bench_arrays(rows: int):
+    """比較 list[dict] 與 to_arrays 欄位式路徑的（月份, 類別）彙總耗時與記憶體峰值"""
+    from dataBase import FinanceArrays
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        service.add_logs_bulk(make_logs(rows, start=datetime(2023, 1, 1), step=timedelta(minutes=3)))
+        print(f"\n== {rows} 筆（月份×類別）==")
+        results = {}
+
+        def dict_path():
+            results["dict"] = dict_month_category_totals(service.get_filtered_and_sorted_logs())
+
+        def array_path():
+            arrays = service.to_arrays()
+            results["arrays"] = {(m, c): t for m, c, t, _n in FinanceArrays.group_totals(arrays, ("month", "category"))}
+
+        # tracemalloc 會拖慢逐筆配置，耗時與記憶體分開量測
+        for label, fn in (("list[dict]", dict_path), ("to_arrays", array_path)):
+            service.db.session.expunge_all()
+            elapsed = _timed(fn)
+            _, peak = _peak_memory(fn)
+            print(f"  {label:<12} {elapsed:8.2f} s  峰值 {peak:8.1f} MB")
+        print(f"  結果一致：{results['dict'] == results['arrays']}")
+        arrays = service.to_arrays()
+        for year in (2023, 2024):
+            same = FinanceArrays.period_summary(arrays, year) == service.period_summary(year)
+            print(f"  {year} period_summary 一致：{same}")
+        service.close()
+
+
+def dashboard_refresh(service: FinanceService, month: int):
+    """儀表板一次重新整理：最近日誌、各方向與類別合計、年度月報"""
+    window = {"start_date": datetime(2024, month, 1), "end_date": datetime(2024, month, 28)}
+    service.get_filtered_and_sorted_logs(limit=50)
+    service.get_filtered_and_sorted_logs(direction=Direction.Expenditure, limit=20, **window)
+    service.get_filtered_and_sorted_logs(category_name="Food", sort_by=SortField.AMOUNT, limit=10)
+    service.get_totals("direction")
+    service.get_totals("category", **window)
+    service.period_summary(2024)
+
+
+def bench_dashboard(rows: int, refreshes: int, write_every: int, cache_size: int):
+    """重複的儀表板查詢負載：停用 vs 啟用查詢結果快取（每 write_every 次重新整理寫入一筆）"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base = open_temp_service(tmpdir)
+        base.add_logs_bulk(make_logs(rows, start=datetime(2023, 1, 1), step=timedelta(minutes=3)))
+        base.close()
+        path = os.path.join(tmpdir, "bench.db")
+        print(f"\n== {rows} 筆，{refreshes} 次重新整理，每 {write_every} 次寫入一筆 ==")
+        for label, size in (("無快取", 0), ("LRU 快取", cache_size)):
+            service = FinanceService(FinanceDB(db_url=f"sqlite:///{path}"), result_cache_size=size)
+            latencies = []
+            for i in range(refreshes):
+                if write_every and i and i % write_every == 0:
+                    service.add_log("Food", 12.5, note="dashboard write")
+                t0 = time.perf_counter()
+                dashboard_refresh(service, month=1 + i % 3)
+                latencies.append(time.perf_counter() - t0)
+            latencies.sort()
+            print(f"  {label:<8} 平均 {sum(latencies) / len(latencies) * 1000:8.2f} ms"
+                  f"  p50 {_percentile(latencies, 50) * 1000:8.2f} ms  p95 {_percentile(latencies, 95) * 1000:8.2f} ms")
+            if size:
+                stats = service.result_cache_stats()
+                print(f"           命中率 {stats['hit_ratio']:.1%}  命中 {stats['hits']}  未命中 {stats['misses']}"
+                      f"  淘汰 {stats['evictions']}  過期 {stats['expirations']}  generation {stats['generation']}")
+            service.close()
+
+
+def bench_recategorize(rows: int):
+    """把 Food 中備註含關鍵字的日誌改到另一類別：逐筆 update_log vs update_logs_where"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        service.add_category("Delivery", Direction.Expenditure)
+        service.add_logs_bulk(
+            dict(item, note="Uber Eats order" if i % 4 == 0 else item["note"])
+            for i, item in enumerate(make_logs(rows))
+        )
+        filters = {"category_name": "Food", "note_keyword": "Uber Eats"}
+        print(f"\n== {rows} 筆 ==")
+
+        t0 = time.perf_counter()
+        ids = [log["id"] for log in service.get_filtered_and_sorted_logs(**filters)]
+        for log_id in ids:
+            service.update_log(log_id, category_name="Delivery")
+        _report("update_log", len(ids), time.perf_counter() - t0)
+
+        # 改回原類別後以單一 UPDATE 重做
+        service.update_logs_where({"category_name": "Delivery"}, category_name="Food")
+        t0 = time.perf_counter()
+        count = service.update_logs_where(filters, category_name="Delivery")["count"]
+        _report("where", count, time.perf_counter() - t0)
+        service.close()
+
+
+def legacy_delete_category(service: FinanceService, name: str):
+    """舊版行為：cascade 未設 passive_deletes，ORM 先載入類別的全部日誌再逐筆 DELETE"""
+    session = service.db.session
+    cat = session.query(Category).filter_by(name=name).one()
+    for log in cat.logs:
+        session.delete(log)
+    session.delete(cat)
+    session.commit()
+
+
+def legacy_merge_categories(service: FinanceService, src: str, dst: str):
+    """舊版作法：列出來源類別日誌，update_logs_bulk 逐筆改類別後再刪除來源類別"""
+    ids = [log["id"] for log in service.get_filtered_and_sorted_logs(category_name=src)]
+    service.update_logs_bulk({"id": log_id, "category_name": dst} for log_id in ids)
+    service.delete_category(src)
+
+
+def bench_category(rows: int):
+    """刪除／合併大類別：舊版 ORM 路徑 vs ON DELETE CASCADE 與單一 UPDATE（時間與記憶體分開量測）"""
+    cases = [
+        ("刪除 舊版", lambda s: legacy_delete_category(s, "Food")),
+        ("刪除 新版", lambda s: s.delete_category("Food")),
+        ("合併 舊版", lambda s: legacy_merge_categories(s, "Food", "Groceries")),
+        ("合併 新版", lambda s: s.merge_categories("Food", "Groceries")),
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        def run(fn, measure):
+            service = open_temp_service(tmpdir)
+            service.add_logs_bulk(make_logs(rows))
+            try:
+                return measure(lambda: fn(service))
+            finally:
+                service.close()
+
+        n = rows // len(CATEGORIES)
+        print(f"\n== {rows} 筆（Food 約 {n} 筆）==")
+        for label, fn in cases:
+            elapsed = run(fn, _timed)
+            _elapsed, peak = run(fn, _peak_memory)
+            print(f"  {label:<8} {elapsed:8.2f} s  峰值 {peak:8.1f} MB")
+
+
+def seed_open_items(service: FinanceService, rows: int, counterparties: int, open_rate: float, seed: int = 0) -> datetime:
+    """寫入 rows 筆應收（每小時一筆，備註為交易對象），除 open_rate 比例外都在 30 天內以收入全額沖銷
+
+    Returns:
+        datetime: 最後一筆應收的時間
+    """
+    rnd = random.Random(seed)
+    start, step = datetime(2020, 1, 1), timedelta(hours=1)
+    items = [
+        {"category_name": "Salary", "amount": round(rnd.uniform(10, 2000), 2), "actual_type": Direction.Receivable,
+         "note": f"C{i % counterparties:04d}", "actuall_time": start + step * i}
+        for i in range(rows)
+    ]
+    service.add_logs_bulk(items)
+    session = service.db.session
+    session.execute(text("UPDATE open_item SET counterparty = (SELECT note FROM finance_log WHERE id = open_item.log_id)"))
+    session.commit()
+    paid = [(i, item) for i, item in enumerate(items) if rnd.random() >= open_rate]
+    payments = [
+        {"category_name": "Salary", "amount": item["amount"], "actual_type": Direction.Income,
+         "note": item["note"], "actuall_time": item["actuall_time"] + timedelta(days=rnd.uniform(1, 30))}
+        for _i, item in paid
+    ]
+    service.add_logs_bulk(payments)
+    # 依寫入順序對應：應收為 1..rows，收入接在後面
+    session.execute(insert(Settlement), [
+        {"item_id": i + 1, "settlement_log_id": rows + k + 1, "amount": p["amount"], "settled_at": p["actuall_time"]}
+        for k, ((i, _item), p) in enumerate(zip(paid, payments))
+    ])
+    session.commit()
+    return items[-1]["actuall_time"]
+
+
+def legacy_open_items(service: FinanceService, as_of: datetime) -> dict[str, float]:
+    """沒有未結項目表時的做法：讀取 as_of 以前全部應收與收入，依交易對象先進先出重新配對
+
+    Returns:
+        dict: 交易對象 → 未結金額
+    """
+    logs = service.get_filtered_and_sorted_logs(category_name="Salary", end_date=as_of, sort_by=SortField.TIMESTAMP, reverse=False)
+    queues: dict[str, list[list]] = {}
+    credit: dict[str, Decimal] = {}
+    for log in logs:
+        key, amount = log["note"], Decimal(str(log["amount"]))
+        if log["actual_type"] == Direction.Receivable.value:
+            queue = queues.setdefault(key, [])
+            queue.append([log["id"], amount])
+            paying = credit.pop(key, Decimal(0))
+        elif log["actual_type"] == Direction.Income.value:
+            queue = queues.get(key, [])
+            paying = amount + credit.pop(key, Decimal(0))
+        else:
+            continue
+        while paying and queue:
+            take = min(paying, queue[0][1])
+            queue[0][1] -= take
+            paying -= take
+            if not queue[0][1]:
+                queue.pop(0)
+        if paying:
+            credit[key] = paying
+    return {key: float(sum(amount for _id, amount in queue)) for key, queue in queues.items() if queue}
+
+
+def bench_open_items(rows: int, counterparties: int, open_rate: float, repeat: int):
+    """未結項目與帳齡：未結項目表（部分索引、彙總表）vs 每次讀取全部歷史重新配對"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = open_temp_service(tmpdir)
+        t0 = time.perf_counter()
+        last = seed_open_items(service, rows, counterparties, open_rate)
+        print(f"\n== {rows} 筆應收，{counterparties} 個交易對象，約 {open_rate:.0%} 未結（建立 {time.perf_counter() - t0:.1f} s）==")
+        mid = datetime(2020, 1, 1) + (last - datetime(2020, 1, 1)) / 2
+
+        def run(label: str, fn):
+            result = fn()
+            elapsed = min(_timed(fn) for _ in range(repeat))
+            print(f"  {label:<28} {elapsed * 1000:10.2f} ms")
+            return result
+
+        current = run("open_items 目前", lambda: service.open_items())
+        run("open_items as_of 一半", lambda: service.open_items(as_of=mid))
+        run("aging 目前", lambda: service.aging())
+        run("aging as_of 一半", lambda: service.aging(as_of=mid))
+        balances = run("outstanding_balances", lambda: service.outstanding_balances())
+        legacy = run("舊版重新配對 目前", lambda: legacy_open_items(service, datetime.max))
+        run("舊版重新配對 as_of 一半", lambda: legacy_open_items(service, mid))
+        total = sum(b["outstanding"] for b in balances)
+        print(f"  未結 {len(current)} 項，合計 {total:.2f}（舊版 {sum(legacy.values()):.2f}）")
+
+        payment = service.add_log("Salary", 5000, Direction.Income, "C0000")
+        t0 = time.perf_counter()
+        result = service.auto_settle(payment["id"], counterparty="C0000")
+        print(f"  auto_settle                  {(time.perf_counter() - t0) * 1000:10.2f} ms  沖銷 {result['count']} 項")
+        service.close()
+
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.scenarios", description="FinanceDB 情境比較")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("bulk", help="逐筆 vs 批次寫入")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    p.add_argument("--per-row-max", type=int, default=10_000, help="逐筆路徑最多量測筆數")
+    p.add_argument("--chunk-size", type=int, default=5000)
+
+    p = sub.add_parser("summary", help="每月報表：舊迴圈 vs period_summary")
+    p.add_argument("--years", type=int, default=3)
+    p.add_argument("--logs-per-day", type=int, default=20)
+
+    p = sub.add_parser("indexes", help="索引查詢計畫與耗時")
+    p.add_argument("--rows", type=int, default=1_000_000)
+
+    p = sub.add_parser("export", help="串流匯出的記憶體峰值")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    p.add_argument("--batch-size", type=int, default=1000)
+
+    p = sub.add_parser("rows", help="ORM 物件 vs 欄位投影讀取")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("concurrency", help="多執行緒讀取 + 寫入")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--rows", type=int, default=50_000)
+
+    p = sub.add_parser("reports", help="寫入與報表同時執行：主資料庫 vs 唯讀來源")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--modes", nargs="+", choices=list(REPORT_MODES), default=list(REPORT_MODES))
+
+    p = sub.add_parser("async-http", help="HTTP 負載：async vs threadpool 同步服務")
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--rows", type=int, default=50_000)
+    p.add_argument("--port", type=int, default=8765)
+
+    p = sub.add_parser("rollup", help="daily_rollup vs 掃描 finance_log")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("search", help="FTS5 全文搜尋 vs ILIKE")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("arrays", help="list[dict] vs numpy 欄位式彙總")
+    p.add_argument("--rows", type=int, default=1_000_000)
+
+    p = sub.add_parser("dashboard", help="重複儀表板查詢：有無查詢結果快取")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--refreshes", type=int, default=500)
+    p.add_argument("--write-every", type=int, default=20, help="每幾次重新整理寫入一筆（0 表示不寫入）")
+    p.add_argument("--cache-size", type=int, default=256)
+
+    p = sub.add_parser("recategorize", help="逐筆 update_log vs update_logs_where")
+    p.add_argument("--rows", type=int, default=200_000)
+
+    p = sub.add_parser("category", help="刪除／合併大類別：ORM 載入 vs 資料庫端")
+    p.add_argument("--rows", type=int, default=300_000)
+
+    p = sub.add_parser("open-items", help="未結項目與帳齡：未結項目表 vs 重新配對全部歷史")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--counterparties", type=int, default=500)
+    p.add_argument("--open-rate", type=float, default=0.03, help="未沖銷的應收比例")
+    p.add_argument("--repeat", type=int, default=5)
+
+    p = sub.add_parser("api", help="對執行中的 uvicorn 做 HTTP 負載")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--clients", type=int, default=20)
+    p.add_argument("--requests", type=int, default=500)
+    p.add_argument("--batch", type=int, default=500)
+
+    args = parser.parse_args()
+    if args.cmd == "bulk":
+        bench_bulk(args.sizes, args.per_row_max, args.chunk_size)
+    elif args.cmd == "summary":
+        bench_summary(args.years, args.logs_per_day)
+    elif args.cmd == "indexes":
+        bench_indexes(args.rows)
+    elif args.cmd == "export":
+        bench_export(args.sizes, args.batch_size)
+    elif args.cmd == "rows":
+        bench_rows(args.rows, args.repeat)
+    elif args.cmd == "concurrency":
+        bench_concurrency(args.workers, args.seconds, args.rows)
+    elif args.cmd == "reports":
+        bench_reports(args.rows, args.seconds, args.modes)
+    elif args.cmd == "async-http":
+        bench_async_http(args.clients, args.requests, args.rows, args.port)
+    elif args.cmd == "rollup":
+        bench_rollup(args.rows, args.repeat)
+    elif args.cmd == "search":
+        bench_search(args.rows, args.repeat)
+    elif args.cmd == "arrays":
+        bench_arrays(args.rows)
+    elif args.cmd == "dashboard":
+        bench_dashboard(args.rows, args.refreshes, args.write_every, args.cache_size)
+    elif args.cmd == "recategorize":
+        bench_recategorize(args.rows)
+    elif args.cmd == "category":
+        bench_category(args.rows)
+    elif args.cmd == "open-items":
+        bench_open_items(args.rows, args.counterparties, args.open_rate, args.repeat)
+    elif args.cmd == "api":
+        bench_api(args.url, args.clients, args.requests, args.batch)
+
+
+if __name__ == "__main__":
+    main()
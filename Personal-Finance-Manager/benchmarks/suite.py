@@ -0,0 +1,268 @@
+"""FinanceDB / FinanceService 基準測試：寫入、各 SortField 列表、彙總、修改、刪除"""
+from benchmarks.ledger import LedgerSpec, category_profiles, generate_logs
+from dataBase.FinanceDB import Base, FinanceDB, FinanceService, SortField
+from sqlalchemy.engine import make_url
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import sqlalchemy
+import time
+
+GROUPS = ("insert", "list", "aggregate", "update", "delete")
+
+
+@contextmanager
+def open_service(storage: str = "file", db_url: str | None = None) -> Iterator[FinanceService]:
+    """建立獨立的 FinanceService（停用查詢結果快取，量測的是資料庫路徑）
+
+    Args:
+        storage: "file"（暫存資料夾中的 SQLite 檔）或 "memory"（記憶體資料庫）
+        db_url: 改用指定的資料庫（例如本機可拋棄的 PostgreSQL）；必須是空的資料庫，
+                結束時會刪除所有資料表，下一次量測重新開始
+    """
+    if db_url is not None:
+        service = FinanceService(FinanceDB(db_url=db_url), result_cache_size=0)
+        try:
+            yield service
+        finally:
+            service.db.session.close()
+            Base.metadata.drop_all(service.db.engine)
+            service.close()
+        return
+    if storage not in ("file", "memory"):
+        raise ValueError("storage 必須為 'file' 或 'memory'")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}" if storage == "file" else "sqlite://"
+        service = FinanceService(FinanceDB(db_url=url), result_cache_size=0)
+        try:
+            yield service
+        finally:
+            service.close()
+
+
+def _month_range(spec: LedgerSpec, offset: int) -> tuple[datetime, datetime]:
+    """spec.start 起第 offset 個月的 [月初, 下月初)"""
+    month = spec.start.month - 1 + offset
+    start = datetime(spec.start.year + month // 12, month % 12 + 1, 1)
+    month += 1
+    return start, datetime(spec.start.year + month // 12, month % 12 + 1, 1)
+
+
+class Runner:
+    """執行並收集單一資料量的量測結果"""
+    def __init__(self, size: int, repeat: int):
+        self.size = size
+        self.repeat = repeat
+        self.results: list[dict] = []
+
+    def record(self, name: str, times: list[float], rows: int | None = None):
+        """記錄一項量測（times 為每次執行的秒數，rows 為每次處理的筆數）"""
+        median = statistics.median(times)
+        self.results.append({
+            "size": self.size,
+            "name": name,
+            "repeat": len(times),
+            "min_s": min(times),
+            "median_s": median,
+            "mean_s": statistics.fmean(times),
+            "rows": rows,
+            "rows_per_sec": (rows / median) if rows and median > 0 else None,
+        })
+
+    def time(self, name: str, fn: Callable[[int], object], rows: Callable[[object], int] | int | None = None, warmup: bool = False):
+        """執行 fn(i) repeat 次並記錄；rows 可為固定筆數或由最後一次的回傳值計算"""
+        if warmup:
+            fn(0)
+        times, result = [], None
+        for i in range(self.repeat):
+            t0 = time.perf_counter()
+            result = fn(i)
+            times.append(time.perf_counter() - t0)
+        self.record(name, times, rows(result) if callable(rows) else rows)
+
+
+def bench_insert(runner: Runner, service: FinanceService, spec: LedgerSpec):
+    """批次寫入整個帳本（只執行一次），再逐筆 add_log"""
+    for p in category_profiles(spec.categories):
+        service.add_category(p.name, p.default_type)
+    logs = list(generate_logs(spec))  # 先產生資料，不計入寫入時間
+    t0 = time.perf_counter()
+    count = service.add_logs_bulk(logs)["count"]
+    runner.record("insert.bulk", [time.perf_counter() - t0], count)
+
+    extra = list(generate_logs(spec._replace(logs=runner.repeat, seed=spec.seed + 1)))
+    runner.time("insert.single", lambda i: service.add_log(**extra[i]), 1)
+
+
+def bench_list(runner: Runner, service: FinanceService, spec: LedgerSpec):
+    """每個 SortField：第一頁、單一類別第一頁、單月全部"""
+    start, end = _month_range(spec, int(spec.years * 6))
+    for field in SortField:
+        key = field.name.lower()
+        runner.time(f"list.{key}.page",
+                    lambda i: service.get_filtered_and_sorted_logs(sort_by=field, limit=100), len, warmup=True)
+        runner.time(f"list.{key}.category",
+                    lambda i: service.get_filtered_and_sorted_logs(category_name="Groceries", sort_by=field, limit=100),
+                    len, warmup=True)
+        runner.time(f"list.{key}.month",
+                    lambda i: service.get_filtered_and_sorted_logs(start_date=start, end_date=end, sort_by=field),
+                    len, warmup=True)
+
+
+def bench_aggregate(runner: Runner, service: FinanceService, spec: LedgerSpec):
+    """方向／類別／月份總額（彙總表與掃描 finance_log）、單月類別總額、年度摘要、餘額"""
+    for group_by in ("direction", "category", "month"):
+        runner.time(f"aggregate.{group_by}", lambda i: service.get_totals(group_by), warmup=True)
+        runner.time(f"aggregate.{group_by}.scan",
+                    lambda i: service.db.sum_by(group_by, None, use_rollup=False), warmup=True)
+    start, end = _month_range(spec, int(spec.years * 6))
+    runner.time("aggregate.category.month",
+                lambda i: service.get_totals("category", start_date=start, end_date=end), warmup=True)
+    runner.time("aggregate.period_summary", lambda i: service.period_summary(spec.start.year), warmup=True)
+    # 餘額：第一次查詢會補建月底檢查點，之後只加總檢查點之後的部分
+    at = spec.end - (spec.end - spec.start) / 3
+    runner.time("aggregate.balance_at", lambda i: service.balance_at(at), warmup=True)
+    runner.time("aggregate.running_balance.month",
+                lambda i: service.running_balance(start_date=start, end_date=end), len, warmup=True)
+
+
+def bench_update(runner: Runner, service: FinanceService, spec: LedgerSpec, batch: int = 1000):
+    """逐筆 update_log、update_logs_bulk（batch 筆）、update_logs_where（單月單一類別）"""
+    rnd = random.Random(spec.seed)
+    max_id = spec.logs
+    runner.time("update.single", lambda i: service.update_log(rnd.randint(1, max_id), amount=12.34), 1)
+    n = min(batch, max_id)
+    runner.time(
+        "update.bulk",
+        lambda i: service.update_logs_bulk({"id": log_id, "amount": 43.21} for log_id in rnd.sample(range(1, max_id + 1), n))["count"],
+        n,
+    )
+    months = max(1, int(spec.years * 12))
+
+    def where(i: int) -> int:
+        start, end = _month_range(spec, i % months)
+        return service.update_logs_where({"category_name": "Food", "start_date": start, "end_date": end}, note="bench")["count"]
+    runner.time("update.where", where, lambda count: count)
+
+
+def bench_delete(runner: Runner, service: FinanceService, spec: LedgerSpec):
+    """依月份 delete_logs_where（每次不同月份），最後刪除一個類別（ON DELETE CASCADE）"""
+    months = max(1, int(spec.years * 12))
+
+    def month(i: int) -> int:
+        start, end = _month_range(spec, months - 1 - i % months)
+        return service.delete_logs_where({"start_date": start, "end_date": end})["count"]
+    runner.time("delete.month", month, lambda count: count)
+
+    name = category_profiles(spec.categories)[0].name
+    rows = sum(count for _key, _total, count in service.db.sum_by("category", {"category_id": service.get_category(name).id}))
+    t0 = time.perf_counter()
+    service.delete_category(name)
+    runner.record("delete.category", [time.perf_counter() - t0], rows)
+
+
+BENCHMARKS = {
+    "insert": bench_insert,
+    "list": bench_list,
+    "aggregate": bench_aggregate,
+    "update": bench_update,
+    "delete": bench_delete,
+}
+
+
+def run_size(spec: LedgerSpec, repeat: int = 5, storage: str = "file", groups=GROUPS,
+             progress: Callable[[str], None] | None = None, db_url: str | None = None) -> list[dict]:
+    """在全新的資料庫上依序執行各組量測（寫入一定會執行，其他組依 groups 選擇）"""
+    runner = Runner(spec.logs, repeat)
+    with open_service(storage, db_url) as service:
+        for group in GROUPS:
+            if group != "insert" and group not in groups:
+                continue
+            if progress:
+                progress(f"{spec.logs} 筆：{group}")
+            BENCHMARKS[group](runner, service, spec)
+    if "insert" not in groups:
+        runner.results = [r for r in runner.results if not r["name"].startswith("insert.")]
+    return runner.results
+
+
+def environment() -> dict:
+    """執行環境與版本（寫入結果檔，方便跨提交比較）"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def run_suite(sizes: list[int], spec: LedgerSpec = LedgerSpec(), repeat: int = 5, storage: str = "file",
+              groups=GROUPS, progress: Callable[[str], None] | None = None, db_url: str | None = None) -> dict:
+    """對每個資料量執行基準測試（db_url 見 open_service）
+
+    Returns:
+        dict: {"environment": {...}, "config": {...}, "results": [{"size", "name", "repeat", "min_s", "median_s", "mean_s", "rows", "rows_per_sec"}]}
+    """
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        raise ValueError(f"未知的量測組：{', '.join(sorted(unknown))}")
+    results = []
+    for size in sizes:
+        results.extend(run_size(spec._replace(logs=size), repeat, storage, groups, progress, db_url))
+    return {
+        "environment": environment(),
+        "config": {
+            "sizes": list(sizes),
+            "categories": spec.categories,
+            "years": spec.years,
+            "start": spec.start.isoformat(),
+            "seed": spec.seed,
+            "repeat": repeat,
+            "storage": storage if db_url is None else make_url(db_url).render_as_string(hide_password=True),
+            "groups": list(groups),
+        },
+        "results": results,
+    }
+
+
+def compare(base: dict, new: dict, threshold: float = 1.10) -> list[dict]:
+    """比較兩次結果的 median_s（ratio > threshold 視為退步）
+
+    Returns:
+        list[dict]: {"size", "name", "base_s", "new_s", "ratio", "regression"}，只含兩邊都有的項目
+    """
+    base_by_key = {(r["size"], r["name"]): r for r in base["results"]}
+    rows = []
+    for r in new["results"]:
+        b = base_by_key.get((r["size"], r["name"]))
+        if b is None:
+            continue
+        ratio = r["median_s"] / b["median_s"] if b["median_s"] > 0 else float("inf")
+        rows.append({
+            "size": r["size"],
+            "name": r["name"],
+            "base_s": b["median_s"],
+            "new_s": r["median_s"],
+            "ratio": ratio,
+            "regression": ratio > threshold,
+        })
+    return rows
@@ -0,0 +1,511 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import joinedload
+from dataBase.FinanceDB import (
+    Base, Category, CategoryVersion, FinanceLog, Direction, SortField, LOG_ROW_COLUMNS,
+    FinanceDB, FinanceService, CachedCategory, _CategoryCache,
+)
+from dataBase.FinanceBackend import backend_for
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import AsyncIterator, Iterable
+import asyncio
+import time
+
+
+class AsyncFinanceDB:
+    """非同步資料層：與 FinanceDB 相同的 CRUD／過濾／排序，建立在 SQLAlchemy asyncio 上
+
+    每個方法使用自己的 AsyncSession，可安全地被多個協程同時呼叫。
+    使用前需先 await init_schema()。
+    """
+    def __init__(self,
+        db_url="sqlite+aiosqlite:///finance.db",
+        echo=False,
+        journal_mode: str | None = None,
+        busy_timeout: int | None = 5000,
+        pool_size: int | None = None,
+        max_overflow: int | None = None
+    ):
+        """初始化資料庫連接
+
+        Args:
+            db_url: 非同步資料庫連接字串（本機為 sqlite+aiosqlite，PostgreSQL 為 postgresql+asyncpg）
+            echo: 是否顯示 SQLAlchemy 執行的 SQL 語句
+            journal_mode: SQLite journal_mode（例如 "WAL"），None 表示沿用資料庫設定
+            busy_timeout: SQLite 等待鎖定的毫秒數，None 表示不設定
+            pool_size: 連線池大小（None 表示使用預設值）
+            max_overflow: 連線池可額外建立的連線數（None 表示使用預設值）"""
+        try:
+            engine_kwargs = {"echo": echo}
+            if pool_size is not None:
+                engine_kwargs["pool_size"] = pool_size
+            if max_overflow is not None:
+                engine_kwargs["max_overflow"] = max_overflow
+            self.engine = create_async_engine(db_url, **engine_kwargs)
+            self.backend = backend_for(self.engine.dialect.name)
+            self.backend.configure(self.engine.sync_engine, journal_mode, busy_timeout)
+            self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        except Exception as e:
+            print(f"初始化資料庫時發生錯誤：{str(e)}")
+            raise
+
+    async def init_schema(self):
+        """建立資料表並升級既有資料庫結構"""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(self.backend.migrate)
+
+    async def close(self):
+        """關閉資料庫連接"""
+        await self.engine.dispose()
+
+    # Category (CRUD)
+    async def create_category(self, name: str, default_type: Direction) -> Category:
+        """建立新類別"""
+        async with self.Session() as session:
+            cat = Category(name=name, default_type=default_type)
+            session.add(cat)
+            await session.commit()
+            return cat
+
+    async def get_category_by_name(self, name: str) -> Category | None:
+        """用名稱查詢類別"""
+        async with self.Session() as session:
+            return await session.scalar(select(Category).filter_by(name=name))
+
+    async def delete_category_by_id(self, category_id: int) -> bool:
+        """刪除指定ID的類別"""
+        async with self.Session() as session:
+            cat = await session.get(Category, category_id)
+            if not cat:
+                return False
+            await session.delete(cat)
+            await session.commit()
+            return True
+
+    async def get_category_version(self) -> int:
+        """取得類別資料版本（任何程序異動 category 都會遞增）"""
+        async with self.Session() as session:
+            return await session.scalar(select(CategoryVersion.version).filter_by(id=1)) or 0
+
+    async def get_all_categories(self) -> list[Category]:
+        """取得所有類別"""
+        async with self.Session() as session:
+            return list(await session.scalars(select(Category).order_by(Category.name)))
+
+    async def update_category(self, category_id: int, name: str | None = None, default_type: Direction | None = None) -> Category | None:
+        """修改類別"""
+        async with self.Session() as session:
+            cat = await session.get(Category, category_id)
+            if not cat:
+                return None
+            if name is not None:
+                # 檢查新名稱是否已存在（排除自己）
+                existing = await session.scalar(select(Category).filter(Category.name == name, Category.id != category_id))
+                if existing:
+                    raise ValueError(f"類別名稱 '{name}' 已存在")
+                cat.name = name
+            if default_type is not None:
+                cat.default_type = default_type
+            await session.commit()
+            return cat
+
+    # FinanceLog (CRUD)
+    async def create_log(self, category_id: int, actual_type: Direction | None, amount: float, note: str | None = None, timestamp: datetime | None = None) -> FinanceLog:
+        """建立新財務日誌"""
+        async with self.Session() as session:
+            ts = timestamp or datetime.utcnow()
+            log = FinanceLog(category_id=category_id, actual_type=actual_type, amount=amount, note=note, timestamp=ts)
+            session.add(log)
+            await session.commit()
+            # refresh to populate relationship
+            await session.refresh(log, ["category"])
+            return log
+
+    async def create_logs_bulk(self, rows: Iterable[dict], chunk_size: int = 5000) -> list[int]:
+        """批次建立財務日誌（單一交易），回傳新增日誌的ID（依輸入順序）
+
+        與 FinanceDB.create_logs_bulk 相同由後端的 insert_logs 寫入（在 run_sync 中執行）；
+        非同步驅動程式沒有 COPY 介面，PostgreSQL 會改用 INSERT ... RETURNING。
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size 必須為正整數")
+        ids: list[int] = []
+        it = iter(rows)
+        async with self.Session() as session:
+            while True:
+                chunk = [FinanceDB._log_insert_params(r) for r in islice(it, chunk_size)]
+                if not chunk:
+                    break
+                ids.extend(await session.run_sync(self.backend.insert_logs, chunk))
+            await session.commit()
+        return ids
+
+    async def get_log_by_id(self, log_id: int) -> FinanceLog | None:
+        """依ID查詢單筆日誌（含類別）"""
+        async with self.Session() as session:
+            return await session.scalar(
+                select(FinanceLog).options(joinedload(FinanceLog.category)).filter_by(id=log_id)
+            )
+
+    def _log_rows_statement(self, sort_by, reverse, filters, limit=None, after=None):
+        """建立欄位投影的日誌查詢（與 FinanceDB.logs_query(columns=True) 相同）"""
+        stmt = select(*LOG_ROW_COLUMNS).outerjoin(Category, FinanceLog.category_id == Category.id)
+        stmt = FinanceDB._apply_log_filters(stmt, filters)
+        return FinanceDB._apply_log_order(stmt, sort_by, reverse, limit, after, self.backend.nulls_low)
+
+    async def get_log_rows(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        limit: int | None = None,
+        after: tuple | None = None
+    ) -> list[tuple]:
+        """取得排序後的日誌欄位 Row（含類別名稱；游標之後的 NULL 排序值處理同 FinanceDB._fetch_after）"""
+        async with self.Session() as session:
+            rows = list(await session.execute(self._log_rows_statement(sort_by, reverse, filters, limit, after)))
+            tail = FinanceDB._null_tail(sort_by, reverse, limit, after, len(rows), self.backend.nulls_low)
+            if tail is not None:
+                rows += await session.execute(
+                    self._log_rows_statement(sort_by, reverse, filters, limit - len(rows) if limit else None, tail)
+                )
+            return rows
+
+    async def search_notes(self, query: str, filters: dict | None = None, limit: int | None = 50) -> list[tuple]:
+        """以全文索引搜尋備註（參數與回傳同 FinanceDB.search_notes）"""
+        async with self.Session() as session:
+            return list(await session.execute(FinanceDB._search_notes_statement(self.backend, query, filters, limit)))
+
+    async def iter_log_rows(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[tuple]:
+        """逐批串流日誌欄位 Row，記憶體用量不隨筆數成長"""
+        if batch_size <= 0:
+            raise ValueError("batch_size 必須為正整數")
+        stmt = self._log_rows_statement(sort_by, reverse, filters).execution_options(yield_per=batch_size)
+        async with self.Session() as session:
+            result = await session.stream(stmt)
+            async for row in result:
+                yield row
+
+    async def sum_by(self, group_by: str | tuple[str, ...], filters: dict | None = None, use_rollup: bool = True) -> list[tuple]:
+        """以單一 GROUP BY 計算金額合計（參數與 FinanceDB.sum_by 相同）"""
+        async with self.Session() as session:
+            result = await session.execute(FinanceDB._sum_by_statement(group_by, filters, use_rollup))
+            return [tuple(r) for r in result]
+
+    async def update_log(self,
+        log_id: int,
+        category_id: int | None = None,
+        actual_type: Direction | None = None,
+        amount: float | None = None,
+        note: str | None = None,
+        timestamp: datetime | None = None
+    ) -> FinanceLog | None:
+        """修改財務日誌"""
+        async with self.Session() as session:
+            log = await session.get(FinanceLog, log_id)
+            if not log:
+                return None
+            if category_id is not None:
+                # 確認類別存在
+                if not await session.get(Category, category_id):
+                    raise ValueError(f"找不到類別ID '{category_id}'")
+                log.category_id = category_id
+            if actual_type is not None:
+                log.actual_type = actual_type
+            if amount is not None:
+                log.amount = amount
+            if note is not None:
+                log.note = note
+            if timestamp is not None:
+                log.timestamp = timestamp
+            await session.commit()
+            # refresh to populate relationship
+            await session.refresh(log, ["category"])
+            return log
+
+
+class AsyncFinanceService:
+    """非同步邏輯層：FinanceService 的類別、日誌 CRUD、過濾排序、分頁、搜尋與彙總功能，回傳格式化資料
+
+    目前僅供程式庫使用：REST API（api/DataBaseAPI.py）仍以同步 FinanceService 處理請求
+    （FastAPI 在 threadpool 中執行），未結項目、批次修改、查詢結果快取、量測與唯讀副本只有同步版本。
+    兩者的延遲比較見 python -m benchmarks.scenarios async-http。
+    """
+    def __init__(self, db: AsyncFinanceDB, category_cache_ttl: float = 1.0):
+        """
+        Args:
+            db: 非同步資料層
+            category_cache_ttl: 類別快取檢查資料版本的間隔秒數（0 表示每次查詢都檢查）
+        """
+        self.db = db
+        self.category_cache_ttl = category_cache_ttl
+        self._cat_cache = _CategoryCache()
+        self._cat_lock = asyncio.Lock()
+
+    async def close(self):
+        """關閉資料庫連接"""
+        await self.db.close()
+
+    # 類別快取
+    def _invalidate_categories(self):
+        """清除類別快取（類別異動後呼叫）"""
+        self._cat_cache.by_name = None
+
+    async def _categories(self) -> dict[str, CachedCategory]:
+        """取得 name→類別 快取；資料版本改變（含其他程序的異動）時重新載入"""
+        cache = self._cat_cache
+        by_name = cache.by_name
+        if by_name is not None and time.monotonic() - cache.checked_at < self.category_cache_ttl:
+            cache.count(hit=True)
+            return by_name
+        async with self._cat_lock:
+            version = await self.db.get_category_version()
+            cache.checked_at = time.monotonic()
+            if cache.by_name is not None and version == cache.version:
+                cache.count(hit=True)
+                return cache.by_name
+            cache.count(hit=False)
+            cats = await self.db.get_all_categories()
+            cache.name_by_id = {c.id: c.name for c in cats}
+            cache.by_name = {c.name: CachedCategory(c.id, c.name, c.default_type) for c in cats}
+            cache.version = version
+            return cache.by_name
+
+    async def _get_category(self, name: str) -> CachedCategory | None:
+        """由快取以名稱查詢類別"""
+        return (await self._categories()).get(name)
+
+    def category_cache_stats(self) -> dict:
+        """類別快取統計（命中、未命中、項目數、資料版本）"""
+        cache = self._cat_cache
+        with cache.stats_lock:
+            hits, misses = cache.hits, cache.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "size": len(cache.by_name or {}),
+            "version": cache.version,
+        }
+
+    # Category 高階功能
+    async def add_category(self, name: str, default_type: Direction) -> dict:
+        """新增類別（高階功能）"""
+        if not name or not isinstance(name, str):
+            raise ValueError("name 必須為非空字串")
+        if not isinstance(default_type, Direction):
+            raise ValueError("default_type 必須為 Direction")
+        if await self._get_category(name):
+            raise ValueError("category 已存在")
+        cat = await self.db.create_category(name, default_type)
+        self._invalidate_categories()
+        return {"id": cat.id, "name": cat.name, "default_type": cat.default_type.value}
+
+    async def delete_category(self, name: str) -> bool:
+        """刪除類別（高階功能）"""
+        cat = await self._get_category(name)
+        if not cat:
+            return False
+        deleted = await self.db.delete_category_by_id(cat.id)
+        self._invalidate_categories()
+        return deleted
+
+    async def get_all_categories(self) -> list[dict]:
+        """取得所有類別（高階功能）"""
+        cats = await self.db.get_all_categories()
+        return [{"id": c.id, "name": c.name, "default_type": c.default_type.value} for c in cats]
+
+    async def update_category(self, category_id: int, name: str | None = None, default_type: Direction | None = None) -> dict | None:
+        """修改類別（高階功能）"""
+        if name is not None and (not isinstance(name, str) or not name):
+            raise ValueError("name 必須為非空字串")
+        if default_type is not None and not isinstance(default_type, Direction):
+            raise ValueError("default_type 必須為 Direction")
+        cat = await self.db.update_category(category_id, name, default_type)
+        self._invalidate_categories()
+        if not cat:
+            return None
+        return {"id": cat.id, "name": cat.name, "default_type": cat.default_type.value}
+
+    # Log 高階功能
+    async def add_log(self, category_name: str, amount: float, actual_type: Direction | None = None, note: str | None = None, actuall_time: datetime | None = None) -> dict:
+        """新增財務日誌（高階功能）"""
+        FinanceService._validate_log_fields(category_name, amount, actual_type, note, actuall_time)
+        cat = await self._get_category(category_name)
+        if not cat:
+            raise ValueError(f"找不到類別 '{category_name}'")
+        log = await self.db.create_log(
+            category_id=cat.id,
+            actual_type=actual_type or cat.default_type,
+            amount=amount,
+            note=note,
+            timestamp=actuall_time
+        )
+        return FinanceService._log_to_dict(log)
+
+    async def add_logs_bulk(self, logs: Iterable[dict], chunk_size: int = 5000) -> dict:
+        """批次新增財務日誌（參數與回傳同 FinanceService.add_logs_bulk）"""
+        cats = await self._categories()
+        rows = []
+        for i, item in enumerate(logs):
+            category_name = item.get("category_name")
+            actual_type = item.get("actual_type")
+            try:
+                FinanceService._validate_log_fields(category_name, item.get("amount"), actual_type, item.get("note"), item.get("actuall_time"))
+            except ValueError as e:
+                raise ValueError(f"第 {i} 筆資料錯誤：{e}") from None
+            cat = cats.get(category_name)
+            if not cat:
+                raise ValueError(f"第 {i} 筆資料錯誤：找不到類別 '{category_name}'")
+            rows.append({
+                "category_id": cat.id,
+                "actual_type": actual_type or cat.default_type,
+                "amount": item.get("amount"),
+                "note": item.get("note"),
+                "timestamp": item.get("actuall_time"),
+                "import_hash": item.get("import_hash"),
+            })
+        ids = await self.db.create_logs_bulk(rows, chunk_size=chunk_size)
+        return {"count": len(ids), "ids": ids}
+
+    async def get_log_by_id(self, log_id: int) -> dict | None:
+        """依ID查詢單筆日誌（字典格式）"""
+        log = await self.db.get_log_by_id(log_id)
+        return FinanceService._log_to_dict(log) if log else None
+
+    async def _build_filters(self,
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        note_keyword: str | None = None
+    ) -> dict | None:
+        """將高階過濾參數轉為資料層過濾條件；類別不存在時回傳 None"""
+        filters = {}
+        if category_name:
+            cat = await self._get_category(category_name)
+            if not cat:
+                return None
+            filters['category_id'] = cat.id
+        if direction:
+            filters['actual_type'] = direction
+        if min_amount is not None:
+            filters['min_amount'] = min_amount
+        if max_amount is not None:
+            filters['max_amount'] = max_amount
+        if start_date:
+            filters['start_date'] = start_date
+        if end_date:
+            filters['end_date'] = end_date
+        if note_keyword:
+            filters['note_keyword'] = note_keyword
+        return filters
+
+    async def get_filtered_and_sorted_logs(self,
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        note_keyword: str | None = None,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        limit: int | None = None,
+        after: tuple | None = None
+    ) -> list[dict]:
+        """取得過濾並排序後的日誌清單（參數同 FinanceService.get_filtered_and_sorted_logs）"""
+        filters = await self._build_filters(category_name, direction, min_amount, max_amount, start_date, end_date, note_keyword)
+        if filters is None:
+            return []
+        rows = await self.db.get_log_rows(sort_by, reverse, filters, limit, after)
+        return [FinanceService._row_to_dict(r) for r in rows]
+
+    async def iter_logs(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        batch_size: int = 1000,
+        **filter_kwargs
+    ) -> AsyncIterator[dict]:
+        """逐筆產生日誌字典（資料庫端分批讀取），適合大量匯出"""
+        filters = await self._build_filters(**filter_kwargs)
+        if filters is None:
+            return
+        async for r in self.db.iter_log_rows(sort_by, reverse, filters, batch_size):
+            yield FinanceService._row_to_dict(r)
+
+    async def search_notes(self, query: str, limit: int | None = 50, **filter_kwargs) -> list[dict]:
+        """全文搜尋備註，依相關度排序（參數與回傳同 FinanceService.search_notes）"""
+        filters = await self._build_filters(**filter_kwargs)
+        if filters is None:
+            return []
+        return [{**FinanceService._row_to_dict(r), "rank": r.rank} for r in await self.db.search_notes(query, filters, limit)]
+
+    async def get_logs_page(self,
+        limit: int = 50,
+        after: tuple | None = None,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        **filter_kwargs
+    ) -> dict:
+        """以 keyset 分頁取得日誌（參數與回傳同 FinanceService.get_logs_page）"""
+        if not isinstance(limit, int) or limit <= 0:
+            raise ValueError("limit 必須為正整數")
+        items = await self.get_filtered_and_sorted_logs(sort_by=sort_by, reverse=reverse, limit=limit, after=after, **filter_kwargs)
+        next_after = FinanceService.log_cursor(items[-1], sort_by) if len(items) == limit else None
+        return {"items": items, "next_after": next_after}
+
+    async def get_totals(self, group_by: str = "direction", **filter_kwargs) -> dict:
+        """依指定方式計算總金額（由資料庫 GROUP BY 完成；非 direction 分組為淨額，同 FinanceService.get_totals）"""
+        filters = await self._build_filters(**filter_kwargs)
+        if filters is None:
+            return {}
+        return FinanceService._totals_from_rows(await self.db.sum_by(FinanceService._totals_group(group_by), filters))
+
+    async def get_total_by_type(self, **filter_kwargs) -> dict:
+        """計算各交易方向的總金額"""
+        return await self.get_totals("direction", **filter_kwargs)
+
+    async def period_summary(self, year: int, granularity: str = "month") -> dict:
+        """產生指定年份的收入/支出摘要（單一分組查詢）"""
+        periods, filters = FinanceService._period_range(year, granularity)
+        rows = await self.db.sum_by((granularity, "direction", "category"), filters)
+        return FinanceService._build_period_summary(periods, rows)
+
+    async def update_log(self,
+        log_id: int,
+        category_name: str | None = None,
+        actual_type: Direction | None = None,
+        amount: float | None = None,
+        note: str | None = None,
+        timestamp: datetime | None = None
+    ) -> dict | None:
+        """修改財務日誌（高階功能）"""
+        category_id = None
+        if category_name is not None:
+            if not isinstance(category_name, str) or not category_name:
+                raise ValueError("category_name 必須為非空字串")
+            cat = await self._get_category(category_name)
+            if not cat:
+                raise ValueError(f"找不到類別 '{category_name}'")
+            category_id = cat.id
+        if actual_type is not None and not isinstance(actual_type, Direction):
+            raise ValueError("actual_type 必須為 Direction")
+        if amount is not None and not isinstance(amount, (int, float, Decimal)):
+            raise ValueError("amount 必須為數字")
+        if note is not None and not isinstance(note, str):
+            raise ValueError("note 必須為字串")
+        if timestamp is not None and not isinstance(timestamp, datetime):
+            raise ValueError("timestamp 必須為 datetime")
+        log = await self.db.update_log(log_id, category_id, actual_type, amount, note, timestamp)
+        if not log:
+            return None
+        return FinanceService._log_to_dict(log)
@@ -0,0 +1,189 @@
+from sqlalchemy import select, case, cast, type_coerce, func, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from dataBase.FinanceDB import FinanceDB, FinanceService, FinanceLog, Direction, from_cents
+from typing import NamedTuple
+
+# numpy / pandas 為選用套件，只有欄位式匯出需要
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 方向代碼：list(Direction) 的索引，-1 表示 NULL
+DIRECTIONS = list(Direction)
+# datetime64 的 NaT（timestamp 為 NULL 時使用）
+NAT = -(2 ** 63)
+_UNITS = {"day": "D", "month": "M", "year": "Y"}
+
+
+class LogArrays(NamedTuple):
+    """欄位式日誌資料（每個欄位一個 numpy 陣列，長度相同）"""
+    id: "np.ndarray"               # int64
+    timestamp_us: "np.ndarray"     # int64，UTC epoch 微秒；NULL 為 NaT
+    category_id: "np.ndarray"      # int64，NULL 為 -1
+    direction: "np.ndarray"        # int8，DIRECTIONS 的索引；NULL 為 -1
+    amount_cents: "np.ndarray"     # int64，整數分；NULL 為 0
+    category_names: dict           # {category_id: 名稱}
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def select(self, mask) -> "LogArrays":
+        """以布林遮罩或索引取出部分資料"""
+        return LogArrays(*(a[mask] for a in self[:5]), self.category_names)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("欄位式匯出需要 numpy：pip install numpy")
+
+
+class epoch_us(FunctionElement):
+    """時間欄位的 UTC epoch 微秒（整數），依方言編譯"""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(epoch_us)
+def _epoch_us_default(element, compiler, **kw):
+    # SQLite 以 'YYYY-MM-DD HH:MM:SS.ffffff' 儲存，秒數與微秒分開取才不會有浮點誤差
+    ts = list(element.clauses)[0]
+    return compiler.process(cast(func.strftime("%s", ts), Integer) * 1_000_000 + cast(func.substr(ts, 21, 6), Integer), **kw)
+
+
+@compiles(epoch_us, "postgresql")
+def _epoch_us_postgresql(element, compiler, **kw):
+    # EXTRACT 回傳 numeric（精確到微秒）
+    return f"CAST(EXTRACT(EPOCH FROM {compiler.process(element.clauses, **kw)}) * 1000000 AS BIGINT)"
+
+
+def log_arrays_statement(filters: dict | None = None):
+    """建立欄位式匯出的查詢：所有欄位都在 SQL 端轉為整數，取回後可直接組成 int64 陣列"""
+    ts_us = epoch_us(FinanceLog.timestamp)
+    direction = case(*((FinanceLog.actual_type == d, i) for i, d in enumerate(DIRECTIONS)), else_=-1)
+    stmt = select(
+        FinanceLog.id,
+        func.coalesce(ts_us, NAT),
+        func.coalesce(FinanceLog.category_id, -1),
+        direction,
+        func.coalesce(type_coerce(FinanceLog.amount, Integer), 0),
+    )
+    return FinanceDB._apply_log_filters(stmt, filters).order_by(FinanceLog.id)
+
+
+def empty_log_arrays(category_names: dict | None = None) -> LogArrays:
+    """建立零筆的 LogArrays"""
+    _require_numpy()
+    i64 = np.empty(0, dtype=np.int64)
+    return LogArrays(i64, i64.copy(), i64.copy(), np.empty(0, dtype=np.int8), i64.copy(), category_names or {})
+
+
+def fetch_log_arrays(db: FinanceDB, filters: dict | None = None, batch_size: int = 65536) -> LogArrays:
+    """由 DBAPI cursor 分批取回 tuple 直接轉成 numpy 陣列（不建立 ORM 物件、Row 或字典）"""
+    _require_numpy()
+    if batch_size <= 0:
+        raise ValueError("batch_size 必須為正整數")
+    names = {c.id: c.name for c in db.get_all_categories()}
+    conn = db.session.connection()
+    # 與 explain_query_plan 相同以 literal_binds 編譯，過濾值由各欄位型別轉換
+    sql = str(log_arrays_statement(filters).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    cur = conn.connection.cursor()
+    try:
+        cur.execute(sql)
+        chunks = []
+        while rows := cur.fetchmany(batch_size):
+            chunks.append(np.array(rows, dtype=np.int64))
+    finally:
+        cur.close()
+    if not chunks:
+        return empty_log_arrays(names)
+    data = np.concatenate(chunks)
+    return LogArrays(
+        np.ascontiguousarray(data[:, 0]),
+        np.ascontiguousarray(data[:, 1]),
+        np.ascontiguousarray(data[:, 2]),
+        data[:, 3].astype(np.int8),
+        np.ascontiguousarray(data[:, 4]),
+        names,
+    )
+
+
+def to_dataframe(arrays: LogArrays):
+    """LogArrays 轉為 pandas DataFrame（類別與方向為 Categorical）"""
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("to_dataframe 需要 pandas：pip install pandas") from None
+    return pd.DataFrame({
+        "id": arrays.id,
+        "timestamp": pd.to_datetime(arrays.timestamp_us, unit="us"),
+        "category_id": arrays.category_id,
+        "category": pd.Series(arrays.category_id).map(arrays.category_names).astype("category"),
+        "direction": pd.Categorical.from_codes(arrays.direction, categories=[d.value for d in DIRECTIONS]),
+        "amount_cents": arrays.amount_cents,
+        "amount": arrays.amount_cents / 100,
+    })
+
+
+def _key_codes(arrays: LogArrays, group_by: str):
+    """取得分組鍵的整數代碼"""
+    if group_by == "direction":
+        return arrays.direction
+    if group_by == "category":
+        return arrays.category_id
+    if group_by in _UNITS:
+        ts = arrays.timestamp_us.view("datetime64[us]")
+        return ts.astype(f"datetime64[{_UNITS[group_by]}]").view(np.int64)
+    raise ValueError("group_by 必須為 direction、category、day、month 或 year")
+
+
+def _decode_keys(arrays: LogArrays, group_by: str, codes) -> list:
+    """分組代碼轉回與 FinanceDB.sum_by 相同的鍵值（Direction、類別名稱、日期字串）"""
+    if group_by == "direction":
+        return [DIRECTIONS[c] if c >= 0 else None for c in codes.tolist()]
+    if group_by == "category":
+        return [arrays.category_names.get(c) for c in codes.tolist()]
+    text = np.datetime_as_string(codes.view(f"datetime64[{_UNITS[group_by]}]"))
+    return [None if t == "NaT" else t for t in text.tolist()]
+
+
+def group_totals(arrays: LogArrays, group_by: str | tuple[str, ...]) -> list[tuple]:
+    """向量化分組加總，回傳格式與 FinanceDB.sum_by 相同
+
+    Args:
+        arrays: fetch_log_arrays 的結果
+        group_by: 分組方式（"direction"、"category"、"day"、"month"、"year"），可傳 tuple 做多欄分組
+    Returns:
+        list[tuple]: (分組鍵..., 總金額 Decimal, 筆數)，依分組鍵代碼排序
+    """
+    _require_numpy()
+    group_names = (group_by,) if isinstance(group_by, str) else tuple(group_by)
+    codes = [_key_codes(arrays, g) for g in group_names]
+    n = len(arrays)
+    if n == 0:
+        return []
+    # 排序後相鄰代碼不同處即為新分組，以 reduceat 做整數加總（結果精確）
+    order = np.lexsort(codes[::-1])
+    sorted_codes = [c[order] for c in codes]
+    boundary = np.zeros(n, dtype=bool)
+    boundary[0] = True
+    for c in sorted_codes:
+        boundary[1:] |= c[1:] != c[:-1]
+    starts = np.flatnonzero(boundary)
+    totals = np.add.reduceat(arrays.amount_cents[order], starts)
+    counts = np.diff(np.append(starts, n))
+    keys = [_decode_keys(arrays, g, c[starts]) for g, c in zip(group_names, sorted_codes)]
+    return [
+        (*key, from_cents(total), count)
+        for *key, total, count in zip(*keys, totals.tolist(), counts.tolist())
+    ]
+
+
+def period_summary(arrays: LogArrays, year: int, granularity: str = "month") -> dict:
+    """由欄位資料產生與 FinanceService.period_summary 相同的摘要"""
+    _require_numpy()
+    periods, _filters = FinanceService._period_range(year, granularity)
+    in_year = _key_codes(arrays, "year") == year - 1970
+    rows = group_totals(arrays.select(in_year), (granularity, "direction", "category"))
+    return FinanceService._build_period_summary(periods, rows)
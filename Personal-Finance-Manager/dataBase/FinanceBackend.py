@@ -0,0 +1,693 @@
+"""儲存後端：依連接字串的資料庫選擇方言專屬的路徑
+
+查詢與 CRUD 以 SQLAlchemy 運算式撰寫，各資料庫共用（期間分組由 period_key／period_group 依方言編譯）；
+無法以運算式表達的部分由後端提供：連線設定、結構升級與觸發器、批次寫入、備註搜尋與執行計畫。
+依賴方向為 FinanceModels ← FinanceBackend ← FinanceDB：後端只使用資料模型，不呼叫 FinanceDB。
+
+    SQLite（預設）：PRAGMA、SQLite 觸發器、FTS5 trigram 備註索引
+    PostgreSQL 15 以上：plpgsql 觸發器（彙總以語句層級觸發器與 ON CONFLICT 合併）、
+                        COPY 批次寫入、pg_trgm 備註索引
+"""
+from sqlalchemy import MetaData, column, event, func, insert, literal, select, table, text
+from sqlalchemy.exc import DBAPIError
+from dataBase.FinanceModels import FinanceLog, Category, DailyRollup, LOG_ROW_COLUMNS, to_cents
+from abc import ABC, abstractmethod
+import io
+
+
+# SQLite 觸發器（PostgreSQL 版本見 POSTGRES_TRIGGERS，同名的觸發器行為相同）
+
+# 彙總鍵比對使用 IS，類別或方向為 NULL 的日誌也能正確累加
+_ROLLUP_ADD = """
+    INSERT INTO daily_rollup (day, category_id, actual_type, total, count)
+    SELECT substr(NEW.timestamp, 1, 10), NEW.category_id, NEW.actual_type, 0, 0
+    WHERE NOT EXISTS (SELECT 1 FROM daily_rollup WHERE day IS substr(NEW.timestamp, 1, 10)
+        AND category_id IS NEW.category_id AND actual_type IS NEW.actual_type);
+    UPDATE daily_rollup SET total = total + COALESCE(NEW.amount, 0), count = count + 1
+    WHERE day IS substr(NEW.timestamp, 1, 10) AND category_id IS NEW.category_id AND actual_type IS NEW.actual_type;
+"""
+_ROLLUP_SUB = """
+    UPDATE daily_rollup SET total = total - COALESCE(OLD.amount, 0), count = count - 1
+    WHERE day IS substr(OLD.timestamp, 1, 10) AND category_id IS OLD.category_id AND actual_type IS OLD.actual_type;
+    DELETE FROM daily_rollup WHERE count <= 0 AND day IS substr(OLD.timestamp, 1, 10)
+        AND category_id IS OLD.category_id AND actual_type IS OLD.actual_type;
+"""
+ROLLUP_TRIGGERS = {
+    "trg_rollup_insert": f"AFTER INSERT ON finance_log BEGIN {_ROLLUP_ADD} END",
+    "trg_rollup_delete": f"AFTER DELETE ON finance_log BEGIN {_ROLLUP_SUB} END",
+    "trg_rollup_update": f"AFTER UPDATE OF category_id, actual_type, amount, timestamp ON finance_log BEGIN {_ROLLUP_SUB} {_ROLLUP_ADD} END",
+}
+
+# 日誌異動時刪除該月（含）之後的餘額檢查點；新舊時間都要處理（update 可能把日誌移到其他月份）
+_CHECKPOINT_DROP_NEW = "DELETE FROM balance_checkpoint WHERE month >= substr(NEW.timestamp, 1, 7);"
+_CHECKPOINT_DROP_OLD = "DELETE FROM balance_checkpoint WHERE month >= substr(OLD.timestamp, 1, 7);"
+BALANCE_CHECKPOINT_TRIGGERS = {
+    "trg_balance_checkpoint_insert": f"AFTER INSERT ON finance_log BEGIN {_CHECKPOINT_DROP_NEW} END",
+    "trg_balance_checkpoint_delete": f"AFTER DELETE ON finance_log BEGIN {_CHECKPOINT_DROP_OLD} END",
+    "trg_balance_checkpoint_update": f"AFTER UPDATE OF actual_type, amount, timestamp ON finance_log BEGIN {_CHECKPOINT_DROP_OLD} {_CHECKPOINT_DROP_NEW} END",
+}
+
+# 備註全文索引：FTS5 外部內容表（文字仍只存在 finance_log），由觸發器同步
+# trigram 以每 3 個字元為一個詞：中文備註沒有空白可斷詞（unicode61 會把整段中文當成一個詞），
+# 子字串比對才找得到句中的詞；3 字元以下的詞由 search_notes_statement 改以 LIKE 比對
+NOTE_FTS_TOKENIZER = "trigram case_sensitive 0"
+NOTE_FTS_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS finance_log_fts USING fts5("
+    f"note, content='finance_log', content_rowid='id', tokenize='{NOTE_FTS_TOKENIZER}')"
+)
+_FTS_INSERT = "INSERT INTO finance_log_fts (rowid, note) VALUES (NEW.id, NEW.note);"
+_FTS_DELETE = "INSERT INTO finance_log_fts (finance_log_fts, rowid, note) VALUES ('delete', OLD.id, OLD.note);"
+NOTE_FTS_TRIGGERS = {
+    "trg_note_fts_insert": f"AFTER INSERT ON finance_log BEGIN {_FTS_INSERT} END",
+    "trg_note_fts_delete": f"AFTER DELETE ON finance_log BEGIN {_FTS_DELETE} END",
+    "trg_note_fts_update": f"AFTER UPDATE OF note ON finance_log BEGIN {_FTS_DELETE} {_FTS_INSERT} END",
+}
+note_fts = table("finance_log_fts", column("rowid"), column("rank"))
+
+# 應收應付項目：Receivable / Payable 日誌新增、修改、改變方向時同步 open_item（刪除由外鍵串聯）
+_OPEN_TYPES_SQL = "('Receivable', 'Payable')"
+_OPEN_ITEM_INSERT = f"""
+    INSERT OR IGNORE INTO open_item (log_id, direction, category_id, opened_at, amount, settled, outstanding)
+    SELECT NEW.id, NEW.actual_type, NEW.category_id, NEW.timestamp, COALESCE(NEW.amount, 0), 0, COALESCE(NEW.amount, 0)
+    WHERE NEW.actual_type IN {_OPEN_TYPES_SQL};
+"""
+
+def _refresh_open_item(item_id: str) -> str:
+    """依沖銷紀錄重算項目的已沖銷、未結金額與結清時間（只讀取該項目的沖銷，走 ix_settlement_item）"""
+    settled = f"(SELECT COALESCE(SUM(amount), 0) FROM settlement WHERE item_id = {item_id})"
+    return (
+        f"UPDATE open_item SET settled = {settled}, outstanding = amount - {settled}, "
+        f"closed_at = CASE WHEN amount <= {settled} "
+        f"THEN (SELECT MAX(settled_at) FROM settlement WHERE item_id = {item_id}) END "
+        f"WHERE log_id = {item_id};"
+    )
+
+OPEN_ITEM_TRIGGERS = {
+    "trg_open_item_insert": f"AFTER INSERT ON finance_log WHEN NEW.actual_type IN {_OPEN_TYPES_SQL} BEGIN {_OPEN_ITEM_INSERT} END",
+    # 已有沖銷的項目不可改變方向或改到低於已沖銷金額；沖銷日誌同理（RAISE 讓整個語句失敗）
+    "trg_open_item_guard": (
+        "BEFORE UPDATE OF actual_type, amount ON finance_log BEGIN "
+        "SELECT RAISE(ABORT, 'open item amount or direction conflicts with its settlements') "
+        "WHERE EXISTS (SELECT 1 FROM open_item WHERE log_id = NEW.id AND settled > 0 "
+        "AND (NEW.actual_type IS NOT OLD.actual_type OR COALESCE(NEW.amount, 0) < settled)); "
+        "SELECT RAISE(ABORT, 'settlement log amount or direction conflicts with its settlements') "
+        "WHERE EXISTS (SELECT 1 FROM settlement WHERE settlement_log_id = NEW.id) "
+        "AND (NEW.actual_type IS NOT OLD.actual_type "
+        "OR COALESCE(NEW.amount, 0) < (SELECT SUM(amount) FROM settlement WHERE settlement_log_id = NEW.id)); "
+        "END"
+    ),
+    "trg_open_item_update": (
+        "AFTER UPDATE OF actual_type, amount, category_id, timestamp ON finance_log "
+        f"WHEN OLD.actual_type IN {_OPEN_TYPES_SQL} OR NEW.actual_type IN {_OPEN_TYPES_SQL} BEGIN "
+        f"DELETE FROM open_item WHERE log_id = NEW.id AND COALESCE(NEW.actual_type, '') NOT IN {_OPEN_TYPES_SQL}; "
+        f"{_OPEN_ITEM_INSERT} "
+        "UPDATE open_item SET direction = NEW.actual_type, category_id = NEW.category_id, "
+        "opened_at = NEW.timestamp, amount = COALESCE(NEW.amount, 0) WHERE log_id = NEW.id; "
+        f"{_refresh_open_item('NEW.id')} "
+        "END"
+    ),
+    # 沖銷日誌改時間時同步 settled_at（項目的結清時間由沖銷觸發器重算）
+    "trg_open_item_settled_at": (
+        "AFTER UPDATE OF timestamp ON finance_log WHEN OLD.actual_type IN ('Income', 'Expenditure') BEGIN "
+        "UPDATE settlement SET settled_at = NEW.timestamp WHERE settlement_log_id = NEW.id; "
+        "END"
+    ),
+}
+
+# 沖銷紀錄異動時重算項目（新增前先檢查不超過項目的未結金額與沖銷日誌尚未分配的金額）
+SETTLEMENT_TRIGGERS = {
+    "trg_settlement_guard": (
+        "BEFORE INSERT ON settlement BEGIN "
+        "SELECT RAISE(ABORT, 'settlement exceeds the outstanding amount') "
+        "WHERE NEW.amount <= 0 OR NEW.amount > (SELECT outstanding FROM open_item WHERE log_id = NEW.item_id); "
+        "SELECT RAISE(ABORT, 'settlement exceeds the unallocated amount of the settlement log') "
+        "WHERE NEW.amount + COALESCE((SELECT SUM(amount) FROM settlement WHERE settlement_log_id = NEW.settlement_log_id), 0) "
+        "> (SELECT COALESCE(amount, 0) FROM finance_log WHERE id = NEW.settlement_log_id); "
+        "END"
+    ),
+    "trg_settlement_insert": f"AFTER INSERT ON settlement BEGIN {_refresh_open_item('NEW.item_id')} END",
+    "trg_settlement_delete": f"AFTER DELETE ON settlement BEGIN {_refresh_open_item('OLD.item_id')} END",
+    "trg_settlement_update": (
+        "AFTER UPDATE OF item_id, amount, settled_at ON settlement BEGIN "
+        f"{_refresh_open_item('OLD.item_id')} {_refresh_open_item('NEW.item_id')} END"
+    ),
+}
+
+# 未結餘額彙總只保留還有未結項目的鍵（與 daily_rollup 相同以 IS 比對，NULL 類別與交易對象也能累加）
+_OUTSTANDING_ADD = """
+    INSERT INTO outstanding_balance (direction, category_id, counterparty, outstanding, open_count)
+    SELECT NEW.direction, NEW.category_id, NEW.counterparty, 0, 0
+    WHERE NEW.outstanding > 0 AND NOT EXISTS (SELECT 1 FROM outstanding_balance WHERE direction IS NEW.direction
+        AND category_id IS NEW.category_id AND counterparty IS NEW.counterparty);
+    UPDATE outstanding_balance SET outstanding = outstanding + NEW.outstanding, open_count = open_count + 1
+    WHERE NEW.outstanding > 0 AND direction IS NEW.direction
+        AND category_id IS NEW.category_id AND counterparty IS NEW.counterparty;
+"""
+_OUTSTANDING_SUB = """
+    UPDATE outstanding_balance SET outstanding = outstanding - OLD.outstanding, open_count = open_count - 1
+    WHERE OLD.outstanding > 0 AND direction IS OLD.direction
+        AND category_id IS OLD.category_id AND counterparty IS OLD.counterparty;
+    DELETE FROM outstanding_balance WHERE open_count <= 0 AND direction IS OLD.direction
+        AND category_id IS OLD.category_id AND counterparty IS OLD.counterparty;
+"""
+OUTSTANDING_TRIGGERS = {
+    "trg_outstanding_insert": f"AFTER INSERT ON open_item BEGIN {_OUTSTANDING_ADD} END",
+    "trg_outstanding_delete": f"AFTER DELETE ON open_item BEGIN {_OUTSTANDING_SUB} END",
+    "trg_outstanding_update": (
+        "AFTER UPDATE OF direction, category_id, counterparty, outstanding ON open_item "
+        f"BEGIN {_OUTSTANDING_SUB} {_OUTSTANDING_ADD} END"
+    ),
+}
+
+
+
+class StorageBackend(ABC):
+    """後端的共同介面與可攜的預設實作"""
+    name: str = ""
+    # explain_query_plan 的前綴
+    explain_prefix = "EXPLAIN "
+    # 升冪排序時 NULL 是否排在最前面（keyset 游標依此處理 NULL）
+    nulls_low = True
+
+    def engine_options(self, check_same_thread: bool) -> dict:
+        """create_engine 的額外參數"""
+        return {}
+
+    def configure(self, engine, journal_mode: str | None, busy_timeout: int | None, query_only: bool = False):
+        """設定 engine 的每條新連線（journal_mode、busy_timeout、query_only 只適用於 SQLite）"""
+
+    @abstractmethod
+    def migrate(self, conn):
+        """create_all 之後升級既有資料庫結構並安裝觸發器"""
+
+    @abstractmethod
+    def rebuild_rollups(self, conn) -> int:
+        """由 finance_log 重建 daily_rollup，回傳彙總列數"""
+
+    @abstractmethod
+    def rebuild_note_index(self, conn) -> None:
+        """重建備註搜尋索引"""
+
+    @abstractmethod
+    def search_notes_statement(self, query: str):
+        """建立備註比對的查詢：LOG_ROW_COLUMNS 加上 rank（越小越相關），過濾、排序與筆數由 FinanceDB 加上"""
+
+    @staticmethod
+    def _note_terms(query: str) -> list[str]:
+        """以空白分隔的搜尋詞（兩種後端都是子字串比對，詞尾的 * 不需要，去掉即可）"""
+        if not isinstance(query, str):
+            raise ValueError("query 必須為字串")
+        terms = [w.rstrip("*") for w in query.split() if w.rstrip("*")]
+        if not terms:
+            raise ValueError("query 必須包含至少一個搜尋詞")
+        return terms
+
+    @staticmethod
+    def _escape_like(term: str) -> str:
+        return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def insert_logs(self, session, params: list[dict]) -> list[int]:
+        """在 session 的交易中寫入一批日誌（FinanceDB._log_insert_params 格式），回傳依輸入順序的ID
+
+        預設為 INSERT ... RETURNING：SQLAlchemy 依驅動程式把整批組成多列 VALUES
+        （psycopg2 相當於 execute_values），並依參數順序排序回傳的ID。
+        """
+        log_table = FinanceLog.__table__
+        stmt = insert(log_table).returning(log_table.c.id, sort_by_parameter_order=True)
+        return session.scalars(stmt, params).all()
+
+
+class SQLiteBackend(StorageBackend):
+    """預設後端：SQLite"""
+    name = "sqlite"
+    explain_prefix = "EXPLAIN QUERY PLAN "
+
+    def engine_options(self, check_same_thread: bool) -> dict:
+        return {"connect_args": {"check_same_thread": check_same_thread}}
+
+    def configure(self, engine, journal_mode: str | None, busy_timeout: int | None, query_only: bool = False):
+        """每條新連線建立時套用 SQLite PRAGMA（query_only 用於報表的唯讀 engine）"""
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            # SQLite 預設不檢查外鍵，ON DELETE CASCADE 需要每條連線開啟
+            cur.execute("PRAGMA foreign_keys=ON")
+            if query_only:
+                cur.execute("PRAGMA query_only=ON")
+            if journal_mode:
+                cur.execute(f"PRAGMA journal_mode={journal_mode}")
+            if busy_timeout is not None:
+                cur.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+            cur.close()
+
+    def migrate(self, conn):
+        """升級既有資料庫結構（create_all 不會替已存在的資料表補上新索引）"""
+        migrated = self._migrate_finance_log(conn)
+        columns = {r[1] for r in conn.execute(text("PRAGMA table_info(finance_log)"))}
+        if "import_hash" not in columns:
+            conn.execute(text("ALTER TABLE finance_log ADD COLUMN import_hash VARCHAR(40)"))
+        for index in FinanceLog.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        conn.execute(text("INSERT OR IGNORE INTO category_version (id, version) VALUES (1, 0)"))
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS trg_category_version_{op.lower()} AFTER {op} ON category "
+                "BEGIN UPDATE category_version SET version = version + 1 WHERE id = 1; END"
+            ))
+        existing = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+        # 舊版以 unicode61 斷詞的索引：刪除後以 trigram 重建
+        fts_sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'finance_log_fts'")).scalar()
+        retokenize = fts_sql is not None and NOTE_FTS_TOKENIZER not in fts_sql
+        if retokenize:
+            conn.execute(text("DROP TABLE finance_log_fts"))
+        conn.execute(text(NOTE_FTS_TABLE))
+        for name, body in {**ROLLUP_TRIGGERS, **NOTE_FTS_TRIGGERS, **BALANCE_CHECKPOINT_TRIGGERS,
+                           **OPEN_ITEM_TRIGGERS, **SETTLEMENT_TRIGGERS, **OUTSTANDING_TRIGGERS}.items():
+            conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+        # 舊資料庫第一次加上觸發器（或金額改為整數分）時，先由既有日誌建立彙總與全文索引
+        if migrated or not set(ROLLUP_TRIGGERS) <= existing:
+            self.rebuild_rollups(conn)
+        if migrated or retokenize or not set(NOTE_FTS_TRIGGERS) <= existing:
+            self.rebuild_note_index(conn)
+        # 沒有觸發器維護期間的檢查點可能已過期
+        if migrated or not set(BALANCE_CHECKPOINT_TRIGGERS) <= existing:
+            conn.execute(text("DELETE FROM balance_checkpoint"))
+        # 既有的 Receivable / Payable 日誌補建為未結項目（未結餘額彙總由 open_item 觸發器累加）
+        if migrated or not set(OPEN_ITEM_TRIGGERS) <= existing:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO open_item (log_id, direction, category_id, opened_at, amount, settled, outstanding) "
+                "SELECT id, actual_type, category_id, timestamp, COALESCE(amount, 0), 0, COALESCE(amount, 0) "
+                f"FROM finance_log WHERE actual_type IN {_OPEN_TYPES_SQL}"
+            ))
+
+    @staticmethod
+    def _migrate_finance_log(conn, chunk_size: int = 5000) -> bool:
+        """重建舊版 finance_log：金額以 FLOAT 儲存（改存整數分，並重建 daily_rollup），
+        或 category_id 外鍵沒有 ON DELETE CASCADE
+
+        SQLite 無法修改欄位型別與外鍵，因此建立新表 finance_log_new 逐批複製（金額以 to_cents 取整），
+        再刪除舊表並改名。不先改名舊表：開啟外鍵時改名會把其他表（open_item、settlement）
+        參照 finance_log 的外鍵一併改成舊表名稱。
+        Returns:
+            bool: 是否執行了重建
+        """
+        def column_info(table: str) -> dict[str, str]:
+            return {r[1]: (r[2] or "").upper() for r in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+        float_amount = "INT" not in column_info("finance_log").get("amount", "INTEGER")
+        cascade = any(
+            r[3] == "category_id" and r[6].upper() == "CASCADE"
+            for r in conn.execute(text("PRAGMA foreign_key_list(finance_log)"))
+        )
+        if not float_amount and cascade:
+            return False
+        table = FinanceLog.__table__
+        # 索引與觸發器名稱是全資料庫唯一，先移除才能在新表上重建
+        for index in table.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        for name in (*ROLLUP_TRIGGERS, *NOTE_FTS_TRIGGERS, *BALANCE_CHECKPOINT_TRIGGERS, *OPEN_ITEM_TRIGGERS):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        staging = MetaData()
+        Category.__table__.to_metadata(staging)  # 外鍵編譯需要被參照的表
+        table.to_metadata(staging, name="finance_log_new").create(conn)
+        names = [c for c in table.columns.keys() if c in column_info("finance_log")]
+        columns = ", ".join(names)
+        # 已不存在的類別（舊版外鍵未檢查時留下的孤兒日誌）改為 NULL，否則新外鍵會拒絕寫入
+        select_cols = columns.replace(
+            "category_id", "(SELECT id FROM category WHERE id = finance_log.category_id)", 1
+        )
+        if float_amount:
+            old_rows = conn.execute(text(f"SELECT {select_cols} FROM finance_log ORDER BY id"))
+            stmt = text(f"INSERT INTO finance_log_new ({columns}) VALUES ({', '.join(':' + n for n in names)})")
+            while batch := old_rows.fetchmany(chunk_size):
+                params = [dict(zip(names, r)) for r in batch]
+                for row in params:
+                    if row["amount"] is not None:
+                        row["amount"] = to_cents(row["amount"])
+                conn.execute(stmt, params)
+        else:
+            conn.execute(text(f"INSERT INTO finance_log_new ({columns}) SELECT {select_cols} FROM finance_log"))
+        conn.execute(text("DROP TABLE finance_log"))
+        conn.execute(text("ALTER TABLE finance_log_new RENAME TO finance_log"))
+        if "INT" not in column_info("daily_rollup").get("total", "INTEGER"):
+            DailyRollup.__table__.drop(conn)
+            DailyRollup.__table__.create(conn)
+        return True
+
+    def rebuild_rollups(self, conn) -> int:
+        """由 finance_log 重新產生 daily_rollup（餘額檢查點由彙總計算，一併清除），回傳彙總列數"""
+        conn.execute(text("DELETE FROM daily_rollup"))
+        conn.execute(text("DELETE FROM balance_checkpoint"))
+        conn.execute(text(
+            "INSERT INTO daily_rollup (day, category_id, actual_type, total, count) "
+            "SELECT substr(timestamp, 1, 10), category_id, actual_type, SUM(COALESCE(amount, 0)), COUNT(*) "
+            "FROM finance_log GROUP BY 1, 2, 3"
+        ))
+        return conn.execute(text("SELECT COUNT(*) FROM daily_rollup")).scalar()
+
+    def rebuild_note_index(self, conn) -> None:
+        """由 finance_log 重建備註全文索引"""
+        conn.execute(text("INSERT INTO finance_log_fts (finance_log_fts) VALUES ('rebuild')"))
+
+    @staticmethod
+    def _fts_query(terms: list[str]) -> str:
+        """將搜尋詞轉為 FTS5 查詢字串（每個詞加引號，避免被解讀為 FTS 語法）"""
+        return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    def search_notes_statement(self, query: str):
+        """每個詞以不分大小寫的子字串比對：3 字元以上的詞走 trigram 索引並以 bm25 排序，
+        較短的詞（例如兩個字的中文詞）trigram 無法索引，改以 LIKE 比對；全部都是短詞時掃描 finance_log"""
+        terms = self._note_terms(query)
+        indexed = [t for t in terms if len(t) >= 3]
+        short = [FinanceLog.note.like("%" + self._escape_like(t) + "%", escape="\\") for t in terms if len(t) < 3]
+        if not indexed:
+            return (
+                select(*LOG_ROW_COLUMNS, literal(0.0).label("rank"))
+                .outerjoin(Category, FinanceLog.category_id == Category.id)
+                .where(*short)
+            )
+        return (
+            select(*LOG_ROW_COLUMNS, note_fts.c.rank)
+            .select_from(note_fts)
+            .join(FinanceLog, FinanceLog.id == note_fts.c.rowid)
+            .outerjoin(Category, FinanceLog.category_id == Category.id)
+            .where(text("finance_log_fts MATCH :fts_query").bindparams(fts_query=self._fts_query(indexed)), *short)
+        )
+
+    def insert_logs(self, session, params: list[dict]) -> list[int]:
+        # SQLite 的 RETURNING 不保證順序，sort_by_parameter_order 會退化成逐筆 INSERT；
+        # 但同一個多列 INSERT 依 VALUES 順序配發遞增的 rowid，排序後即為輸入順序
+        log_table = FinanceLog.__table__
+        return sorted(session.scalars(insert(log_table).returning(log_table.c.id), params).all())
+
+
+# PostgreSQL 觸發器：每個觸發器一個 plpgsql 函式（名稱加上 _fn），與 SQLite 版本同名的觸發器行為相同
+def _pg_trigger(name: str, definition: str, body: str, declare: str = "") -> tuple[str, str]:
+    """回傳 (建立函式, 建立觸發器) 的 DDL；definition 為 CREATE TRIGGER name 之後、EXECUTE 之前的部分"""
+    function = (
+        f"CREATE OR REPLACE FUNCTION {name}_fn() RETURNS trigger LANGUAGE plpgsql AS $$ "
+        f"{'DECLARE ' + declare if declare else ''} BEGIN {body} END $$"
+    )
+    return function, f"CREATE TRIGGER {name} {definition} EXECUTE FUNCTION {name}_fn()"
+
+# 彙總鍵含 NULL（時間、類別或方向為 NULL 的日誌），唯一索引以 NULLS NOT DISTINCT 讓 ON CONFLICT 也能合併
+_PG_UNIQUE_KEYS = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_daily_rollup_key ON daily_rollup (day, category_id, actual_type) NULLS NOT DISTINCT",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_outstanding_balance_key "
+    "ON outstanding_balance (direction, category_id, counterparty) NULLS NOT DISTINCT",
+)
+
+_PG_CATEGORY_VERSION = {
+    "trg_category_version": _pg_trigger(
+        "trg_category_version", "AFTER INSERT OR UPDATE OR DELETE ON category FOR EACH STATEMENT",
+        "UPDATE category_version SET version = version + 1 WHERE id = 1; RETURN NULL;",
+    ),
+}
+
+# daily_rollup：語句層級觸發器以轉移表（new_rows / old_rows）彙總整個語句的差額，每個語句只合併一次，
+# 批次寫入與 COPY 不必逐列更新；修改前後鍵相同的差額（例如只改備註）會被 HAVING 略過
+def _pg_rollup(name: str, sources: tuple[tuple[str, str], ...], referencing: str, event: str) -> tuple[str, str]:
+    rows = " UNION ALL ".join(
+        f"SELECT to_char(timestamp, 'YYYY-MM-DD') AS day, category_id, actual_type, "
+        f"{sign}COALESCE(amount, 0) AS total, {sign}1 AS count FROM {table}"
+        for table, sign in sources
+    )
+    delta = (
+        f"SELECT day, category_id, actual_type, SUM(total) AS total, SUM(count) AS count FROM ({rows}) d "
+        "GROUP BY day, category_id, actual_type HAVING SUM(total) <> 0 OR SUM(count) <> 0"
+    )
+    body = (
+        f"WITH delta AS ({delta}), merged AS ("
+        "INSERT INTO daily_rollup (day, category_id, actual_type, total, count) "
+        "SELECT day, category_id, actual_type, total, count FROM delta "
+        "ON CONFLICT (day, category_id, actual_type) DO UPDATE "
+        "SET total = daily_rollup.total + EXCLUDED.total, count = daily_rollup.count + EXCLUDED.count "
+        "RETURNING daily_rollup.id, daily_rollup.count AS remaining) "
+        "SELECT array_agg(id) INTO emptied FROM merged WHERE remaining <= 0; "
+        "IF emptied IS NOT NULL THEN DELETE FROM daily_rollup WHERE id = ANY(emptied); END IF; "
+        "RETURN NULL;"
+    )
+    return _pg_trigger(name, f"AFTER {event} ON finance_log REFERENCING {referencing} FOR EACH STATEMENT", body, "emptied integer[];")
+
+_PG_ROLLUP = {
+    "trg_rollup_insert": _pg_rollup("trg_rollup_insert", (("new_rows", ""),), "NEW TABLE AS new_rows", "INSERT"),
+    "trg_rollup_delete": _pg_rollup("trg_rollup_delete", (("old_rows", "-"),), "OLD TABLE AS old_rows", "DELETE"),
+    "trg_rollup_update": _pg_rollup(
+        "trg_rollup_update", (("new_rows", ""), ("old_rows", "-")), "OLD TABLE AS old_rows NEW TABLE AS new_rows", "UPDATE"
+    ),
+}
+
+# 餘額檢查點：刪除整個語句影響的最早月份（含）之後的檢查點；修改只計入方向、金額或時間有變的日誌
+_PG_CHECKPOINT_DROP = "DELETE FROM balance_checkpoint WHERE month >= ({}); RETURN NULL;"
+_PG_CHECKPOINT = {
+    "trg_balance_checkpoint_insert": _pg_trigger(
+        "trg_balance_checkpoint_insert", "AFTER INSERT ON finance_log REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT",
+        _PG_CHECKPOINT_DROP.format("SELECT MIN(to_char(timestamp, 'YYYY-MM')) FROM new_rows"),
+    ),
+    "trg_balance_checkpoint_delete": _pg_trigger(
+        "trg_balance_checkpoint_delete", "AFTER DELETE ON finance_log REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT",
+        _PG_CHECKPOINT_DROP.format("SELECT MIN(to_char(timestamp, 'YYYY-MM')) FROM old_rows"),
+    ),
+    "trg_balance_checkpoint_update": _pg_trigger(
+        "trg_balance_checkpoint_update",
+        "AFTER UPDATE ON finance_log REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT",
+        _PG_CHECKPOINT_DROP.format(
+            "SELECT MIN(LEAST(to_char(o.timestamp, 'YYYY-MM'), to_char(n.timestamp, 'YYYY-MM'))) "
+            "FROM old_rows o JOIN new_rows n ON n.id = o.id "
+            "WHERE (o.actual_type, o.amount, o.timestamp) IS DISTINCT FROM (n.actual_type, n.amount, n.timestamp)"
+        ),
+    ),
+}
+
+# 應收應付項目與沖銷（逐列觸發器；RAISE 以 check_violation 回報，與 SQLite 相同成為 IntegrityError）
+_PG_OPEN_ITEM_INSERT = (
+    "INSERT INTO open_item (log_id, direction, category_id, opened_at, amount, settled, outstanding) "
+    "VALUES (NEW.id, NEW.actual_type, NEW.category_id, NEW.timestamp, COALESCE(NEW.amount, 0), 0, COALESCE(NEW.amount, 0)) "
+    "ON CONFLICT (log_id) DO NOTHING;"
+)
+_PG_OPEN_TYPES = f"NEW.actual_type IN {_OPEN_TYPES_SQL}"
+
+def _pg_raise(message: str) -> str:
+    return f"RAISE EXCEPTION '{message}' USING ERRCODE = 'check_violation';"
+
+_PG_OPEN_ITEM = {
+    "trg_open_item_insert": _pg_trigger(
+        "trg_open_item_insert", f"AFTER INSERT ON finance_log FOR EACH ROW WHEN ({_PG_OPEN_TYPES})",
+        f"{_PG_OPEN_ITEM_INSERT} RETURN NULL;",
+    ),
+    "trg_open_item_guard": _pg_trigger(
+        "trg_open_item_guard", "BEFORE UPDATE OF actual_type, amount ON finance_log FOR EACH ROW",
+        "IF EXISTS (SELECT 1 FROM open_item WHERE log_id = NEW.id AND settled > 0 "
+        "AND (NEW.actual_type IS DISTINCT FROM OLD.actual_type OR COALESCE(NEW.amount, 0) < settled)) THEN "
+        f"{_pg_raise('open item amount or direction conflicts with its settlements')} END IF; "
+        "IF EXISTS (SELECT 1 FROM settlement WHERE settlement_log_id = NEW.id) "
+        "AND (NEW.actual_type IS DISTINCT FROM OLD.actual_type "
+        "OR COALESCE(NEW.amount, 0) < (SELECT SUM(amount) FROM settlement WHERE settlement_log_id = NEW.id)) THEN "
+        f"{_pg_raise('settlement log amount or direction conflicts with its settlements')} END IF; "
+        "RETURN NEW;",
+    ),
+    "trg_open_item_update": _pg_trigger(
+        "trg_open_item_update",
+        "AFTER UPDATE OF actual_type, amount, category_id, timestamp ON finance_log FOR EACH ROW "
+        f"WHEN (OLD.actual_type IN {_OPEN_TYPES_SQL} OR {_PG_OPEN_TYPES})",
+        f"IF NEW.actual_type IS NULL OR NOT ({_PG_OPEN_TYPES}) THEN "
+        "DELETE FROM open_item WHERE log_id = NEW.id; RETURN NULL; END IF; "
+        f"{_PG_OPEN_ITEM_INSERT} "
+        "UPDATE open_item SET direction = NEW.actual_type, category_id = NEW.category_id, "
+        "opened_at = NEW.timestamp, amount = COALESCE(NEW.amount, 0) WHERE log_id = NEW.id; "
+        f"{_refresh_open_item('NEW.id')} RETURN NULL;",
+    ),
+    "trg_open_item_settled_at": _pg_trigger(
+        "trg_open_item_settled_at",
+        "AFTER UPDATE OF timestamp ON finance_log FOR EACH ROW WHEN (OLD.actual_type IN ('Income', 'Expenditure'))",
+        "UPDATE settlement SET settled_at = NEW.timestamp WHERE settlement_log_id = NEW.id; RETURN NULL;",
+    ),
+}
+
+_PG_SETTLEMENT = {
+    "trg_settlement_guard": _pg_trigger(
+        "trg_settlement_guard", "BEFORE INSERT ON settlement FOR EACH ROW",
+        "IF NEW.amount <= 0 OR NEW.amount > (SELECT outstanding FROM open_item WHERE log_id = NEW.item_id) THEN "
+        f"{_pg_raise('settlement exceeds the outstanding amount')} END IF; "
+        "IF NEW.amount + COALESCE((SELECT SUM(amount) FROM settlement WHERE settlement_log_id = NEW.settlement_log_id), 0) "
+        "> (SELECT COALESCE(amount, 0) FROM finance_log WHERE id = NEW.settlement_log_id) THEN "
+        f"{_pg_raise('settlement exceeds the unallocated amount of the settlement log')} END IF; "
+        "RETURN NEW;",
+    ),
+    "trg_settlement_refresh": _pg_trigger(
+        "trg_settlement_refresh", "AFTER INSERT OR DELETE OR UPDATE OF item_id, amount, settled_at ON settlement FOR EACH ROW",
+        f"IF TG_OP <> 'INSERT' THEN {_refresh_open_item('OLD.item_id')} END IF; "
+        f"IF TG_OP <> 'DELETE' THEN {_refresh_open_item('NEW.item_id')} END IF; "
+        "RETURN NULL;",
+    ),
+}
+
+_PG_OUTSTANDING_KEY = (
+    "direction = {0}.direction AND category_id IS NOT DISTINCT FROM {0}.category_id "
+    "AND counterparty IS NOT DISTINCT FROM {0}.counterparty"
+)
+_PG_OUTSTANDING = {
+    "trg_outstanding": _pg_trigger(
+        "trg_outstanding",
+        "AFTER INSERT OR DELETE OR UPDATE OF direction, category_id, counterparty, outstanding ON open_item FOR EACH ROW",
+        "IF TG_OP <> 'INSERT' AND OLD.outstanding > 0 THEN "
+        "UPDATE outstanding_balance SET outstanding = outstanding - OLD.outstanding, open_count = open_count - 1 "
+        f"WHERE {_PG_OUTSTANDING_KEY.format('OLD')}; "
+        f"DELETE FROM outstanding_balance WHERE open_count <= 0 AND {_PG_OUTSTANDING_KEY.format('OLD')}; "
+        "END IF; "
+        "IF TG_OP <> 'DELETE' AND NEW.outstanding > 0 THEN "
+        "INSERT INTO outstanding_balance (direction, category_id, counterparty, outstanding, open_count) "
+        "VALUES (NEW.direction, NEW.category_id, NEW.counterparty, NEW.outstanding, 1) "
+        "ON CONFLICT (direction, category_id, counterparty) DO UPDATE SET "
+        "outstanding = outstanding_balance.outstanding + EXCLUDED.outstanding, "
+        "open_count = outstanding_balance.open_count + 1; "
+        "END IF; "
+        "RETURN NULL;",
+    ),
+}
+
+POSTGRES_TRIGGERS = {
+    **_PG_CATEGORY_VERSION, **_PG_ROLLUP, **_PG_CHECKPOINT, **_PG_OPEN_ITEM, **_PG_SETTLEMENT, **_PG_OUTSTANDING,
+}
+# 備註三元組索引：ILIKE '%詞%' 不必掃描整個 finance_log
+_PG_NOTE_INDEX = "ix_finance_log_note_trgm"
+# COPY 文字格式中需要跳脫的字元（NULL 寫成 \N）
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+class PostgresBackend(StorageBackend):
+    """PostgreSQL 後端（psycopg2 或 psycopg；需要 15 以上的 NULLS NOT DISTINCT）
+
+    pg_trgm 無法安裝時（權限不足或未提供）備註搜尋仍可使用，只是改為掃描並依ID排序。
+    """
+    name = "postgresql"
+    nulls_low = False
+
+    def __init__(self):
+        self.trigram = False
+
+    def engine_options(self, check_same_thread: bool) -> dict:
+        # 伺服器可能關閉閒置連線，取出連線時先確認
+        return {"pool_pre_ping": True}
+
+    def migrate(self, conn):
+        self.trigram = self._install_trigram(conn)
+        conn.exec_driver_sql("ALTER TABLE finance_log ADD COLUMN IF NOT EXISTS import_hash VARCHAR(40)")
+        for index in FinanceLog.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        for ddl in _PG_UNIQUE_KEYS:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql("INSERT INTO category_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING")
+        existing = {r[0] for r in conn.exec_driver_sql(
+            "SELECT t.tgname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid "
+            "WHERE NOT t.tgisinternal AND pg_table_is_visible(c.oid)"
+        )}
+        # 函式每次都更新為目前版本；觸發器只建立缺少的
+        for name, (function, trigger) in POSTGRES_TRIGGERS.items():
+            conn.exec_driver_sql(function)
+            if name not in existing:
+                conn.exec_driver_sql(trigger)
+        if not set(ROLLUP_TRIGGERS) <= existing:
+            self.rebuild_rollups(conn)
+        if not set(BALANCE_CHECKPOINT_TRIGGERS) <= existing:
+            conn.exec_driver_sql("DELETE FROM balance_checkpoint")
+        if not set(OPEN_ITEM_TRIGGERS) <= existing:
+            conn.exec_driver_sql(
+                "INSERT INTO open_item (log_id, direction, category_id, opened_at, amount, settled, outstanding) "
+                "SELECT id, actual_type, category_id, timestamp, COALESCE(amount, 0), 0, COALESCE(amount, 0) "
+                f"FROM finance_log WHERE actual_type IN {_OPEN_TYPES_SQL} ON CONFLICT (log_id) DO NOTHING"
+            )
+
+    @staticmethod
+    def _install_trigram(conn) -> bool:
+        """安裝 pg_trgm 與備註索引，回傳是否可用（在 savepoint 中嘗試，失敗不影響升級交易）"""
+        try:
+            with conn.begin_nested():
+                conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DBAPIError:
+            return False
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {_PG_NOTE_INDEX} ON finance_log USING gin (note gin_trgm_ops)")
+        return True
+
+    def rebuild_rollups(self, conn) -> int:
+        conn.exec_driver_sql("DELETE FROM daily_rollup")
+        conn.exec_driver_sql("DELETE FROM balance_checkpoint")
+        conn.exec_driver_sql(
+            "INSERT INTO daily_rollup (day, category_id, actual_type, total, count) "
+            "SELECT to_char(timestamp, 'YYYY-MM-DD'), category_id, actual_type, SUM(COALESCE(amount, 0)), COUNT(*) "
+            "FROM finance_log GROUP BY 1, 2, 3"
+        )
+        return conn.exec_driver_sql("SELECT COUNT(*) FROM daily_rollup").scalar()
+
+    def rebuild_note_index(self, conn) -> None:
+        if self.trigram:
+            conn.exec_driver_sql(f"REINDEX INDEX {_PG_NOTE_INDEX}")
+
+    def search_notes_statement(self, query: str):
+        """每個詞以不分大小寫的子字串比對（pg_trgm 索引），rank 為 1 − word_similarity"""
+        terms = self._note_terms(query)
+        note = FinanceLog.note
+        if self.trigram:
+            rank = literal(1.0) - func.word_similarity(" ".join(terms), note)
+        else:
+            rank = literal(0.0)
+        return (
+            select(*LOG_ROW_COLUMNS, rank.label("rank"))
+            .outerjoin(Category, FinanceLog.category_id == Category.id)
+            .where(*(note.ilike("%" + self._escape_like(t) + "%", escape="\\") for t in terms))
+        )
+
+    def insert_logs(self, session, params: list[dict]) -> list[int]:
+        """以 COPY 寫入：先由序列取得整批ID，再把帶ID的資料列以 CSV 串流給伺服器
+
+        只支援 psycopg2（copy_expert）與 psycopg 3（cursor.copy），其他驅動程式改用 INSERT ... RETURNING。
+        COPY 直接使用 DBAPI cursor，不經過 engine 事件（FinanceMetrics 不會記錄這個語句）。
+        """
+        if not params:
+            return []
+        conn = session.connection()
+        cur = conn.connection.dbapi_connection.cursor()
+        if not hasattr(cur, "copy_expert") and not hasattr(cur, "copy"):
+            cur.close()
+            return super().insert_logs(session, params)
+        log_table = FinanceLog.__table__
+        ids = conn.execute(
+            select(func.nextval(func.pg_get_serial_sequence(log_table.name, "id")))
+            .select_from(func.generate_series(1, len(params)))
+        ).scalars().all()
+        names = list(params[0])
+        # 欄位型別的 bind 處理（金額轉整數分、列舉轉名稱）；其餘值以 str() 轉為文字
+        processors = [log_table.c[n].type.bind_processor(conn.dialect) for n in names]
+        buf = io.StringIO()
+        for log_id, p in zip(ids, params):
+            row = [str(log_id)]
+            for n, process in zip(names, processors):
+                value = p[n]
+                if value is None:
+                    row.append("\\N")
+                else:
+                    row.append(str(process(value) if process else value).translate(_COPY_ESCAPES))
+            buf.write("\t".join(row))
+            buf.write("\n")
+        sql = f"COPY {log_table.name} (id, {', '.join(names)}) FROM STDIN"
+        try:
+            if hasattr(cur, "copy_expert"):
+                buf.seek(0)
+                cur.copy_expert(sql, buf)
+            else:
+                with cur.copy(sql) as copy:
+                    copy.write(buf.getvalue())
+        finally:
+            cur.close()
+        return ids
+
+
+BACKENDS = {"sqlite": SQLiteBackend, "postgresql": PostgresBackend}
+
+
+def backend_for(name: str) -> StorageBackend:
+    """依 SQLAlchemy 方言名稱（URL 的 drivername 去掉 +驅動程式）建立後端"""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"不支援的資料庫：{name}（支援 {'、'.join(BACKENDS)}）") from None
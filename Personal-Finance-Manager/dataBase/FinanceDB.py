@@ -1,59 +1,228 @@
-from sqlalchemy import create_engine, Column, Integer, String, Enum, ForeignKey, Float, DateTime
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-from datetime import datetime
-import enum
-
-Base = declarative_base()
-
-class Direction(enum.Enum):
-    Income = "Income"
-    Expenditure = "Expenditure"
-    Receivable = "Receivable"  # 應收
-    Payable = "Payable"        # 應付
-class SortField(enum.Enum):
-    """財務日誌排序欄位"""
-    TIMESTAMP = "timestamp"
-    AMOUNT = "amount"
-    ID = "id"
-    CATEGORY = "category_id"
-    DIRECTION = "actual_type"  # 新增依交易方向排序
-class Category(Base):
-    __tablename__ = "category"
-    id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
-    default_type = Column("default_type", Enum(Direction), nullable=False)
-    logs = relationship("FinanceLog", back_populates="category", cascade="all, delete-orphan")
-
-class FinanceLog(Base):
-    __tablename__ = "finance_log"
-    id = Column(Integer, primary_key=True)
-    category_id = Column(Integer, ForeignKey("category.id"))
-    actual_type = Column("actual_type", Enum(Direction))
-    amount = Column(Float)
-    note = Column(String, nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    category = relationship("Category", back_populates="logs")
+from sqlalchemy import create_engine, select, Integer, insert, update, delete, func, text, tuple_, case, literal, literal_column, type_coerce, and_, or_
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker, joinedload
+from sqlalchemy.orm.exc import StaleDataError
+from dataBase.FinanceModels import (
+    Base, to_cents, from_cents, Money, PERIOD_FORMATS, period_key, period_group, Direction, SortField,
+    Category, FinanceLog, CategoryVersion, DailyRollup, BalanceCheckpoint, OPEN_ITEM_TYPES, SETTLEMENT_TYPES,
+    OpenItem, Settlement, OutstandingBalance, LOG_ROW_COLUMNS,
+)
+from dataBase.FinanceBackend import backend_for
+from dataBase.FinanceMetrics import FinanceMetrics, instrument_methods
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import IO, Iterable, Iterator, NamedTuple
+import copy
+import csv
+import json
+import sqlite3
+import threading
+import time
 
+class _Replica:
+    """read_replica="backup" 的副本檔狀態（FinanceDB 與其 unit_of_work／reader 複本共用）"""
+    def __init__(self, path: str, max_age: float):
+        self.path = path
+        self.max_age = max_age
+        self.refreshed: float | None = None  # 最近一次開始複製的 time.monotonic()
+        self.lock = threading.Lock()
+
+    def stale(self) -> bool:
+        return self.refreshed is None or time.monotonic() - self.refreshed > self.max_age
+
+@instrument_methods("unit_of_work", "reader", "close")
 class FinanceDB:
     """資料層：只負責資料存取與基本 CRUD，回傳 ORM 物件或清單。"""
-    def __init__(self, db_url="sqlite:///finance.db", echo=False):
+    def __init__(self,
+        db_url="sqlite:///finance.db",
+        echo=False,
+        journal_mode: str | None = None,
+        busy_timeout: int | None = 5000,
+        check_same_thread: bool = False,
+        pool_size: int | None = None,
+        max_overflow: int | None = None,
+        metrics: FinanceMetrics | None = None,
+        read_replica: str | None = None,
+        replica_path: str | None = None,
+        replica_max_age: float = 5.0
+    ):
         """初始化資料庫連接
         
         Args:
-            db_url: 資料庫連接字串
-            echo: 是否顯示 SQLAlchemy 執行的 SQL 語句"""
+            db_url: 資料庫連接字串（SQLite 或 PostgreSQL，例如 postgresql+psycopg2://user@host/finance；
+                    方言專屬的觸發器、批次寫入與備註搜尋見 FinanceBackend）
+            echo: 是否顯示 SQLAlchemy 執行的 SQL 語句
+            journal_mode: SQLite journal_mode（例如 "WAL"），None 表示沿用資料庫設定
+            busy_timeout: SQLite 等待鎖定的毫秒數，None 表示不設定
+            check_same_thread: SQLite 連線是否限制只能在建立它的執行緒使用
+            pool_size: 連線池大小（None 表示使用預設值）
+            max_overflow: 連線池可額外建立的連線數（None 表示使用預設值）
+            metrics: 查詢量測（方法延遲、語句數、慢查詢），None 表示不量測
+            read_replica: 報表查詢（reader()）使用的唯讀來源，只支援 SQLite 檔案資料庫
+                None: 與寫入共用主 engine
+                "wal": 主資料庫改為 WAL，報表以另一個 query_only engine 讀取同一檔案；
+                       每個讀取交易是一致的快照，讀寫互不阻塞
+                "backup": 報表讀取副本檔，以 SQLite backup API 由主資料庫複製；
+                          超過 replica_max_age 秒才重新複製，報表最多落後這麼久
+            replica_path: "backup" 的副本檔路徑（None 表示主資料庫檔名加上 .replica）
+            replica_max_age: "backup" 副本的最長存活秒數"""
+        if read_replica not in (None, "wal", "backup"):
+            raise ValueError("read_replica 必須為 None、'wal' 或 'backup'")
+        self.metrics = metrics
+        self.read_replica = read_replica
+        self.read_engine = None
+        self.ReadSession = None
+        self._replica = None
         try:
-            self.engine = create_engine(db_url, echo=echo)
-            Base.metadata.create_all(self.engine)
-            Session = sessionmaker(bind=self.engine)
-            self.session = Session()
+            self.backend = backend_for(make_url(db_url).get_backend_name())
+            is_sqlite = self.backend.name == "sqlite"
+            engine_kwargs = {"echo": echo, **self.backend.engine_options(check_same_thread)}
+            if pool_size is not None:
+                engine_kwargs["pool_size"] = pool_size
+            if max_overflow is not None:
+                engine_kwargs["max_overflow"] = max_overflow
+            self.engine = create_engine(db_url, **engine_kwargs)
+            database = self.engine.url.database
+            if read_replica is not None and (not is_sqlite or not database or database == ":memory:"):
+                raise ValueError("read_replica 需要 SQLite 檔案資料庫")
+            if read_replica == "wal":
+                journal_mode = "WAL"
+            self.backend.configure(self.engine, journal_mode, busy_timeout)
+            with self.engine.begin() as conn:
+                Base.metadata.create_all(conn)
+                self.backend.migrate(conn)
+            if read_replica is not None:
+                if read_replica == "backup":
+                    self._replica = _Replica(replica_path or f"{database}.replica", replica_max_age)
+                read_path = self._replica.path if self._replica else database
+                self.read_engine = create_engine(f"sqlite:///{read_path}", **engine_kwargs)
+                self.backend.configure(self.read_engine, None, busy_timeout, query_only=True)
+                self.ReadSession = sessionmaker(bind=self.read_engine)
+                if self._replica:
+                    self.refresh_replica()
+            # 建表與升級之後才開始量測
+            if metrics is not None:
+                metrics.attach(self.engine)
+                if self.read_engine is not None:
+                    metrics.attach(self.read_engine)
+            self.Session = sessionmaker(bind=self.engine)
+            # 預設 session：單執行緒腳本直接使用；多執行緒請改用 unit_of_work()
+            self.session = self.Session()
+            self._owns_engine = True
         except Exception as e:
             print(f"初始化資料庫時發生錯誤：{str(e)}")
             raise
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator["FinanceDB"]:
+        """以獨立 session 執行一個工作單元（每個請求／執行緒一個）
+
+        產生共用 engine 的 FinanceDB，結束時提交，發生例外則回滾，最後關閉 session。
+        """
+        uow = copy.copy(self)
+        uow.session = self.Session()
+        uow._owns_engine = False
+        try:
+            yield uow
+            uow.session.commit()
+        except Exception:
+            uow.session.rollback()
+            raise
+        finally:
+            uow.session.close()
+
+    def rebuild_rollups(self) -> int:
+        """維護指令：清空並重建 daily_rollup，回傳彙總列數"""
+        try:
+            count = self.backend.rebuild_rollups(self.session.connection())
+            self.session.commit()
+            return count
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def rebuild_note_index(self) -> None:
+        """維護指令：重建備註全文索引"""
+        try:
+            self.backend.rebuild_note_index(self.session.connection())
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+    @contextmanager
+    def reader(self) -> Iterator["FinanceDB"]:
+        """報表與彙總查詢用的 FinanceDB
+
+        沒有設定 read_replica 時就是自己；否則產生使用唯讀 engine 獨立 session 的 FinanceDB
+        （"backup" 副本過期時先重新複製），結束時結束讀取交易並關閉 session。
+        餘額檢查點改由主資料庫的獨立 session 補建（見 _ensure_balance_checkpoints）。
+        """
+        if self.ReadSession is None:
+            yield self
+            return
+        if self._replica and self._replica.stale():
+            self.refresh_replica(force=False)
+        ro = copy.copy(self)
+        ro.session = self.ReadSession()
+        ro._owns_engine = False
+        try:
+            yield ro
+        finally:
+            ro.session.rollback()
+            ro.session.close()
+
+    def refresh_replica(self, force: bool = True) -> bool:
+        """以 SQLite backup API 把主資料庫複製到副本檔（read_replica="backup"）
+
+        複製期間主資料庫只持有讀取鎖；副本的讀者在複製期間等待（busy_timeout）。
+        Args:
+            force: False 表示副本未過期，或其他執行緒正在複製時略過（直接讀目前的副本）
+        Returns:
+            bool: 是否執行了複製
+        """
+        replica = self._replica
+        if replica is None:
+            return False
+        if not replica.lock.acquire(blocking=force):
+            return False
+        try:
+            if not force and not replica.stale():
+                return False
+            started = time.monotonic()
+            src = self.engine.raw_connection()
+            try:
+                dst = sqlite3.connect(replica.path)
+                try:
+                    # 副本仍有讀者時 backup 會重試，縮短重試間隔
+                    src.driver_connection.backup(dst, sleep=0.01)
+                finally:
+                    dst.close()
+            finally:
+                src.close()
+            replica.refreshed = started
+        finally:
+            replica.lock.release()
+        return True
+
     def close(self):
-        """關閉資料庫連接"""
+        """關閉資料庫連接（unit_of_work 產生的物件只關閉自己的 session）"""
         self.session.close()
-        self.engine.dispose()
+        if self._owns_engine:
+            self.engine.dispose()
+            if self.read_engine is not None:
+                self.read_engine.dispose()
+
+    def explain_query_plan(self, query) -> list[str]:
+        """取得查詢（Query 或 Select）的執行計畫說明（SQLite 為 EXPLAIN QUERY PLAN）"""
+        stmt = getattr(query, "statement", query)
+        sql = str(stmt.compile(dialect=self.engine.dialect, compile_kwargs={"literal_binds": True}))
+        rows = self.session.execute(text(self.backend.explain_prefix + sql)).all()
+        return [r[-1] for r in rows]
     # Category (CRUD)
     def create_category(self, name: str, default_type: Direction) -> Category:
         """建立新類別"""
@@ -86,6 +255,13 @@ class FinanceDB:
             self.session.rollback()
             raise
 
+    def get_category_version(self) -> int:
+        """取得類別資料版本（任何程序異動 category 都會遞增）"""
+        try:
+            return self.session.query(CategoryVersion.version).filter_by(id=1).scalar() or 0
+        except Exception:
+            raise
+
     def get_all_categories(self) -> list[Category]:
         """取得所有類別"""
         try:
@@ -108,6 +284,58 @@ class FinanceDB:
             self.session.rollback()
             raise
 
+    def create_logs_bulk(self, rows: Iterable[dict], chunk_size: int = 5000) -> list[int]:
+        """批次建立財務日誌（單一交易，executemany 寫入）
+
+        Args:
+            rows: 日誌欄位字典（category_id, actual_type, amount, note, timestamp）
+            chunk_size: 每次 executemany 的筆數
+        Returns:
+            list[int]: 新增日誌的ID（依輸入順序）
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size 必須為正整數")
+        # 以 Core Table 執行（ORM 批次寫入會依每筆非 None 的欄位組合拆成許多小批）；
+        # 寫法依後端而定：SQLite 為多列 INSERT ... RETURNING，PostgreSQL 為 COPY
+        ids: list[int] = []
+        it = iter(rows)
+        try:
+            while True:
+                chunk = [self._log_insert_params(r) for r in islice(it, chunk_size)]
+                if not chunk:
+                    break
+                ids.extend(self.backend.insert_logs(self.session, chunk))
+            self.session.commit()
+            return ids
+        except Exception:
+            self.session.rollback()
+            raise
+
+    @staticmethod
+    def _log_insert_params(r: dict) -> dict:
+        """整理批次寫入的單筆參數（executemany 需要每筆欄位一致）"""
+        return {
+            "category_id": r["category_id"],
+            "actual_type": r.get("actual_type"),
+            "amount": r["amount"],
+            "note": r.get("note"),
+            "timestamp": r.get("timestamp") or datetime.utcnow(),
+            "import_hash": r.get("import_hash"),
+        }
+
+    def existing_import_hashes(self, hashes: Iterable[str], batch_size: int = 900) -> set[str]:
+        """回傳已存在於 finance_log 的匯入雜湊（分批以 IN 查詢，避免超過 SQLite 參數上限）"""
+        try:
+            found: set[str] = set()
+            it = iter(hashes)
+            while batch := list(islice(it, batch_size)):
+                found.update(self.session.scalars(
+                    select(FinanceLog.import_hash).where(FinanceLog.import_hash.in_(batch))
+                ))
+            return found
+        except Exception:
+            raise
+
     def get_log_by_id(self, log_id: int) -> FinanceLog | None:
         """依ID查詢單筆日誌"""
         try:
@@ -115,44 +343,436 @@ class FinanceDB:
         except Exception:
             raise
 
-    def get_logs_with_sorting(self, sort_by: SortField = SortField.TIMESTAMP, reverse: bool = True, filters: dict | None = None) -> list[FinanceLog]:
+    @staticmethod
+    def _apply_log_filters(query, filters: dict | None):
+        """套用日誌過濾條件（Query 或 Select 皆可；列表、彙總與 AsyncFinanceDB 共用）"""
+        if not filters:
+            return query
+        if 'category_id' in filters:
+            query = query.filter(FinanceLog.category_id == filters['category_id'])
+        if 'actual_type' in filters:
+            query = query.filter(FinanceLog.actual_type == filters['actual_type'])
+        if 'min_amount' in filters:
+            query = query.filter(FinanceLog.amount >= filters['min_amount'])
+        if 'max_amount' in filters:
+            query = query.filter(FinanceLog.amount <= filters['max_amount'])
+        if 'start_date' in filters:
+            query = query.filter(FinanceLog.timestamp >= filters['start_date'])
+        if 'end_date' in filters:
+            query = query.filter(FinanceLog.timestamp <= filters['end_date'])
+        if 'note_keyword' in filters:
+            query = query.filter(FinanceLog.note.ilike(f"%{filters['note_keyword']}%"))
+        return query
+
+    @staticmethod
+    def _group_key(group_by: str, grouping: bool = False):
+        """取得彙總分組欄位（grouping=True 為 GROUP BY 使用的運算式）"""
+        if group_by == "direction":
+            return FinanceLog.actual_type
+        if group_by == "category":
+            return Category.name
+        if group_by in PERIOD_FORMATS:
+            return (period_group if grouping else period_key)(group_by, FinanceLog.timestamp)
+        raise ValueError("group_by 必須為 direction、category、day、month 或 year")
+
+    def sum_by(self, group_by: str | tuple[str, ...], filters: dict | None = None, use_rollup: bool = True) -> list[tuple]:
+        """以單一 GROUP BY 計算金額合計
+
+        過濾條件只有類別、方向與整日對齊的日期範圍時，改由 daily_rollup 計算。
+
+        Args:
+            group_by: 分組方式（"direction"、"category"、"day"、"month"、"year"），可傳 tuple 做多欄分組
+            filters: 過濾條件字典（與 get_logs_with_sorting 相同）
+            use_rollup: 是否允許使用 daily_rollup
+        Returns:
+            list[tuple]: (分組鍵..., 總金額 Decimal, 筆數)，依分組鍵排序（金額以整數分加總，結果精確）
+                         總金額不帶正負號：分組不含 direction 時收入與支出會加在一起，需要淨額請加上 direction 分組
+        """
+        try:
+            stmt = self._sum_by_statement(group_by, filters, use_rollup)
+            return [tuple(r) for r in self.session.execute(stmt).all()]
+        except Exception as e:
+            print(f"彙總查詢時發生錯誤：{str(e)}")
+            raise
+
+    @staticmethod
+    def _rollup_covers(filters: dict | None) -> bool:
+        """過濾條件是否能由 daily_rollup 回答（只含類別、方向與整日對齊的日期範圍）"""
+        if not filters:
+            return True
+        if not set(filters) <= {"category_id", "actual_type", "start_date", "end_date"}:
+            return False
+        start, end = filters.get("start_date"), filters.get("end_date")
+        if start is not None and start.time() != datetime.min.time():
+            return False
+        if end is not None and end.time() != datetime.max.time():
+            return False
+        return True
+
+    @staticmethod
+    def _rollup_statement(group_names: tuple[str, ...], filters: dict | None):
+        """由 daily_rollup 建立 sum_by 的 GROUP BY 查詢"""
+        key_columns = {
+            "direction": DailyRollup.actual_type,
+            "category": Category.name,
+            "day": DailyRollup.day,
+            "month": func.substr(DailyRollup.day, 1, 7),
+            "year": func.substr(DailyRollup.day, 1, 4),
+        }
+        for g in group_names:
+            if g not in key_columns:
+                raise ValueError("group_by 必須為 direction、category、day、month 或 year")
+        keys = [key_columns[g].label(g) for g in group_names]
+        stmt = select(
+            *keys,
+            func.coalesce(func.sum(DailyRollup.total), 0).label("total"),
+            func.coalesce(func.sum(DailyRollup.count), 0).label("count"),
+        ).select_from(DailyRollup)
+        if "category" in group_names:
+            stmt = stmt.outerjoin(Category, DailyRollup.category_id == Category.id)
+        filters = filters or {}
+        if "category_id" in filters:
+            stmt = stmt.filter(DailyRollup.category_id == filters["category_id"])
+        if "actual_type" in filters:
+            stmt = stmt.filter(DailyRollup.actual_type == filters["actual_type"])
+        if "start_date" in filters:
+            stmt = stmt.filter(DailyRollup.day >= filters["start_date"].strftime("%Y-%m-%d"))
+        if "end_date" in filters:
+            stmt = stmt.filter(DailyRollup.day <= filters["end_date"].strftime("%Y-%m-%d"))
+        return stmt.group_by(*keys).order_by(*keys)
+
+    @staticmethod
+    def _sum_by_statement(group_by: str | tuple[str, ...], filters: dict | None = None, use_rollup: bool = True):
+        """建立 sum_by 的 GROUP BY 查詢（AsyncFinanceDB 共用）"""
+        group_names = (group_by,) if isinstance(group_by, str) else tuple(group_by)
+        if use_rollup and FinanceDB._rollup_covers(filters):
+            return FinanceDB._rollup_statement(group_names, filters)
+        keys = [FinanceDB._group_key(g).label(g) for g in group_names]
+        total = func.coalesce(func.sum(FinanceLog.amount), 0)
+        stmt = select(*keys, total.label("total"), func.count(FinanceLog.id).label("count")).select_from(FinanceLog)
+        if "category" in group_names:
+            stmt = stmt.outerjoin(Category, FinanceLog.category_id == Category.id)
+        stmt = FinanceDB._apply_log_filters(stmt, filters)
+        return stmt.group_by(*(FinanceDB._group_key(g, grouping=True) for g in group_names)).order_by(*keys)
+
+    # 餘額：收入為正、支出為負（應收、應付尚未實際收付，不計入）
+    @staticmethod
+    def _net_cents(actual_type, amount):
+        """帶正負號的整數分金額運算式"""
+        cents = type_coerce(amount, Integer)
+        return case(
+            (actual_type == Direction.Income, cents),
+            (actual_type == Direction.Expenditure, -cents),
+            else_=0,
+        )
+
+    @staticmethod
+    def _next_month(month: str) -> str:
+        """'YYYY-MM' 的下一個月"""
+        year, mon = int(month[:4]), int(month[5:7])
+        return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+    def _ensure_balance_checkpoints(self, before_month: str) -> tuple[str, int] | None:
+        """補建 before_month 之前各月（有資料的月份）的月底餘額檢查點
+
+        由最近的有效檢查點開始，以 daily_rollup 的月淨額做 SUM() OVER 累計。
+        檢查點在 SAVEPOINT 中寫入，衝突時只回滾該 savepoint，不會提交或回滾呼叫端的交易
+        （呼叫前 session 沒有進行中的交易時才在寫入後提交）；無法儲存時仍回傳本次計算的結果。
+        唯讀副本的 session 上先以主資料庫的獨立 session 補建並儲存，再以副本目前的快照計算
+        （"backup" 副本要到下次複製後才看得到新的檢查點）。
+        Returns:
+            tuple | None: before_month 之前最近的 (月份, 餘額分)；沒有任何資料時為 None
+        """
+        if self.read_engine is not None and self.session.get_bind() is self.read_engine:
+            with self.Session() as primary:
+                self._store_balance_checkpoints(primary, before_month)
+            return self._balance_checkpoint_rows(self.session, before_month)[-1]
+        return self._store_balance_checkpoints(self.session, before_month)
+
+    def _store_balance_checkpoints(self, session, before_month: str) -> tuple[str, int] | None:
+        """在 session 上計算並以 SAVEPOINT 寫入缺少的檢查點（見 _ensure_balance_checkpoints）"""
+        owns = not session.in_transaction()
+        rows = self._balance_checkpoint_rows(session, before_month)
+        if len(rows) > 1:
+            cp = BalanceCheckpoint.__table__
+            try:
+                with session.begin_nested():
+                    session.execute(insert(cp), [{"month": m, "balance": from_cents(b)} for m, b in rows[1:]])
+            except (IntegrityError, OperationalError):
+                # 其他連線同時補建或寫入：本次不儲存，下次查詢再補
+                pass
+        if owns:
+            session.commit()
+        return rows[-1]
+
+    def _balance_checkpoint_rows(self, session, before_month: str) -> list:
+        """[最近的有效檢查點（或 None）, 之後各月的 (月份, 月底餘額分)...]"""
+        cp = BalanceCheckpoint.__table__
+        last = session.execute(
+            select(cp.c.month, type_coerce(cp.c.balance, Integer))
+            .where(cp.c.month < before_month)
+            .order_by(cp.c.month.desc())
+            .limit(1)
+        ).first()
+        month = func.substr(DailyRollup.day, 1, 7)
+        monthly = select(month.label("month"), func.sum(self._net_cents(DailyRollup.actual_type, DailyRollup.total)).label("net"))
+        monthly = monthly.where(DailyRollup.day < before_month + "-01")
+        if last is not None:
+            monthly = monthly.where(DailyRollup.day >= self._next_month(last[0]) + "-01")
+        monthly = monthly.group_by(month).subquery()
+        running = literal(last[1] if last else 0) + func.sum(monthly.c.net).over(order_by=monthly.c.month)
+        rows = session.execute(select(monthly.c.month, running).order_by(monthly.c.month)).all()
+        return [tuple(last) if last else None] + [tuple(r) for r in rows]
+
+    def balance_at(self, ts: datetime, inclusive: bool = True) -> Decimal:
+        """指定時間點的淨餘額（收入 − 支出）
+
+        取該月之前最近的月底檢查點，只加總之後的部分：當月完整的日子用 daily_rollup，
+        當天用 finance_log。時間為 NULL 的日誌不計入。
+        Args:
+            ts: 時間點
+            inclusive: 是否包含時間恰為 ts 的日誌
+        """
+        try:
+            base = self._ensure_balance_checkpoints(ts.strftime("%Y-%m"))
+            day_start = datetime(ts.year, ts.month, ts.day)
+            days = select(func.coalesce(func.sum(self._net_cents(DailyRollup.actual_type, DailyRollup.total)), 0))
+            days = days.where(DailyRollup.day < ts.strftime("%Y-%m-%d"))
+            if base is not None:
+                days = days.where(DailyRollup.day >= self._next_month(base[0]) + "-01")
+            today = select(func.coalesce(func.sum(self._net_cents(FinanceLog.actual_type, FinanceLog.amount)), 0))
+            today = today.where(FinanceLog.timestamp >= day_start)
+            today = today.where(FinanceLog.timestamp <= ts if inclusive else FinanceLog.timestamp < ts)
+            tail = self.session.execute(select(days.scalar_subquery() + today.scalar_subquery())).scalar()
+            return from_cents((base[1] if base else 0) + tail)
+        except Exception:
+            raise
+
+    def running_balance(self, filters: dict | None = None, limit: int | None = None) -> list[tuple]:
+        """依時間順序列出日誌與累計餘額（SUM() OVER 視窗函式，在資料庫端計算）
+
+        起始餘額為 start_date 之前符合其餘過濾條件的淨額；只有日期條件時由餘額檢查點取得。
+        時間為 NULL 的日誌不列出。
+        Args:
+            filters: 過濾條件字典（與 get_logs_with_sorting 相同）
+            limit: 限制回傳筆數（None 表示不限制）
+        Returns:
+            list[Row]: LOG_ROW_COLUMNS 欄位加上 balance（Decimal）
+        """
+        try:
+            opening = 0
+            if filters and "start_date" in filters:
+                others = {k: v for k, v in filters.items() if k not in ("start_date", "end_date")}
+                if others:
+                    stmt = select(func.coalesce(func.sum(self._net_cents(FinanceLog.actual_type, FinanceLog.amount)), 0))
+                    stmt = self._apply_log_filters(stmt, others).where(FinanceLog.timestamp < filters["start_date"])
+                    opening = self.session.execute(stmt).scalar()
+                else:
+                    opening = to_cents(self.balance_at(filters["start_date"], inclusive=False))
+            running = literal(opening) + func.sum(self._net_cents(FinanceLog.actual_type, FinanceLog.amount)).over(
+                order_by=(FinanceLog.timestamp, FinanceLog.id)
+            )
+            stmt = (
+                select(*LOG_ROW_COLUMNS, type_coerce(running, Money).label("balance"))
+                .outerjoin(Category, FinanceLog.category_id == Category.id)
+                .where(FinanceLog.timestamp.is_not(None))
+            )
+            stmt = self._apply_log_filters(stmt, filters).order_by(FinanceLog.timestamp, FinanceLog.id)
+            if limit is not None and limit > 0:
+                stmt = stmt.limit(limit)
+            return self.session.execute(stmt).all()
+        except Exception:
+            raise
+
+    def search_notes(self, query: str, filters: dict | None = None, limit: int | None = 50) -> list[tuple]:
+        """以全文索引搜尋備註：每個詞都是不分大小寫的子字串比對（中文詞也適用），依相關度排序
+
+        SQLite 為 FTS5 trigram 索引與 bm25（3 字元以下的詞改以 LIKE 比對）；
+        PostgreSQL 為 pg_trgm 索引與 word_similarity。
+        Args:
+            query: 以空白分隔的搜尋詞，全部都須出現（例如 "漢堡 coffee"；詞尾的 * 可省略）
+            filters: 過濾條件字典（與 get_logs_with_sorting 相同）
+            limit: 限制回傳筆數（None 表示不限制）
+        Returns:
+            list[Row]: LOG_ROW_COLUMNS 欄位加上 rank（越小越相關）
+        """
+        try:
+            return self.session.execute(self._search_notes_statement(self.backend, query, filters, limit)).all()
+        except Exception:
+            raise
+
+    @staticmethod
+    def _search_notes_statement(backend, query: str, filters: dict | None = None, limit: int | None = 50):
+        """後端的備註比對加上過濾條件，依 rank、id 排序（AsyncFinanceDB 共用）"""
+        stmt = backend.search_notes_statement(query)
+        stmt = FinanceDB._apply_log_filters(stmt, filters).order_by(stmt.selected_columns.rank, FinanceLog.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
+
+    def logs_query(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+        columns: bool = False
+    ):
+        """建立排序與過濾後的日誌查詢（尚未執行）
+
+        排序一律以 id 作為次要鍵，確保順序穩定，可用 (排序值, id) 做 keyset 分頁。
+        columns=True 時只查詢欄位（日誌欄位 + 類別名稱），不建立 ORM 物件。
+        """
+        # 基礎查詢
+        if columns:
+            query = self.session.query(*LOG_ROW_COLUMNS).outerjoin(Category, FinanceLog.category_id == Category.id)
+        else:
+            query = self.session.query(FinanceLog)
+
+        # 套用過濾條件
+        query = self._apply_log_filters(query, filters)
+        return self._apply_log_order(query, sort_by, reverse, limit, after, self.backend.nulls_low)
+
+    @staticmethod
+    def _apply_log_order(query, sort_by: SortField, reverse: bool, limit: int | None = None, after: tuple | None = None,
+                         nulls_low: bool = True):
+        """套用排序、keyset 游標與筆數限制（Query 或 Select 皆可）
+
+        nulls_low: 資料庫升冪排序時 NULL 是否排在最前面（SQLite 是，PostgreSQL 否）
+        """
+        # keyset 游標：從上一頁最後一筆 (排序值, id) 之後開始
+        sort_column = getattr(FinanceLog, sort_by.value)
+        if after is not None:
+            if sort_by == SortField.ID:
+                cond = sort_column < after[-1] if reverse else sort_column > after[-1]
+            else:
+                cond = FinanceDB._keyset_after(sort_column, after, reverse, nulls_low)
+            query = query.filter(cond)
+
+        # 排序
+        order = [sort_column.desc() if reverse else sort_column.asc()]
+        if sort_by != SortField.ID:
+            order.append(FinanceLog.id.desc() if reverse else FinanceLog.id.asc())
+        query = query.order_by(*order)
+
+        if limit is not None and limit > 0:
+            query = query.limit(limit)
+        return query
+
+    @staticmethod
+    def _keyset_after(sort_column, after: tuple, reverse: bool, nulls_low: bool):
+        """排在游標 (排序值, id) 之後的條件
+
+        排序欄位可能為 NULL，(欄位, id) 的列值比較遇到 NULL 結果為 NULL，NULL 依資料庫的排序位置另外處理。
+        排序值非 NULL 時只用列值範圍比較（才能走索引範圍搜尋）；若本方向的 NULL 排在後面，
+        由 _null_tail 另外取出。游標 (None, None) 表示全部排序值為 NULL 的日誌。
+        """
+        value, last_id = after
+        if value is None:
+            cond = sort_column.is_(None)
+            if last_id is not None:
+                cond = and_(cond, FinanceLog.id < last_id if reverse else FinanceLog.id > last_id)
+            return cond if reverse == nulls_low else or_(cond, sort_column.is_not(None))
+        key = tuple_(sort_column, FinanceLog.id)
+        cursor = tuple_(value, last_id, types=[sort_column.type, FinanceLog.id.type])
+        return key < cursor if reverse else key > cursor
+
+    @staticmethod
+    def _null_tail(sort_by: SortField, reverse: bool, limit: int | None, after: tuple | None, fetched: int,
+                   nulls_low: bool) -> tuple | None:
+        """游標之後的非 NULL 部分取完（不足 limit 筆）且本方向 NULL 排在後面時，接著取 NULL 部分的游標"""
+        if after is None or after[0] is None or sort_by == SortField.ID or reverse != nulls_low:
+            return None
+        if limit is not None and limit > 0 and fetched >= limit:
+            return None
+        return (None, None)
+
+    def _fetch_after(self, fetch, sort_by: SortField, reverse: bool, limit: int | None, after: tuple | None) -> list:
+        """執行 fetch(limit, after)，需要時再以 _null_tail 補上排序值為 NULL 的日誌"""
+        rows = fetch(limit, after)
+        tail = self._null_tail(sort_by, reverse, limit, after, len(rows), self.backend.nulls_low)
+        if tail is not None:
+            rows += fetch(limit - len(rows) if limit else None, tail)
+        return rows
+
+    def get_logs_with_sorting(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        limit: int | None = None,
+        after: tuple | None = None
+    ) -> list[FinanceLog]:
         """取得排序後的日誌（支援多重條件過濾）
         
         Args:
             sort_by: 排序欄位（SortField 列舉）
             reverse: 是否降序排列
             filters: 過濾條件字典
+            limit: 限制回傳筆數（於 SQL 端套用）
+            after: keyset 游標 (排序值, id)，只回傳排在其後的日誌
         """
         try:
-            # 基礎查詢
-            query = self.session.query(FinanceLog)
+            return self._fetch_after(lambda n, a: self.logs_query(sort_by, reverse, filters, n, a).all(),
+                                     sort_by, reverse, limit, after)
+        except Exception as e:
+            print(f"排序查詢時發生錯誤：{str(e)}")
+            raise
 
-            # 套用過濾條件
-            if filters:
-                if 'category_id' in filters:
-                    query = query.filter(FinanceLog.category_id == filters['category_id'])
-                if 'actual_type' in filters:
-                    query = query.filter(FinanceLog.actual_type == filters['actual_type'])
-                if 'min_amount' in filters:
-                    query = query.filter(FinanceLog.amount >= filters['min_amount'])
-                if 'max_amount' in filters:
-                    query = query.filter(FinanceLog.amount <= filters['max_amount'])
-                if 'start_date' in filters:
-                    query = query.filter(FinanceLog.timestamp >= filters['start_date'])
-                if 'end_date' in filters:
-                    query = query.filter(FinanceLog.timestamp <= filters['end_date'])
-                if 'note_keyword' in filters:
-                    query = query.filter(FinanceLog.note.ilike(f"%{filters['note_keyword']}%"))
-
-            # 排序
-            sort_column = getattr(FinanceLog, sort_by.value)
-            query = query.order_by(sort_column.desc() if reverse else sort_column.asc())
-
-            return query.all()
+    def get_log_rows(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        limit: int | None = None,
+        after: tuple | None = None
+    ) -> list[tuple]:
+        """同 get_logs_with_sorting，但以單一 JOIN 查詢回傳欄位 Row（含類別名稱），不建立 ORM 物件"""
+        try:
+            return self._fetch_after(lambda n, a: self.logs_query(sort_by, reverse, filters, n, a, columns=True).all(),
+                                     sort_by, reverse, limit, after)
         except Exception as e:
             print(f"排序查詢時發生錯誤：{str(e)}")
             raise
 
+    def iter_log_rows(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        batch_size: int = 1000
+    ) -> Iterator[tuple]:
+        """同 iter_logs，但串流欄位 Row（含類別名稱），不建立 ORM 物件"""
+        if batch_size <= 0:
+            raise ValueError("batch_size 必須為正整數")
+        query = self.logs_query(sort_by, reverse, filters, columns=True).yield_per(batch_size)
+        try:
+            yield from query
+        except Exception as e:
+            print(f"串流查詢時發生錯誤：{str(e)}")
+            raise
+
+    def iter_logs(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        batch_size: int = 1000
+    ) -> Iterator[FinanceLog]:
+        """逐批串流排序後的日誌（yield_per），記憶體用量不隨筆數成長
+
+        Args:
+            sort_by: 排序欄位（SortField 列舉）
+            reverse: 是否降序排列
+            filters: 過濾條件字典
+            batch_size: 每批從游標取出的筆數
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size 必須為正整數")
+        query = self.logs_query(sort_by, reverse, filters)
+        query = query.options(joinedload(FinanceLog.category)).yield_per(batch_size)
+        try:
+            yield from query
+        except Exception as e:
+            print(f"串流查詢時發生錯誤：{str(e)}")
+            raise
+
     def update_category(self, category_id: int, name: str | None = None, default_type: Direction | None = None) -> Category | None:
         """修改類別
         
@@ -185,6 +805,35 @@ class FinanceDB:
             self.session.rollback()
             raise
 
+    def merge_categories(self, src_id: int, dst_id: int) -> int | None:
+        """把來源類別的日誌以單一 UPDATE 移到目標類別，再刪除來源類別（同一交易）
+
+        Args:
+            src_id: 來源類別ID（合併後刪除）
+            dst_id: 目標類別ID
+        Returns:
+            int | None: 移動的日誌筆數；任一類別不存在時回傳 None
+        """
+        if src_id == dst_id:
+            raise ValueError("來源與目標類別不可相同")
+        try:
+            if self.session.get(Category, src_id) is None or self.session.get(Category, dst_id) is None:
+                return None
+            # 提交時 session 內的物件會全部過期，不需要同步
+            result = self.session.execute(
+                update(FinanceLog).where(FinanceLog.category_id == src_id).values(category_id=dst_id),
+                execution_options={"synchronize_session": False},
+            )
+            self.session.execute(
+                delete(Category).where(Category.id == src_id),
+                execution_options={"synchronize_session": False},
+            )
+            self.session.commit()
+            return result.rowcount
+        except Exception:
+            self.session.rollback()
+            raise
+
     def update_log(self,
         log_id: int,
         category_id: int | None = None,
@@ -235,83 +884,801 @@ class FinanceDB:
             self.session.rollback()
             raise
 
-class FinanceService:
-    """邏輯層：使用 FinanceDB 提供高階功能，處理商業邏輯並回傳格式化資料"""
-    def __init__(self, db: FinanceDB):
-        self.db = db
+    def update_logs_bulk(self, changes: Iterable[dict], chunk_size: int = 5000) -> int:
+        """依主鍵批次修改多筆日誌（單一交易，欄位相同的連續資料合併為 executemany）
 
-    def close(self):
-        """關閉資料庫連接"""
-        self.db.close()
+        Args:
+            changes: 每筆包含 id 與要修改的欄位（category_id, actual_type, amount, note, timestamp）；
+                     同一個ID可出現多次，依輸入順序套用
+            chunk_size: 每次送出的筆數
+        Returns:
+            int: 修改筆數（修改次數）；任一ID不存在時整批回滾並拋出 ValueError
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size 必須為正整數")
+        rows = list(changes)
+        # ID 不重複時依欄位組合排序，讓相同欄位的資料能合併成同一個 UPDATE；
+        # 同一個ID出現多次時保持輸入順序，後面的修改才會蓋過前面的
+        if len({c["id"] for c in rows}) == len(rows):
+            rows.sort(key=lambda c: tuple(sorted(c)))
+        try:
+            for i in range(0, len(rows), chunk_size):
+                self.session.execute(update(FinanceLog), rows[i:i + chunk_size])
+            self.session.commit()
+            return len(rows)
+        except StaleDataError:
+            self.session.rollback()
+            raise ValueError("部分日誌ID不存在，未做任何修改") from None
+        except Exception:
+            self.session.rollback()
+            raise
 
-    def _log_to_dict(self, l: FinanceLog) -> dict:
-        """轉換日誌為字典格式"""
-        return {
-            "id": l.id,
-            "category_id": l.category_id,
-            "category": (l.category.name if l.category else None),
-            "actual_type": (l.actual_type.value if l.actual_type else None),
-            "amount": l.amount,
-            "note": l.note,
-            "timestamp": (l.timestamp.isoformat() if l.timestamp else None),
-        }
+    def update_logs_where(self, filters: dict | None, **changes) -> int:
+        """以單一 UPDATE 修改所有符合過濾條件的日誌（不載入 ORM 物件）
 
-    # Category 高階功能
-    def add_category(self, name: str, default_type: Direction) -> dict:
-        """新增類別（高階功能）"""
-        if not name or not isinstance(name, str):
-            raise ValueError("name 必須為非空字串")
-        if not isinstance(default_type, Direction):
-            raise ValueError("default_type 必須為 Direction")
-        if self.db.get_category_by_name(name):
-            raise ValueError("category 已存在")
-        cat = self.db.create_category(name, default_type)
-        return {"id": cat.id, "name": cat.name, "default_type": cat.default_type.value}
+        Args:
+            filters: 過濾條件字典（與 get_logs_with_sorting 相同；None 表示全部日誌）
+            **changes: 要修改的欄位（category_id, actual_type, amount, note, timestamp）
+        Returns:
+            int: 修改筆數
+        """
+        unknown = set(changes) - set(LOG_CHANGE_FIELDS)
+        if unknown:
+            raise ValueError(f"不支援修改的欄位：{', '.join(sorted(unknown))}")
+        if not changes:
+            return 0
+        try:
+            if "category_id" in changes and self.session.get(Category, changes["category_id"]) is None:
+                raise ValueError(f"找不到類別ID '{changes['category_id']}'")
+            stmt = self._apply_log_filters(update(FinanceLog), filters).values(**changes)
+            # 提交時 session 內的物件會全部過期，不需要同步
+            result = self.session.execute(stmt, execution_options={"synchronize_session": False})
+            self.session.commit()
+            return result.rowcount
+        except Exception:
+            self.session.rollback()
+            raise
 
-    def delete_category(self, name: str) -> bool:
-        """刪除類別（高階功能）"""
-        cat = self.db.get_category_by_name(name)
-        if not cat:
-            return False
-        return self.db.delete_category_by_id(cat.id)
+    def delete_logs_where(self, filters: dict | None) -> int:
+        """以單一 DELETE 刪除所有符合過濾條件的日誌
 
-    def get_all_categories(self) -> list[dict]:
-        """取得所有類別（高階功能）"""
-        cats = self.db.get_all_categories()
-        return [{"id": c.id, "name": c.name, "default_type": c.default_type.value} for c in cats]
-    # Log 高階功能
-    def add_log(self, category_name: str, amount: float, actual_type: Direction | None = None, note: str | None = None, actuall_time: datetime | None = None) -> dict:
-        """新增財務日誌（高階功能）"""
-        if not category_name or not isinstance(category_name, str):
-            raise ValueError("category_name 必須為非空字串")
-        if not isinstance(amount, (int, float)):
-            raise ValueError("amount 必須為數字")
-        if actual_type is not None and not isinstance(actual_type, Direction):
-            raise ValueError("actual_type 必須為 Direction 或 None")
-        if note is not None and not isinstance(note, str):
-            raise ValueError("note 必須為字串或 None")
-        if actuall_time is not None and not isinstance(actuall_time, datetime):
-            raise ValueError("actuall_time 必須為 datetime 或 None")
+        Args:
+            filters: 過濾條件字典（與 get_logs_with_sorting 相同；None 表示全部日誌）
+        Returns:
+            int: 刪除筆數
+        """
+        try:
+            stmt = self._apply_log_filters(delete(FinanceLog), filters)
+            result = self.session.execute(stmt, execution_options={"synchronize_session": False})
+            self.session.commit()
+            return result.rowcount
+        except Exception:
+            self.session.rollback()
+            raise
 
-        cat = self.db.get_category_by_name(category_name)
-        if not cat:
-            raise ValueError(f"找不到類別 '{category_name}'")
-            
-        use_type = actual_type or cat.default_type
-        log = self.db.create_log(
-            category_id=cat.id, 
-            actual_type=use_type, 
-            amount=amount, 
-            note=note,
-            timestamp=actuall_time  # 傳遞時間參數給 create_log
-        )
-        return self._log_to_dict(log)
+    def delete_log_by_id(self, log_id: int) -> bool:
+        """刪除指定ID的日誌（彙總與檢查點由觸發器、未結項目與沖銷由 ON DELETE CASCADE 維護）"""
+        try:
+            result = self.session.execute(
+                delete(FinanceLog).where(FinanceLog.id == log_id),
+                execution_options={"synchronize_session": False},
+            )
+            self.session.commit()
+            return result.rowcount > 0
+        except Exception:
+            self.session.rollback()
+            raise
 
-    def get_log_by_id(self, log_id: int) -> dict | None:
+    # 應收應付
+    def create_open_item(self,
+        category_id: int,
+        direction: Direction,
+        amount: float,
+        counterparty: str | None = None,
+        note: str | None = None,
+        timestamp: datetime | None = None
+    ) -> FinanceLog:
+        """新增應收／應付日誌（觸發器建立未結項目）並設定交易對象，同一交易"""
+        if direction not in OPEN_ITEM_TYPES:
+            raise ValueError("應收應付項目的方向必須為 Receivable 或 Payable")
+        try:
+            log = FinanceLog(category_id=category_id, actual_type=direction, amount=amount, note=note,
+                             timestamp=timestamp or datetime.utcnow())
+            self.session.add(log)
+            self.session.flush()
+            if counterparty is not None:
+                self.session.execute(
+                    update(OpenItem).where(OpenItem.log_id == log.id).values(counterparty=counterparty),
+                    execution_options={"synchronize_session": False},
+                )
+            self.session.commit()
+            self.session.refresh(log)
+            return log
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def get_open_item(self, item_id: int) -> OpenItem | None:
+        """以日誌ID取得應收應付項目"""
+        try:
+            return self.session.get(OpenItem, item_id)
+        except Exception:
+            raise
+
+    def set_counterparty(self, item_id: int, counterparty: str | None) -> bool:
+        """設定項目的交易對象（未結餘額彙總由觸發器移到新的鍵）"""
+        try:
+            result = self.session.execute(
+                update(OpenItem).where(OpenItem.log_id == item_id).values(counterparty=counterparty),
+                execution_options={"synchronize_session": False},
+            )
+            self.session.commit()
+            return result.rowcount > 0
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def _unallocated(self, log: FinanceLog) -> int:
+        """沖銷日誌尚未分配給項目的金額（整數分）"""
+        allocated = self.session.execute(
+            select(func.coalesce(func.sum(type_coerce(Settlement.amount, Integer)), 0))
+            .where(Settlement.settlement_log_id == log.id)
+        ).scalar()
+        return to_cents(log.amount or 0) - allocated
+
+    @staticmethod
+    def _check_settlement_type(item: OpenItem, log: FinanceLog) -> None:
+        expected = SETTLEMENT_TYPES[item.direction]
+        if log.actual_type != expected:
+            raise ValueError(f"{item.direction.value} 項目只能以 {expected.value} 日誌沖銷")
+
+    def settle(self, item_id: int, settlement_log_id: int, amount: float | None = None) -> tuple[Decimal, Decimal] | None:
+        """以既有的收入／支出日誌沖銷項目
+
+        Args:
+            item_id: 應收應付項目（日誌ID）
+            settlement_log_id: 沖銷日誌ID（應收用收入、應付用支出）
+            amount: 沖銷金額；None 表示項目未結金額與日誌未分配金額的較小者
+        Returns:
+            tuple | None: (沖銷金額, 項目剩餘未結金額)；項目或日誌不存在時回傳 None
+        """
+        try:
+            item = self.session.get(OpenItem, item_id)
+            log = self.session.get(FinanceLog, settlement_log_id)
+            if item is None or log is None:
+                return None
+            self._check_settlement_type(item, log)
+            outstanding, available = to_cents(item.outstanding), self._unallocated(log)
+            cents = min(outstanding, available) if amount is None else to_cents(amount)
+            if cents <= 0:
+                raise ValueError("沒有可沖銷的金額" if amount is None else "沖銷金額必須大於 0")
+            if cents > outstanding:
+                raise ValueError("沖銷金額超過項目的未結金額")
+            if cents > available:
+                raise ValueError("沖銷金額超過沖銷日誌未分配的金額")
+            self.session.add(Settlement(item_id=item_id, settlement_log_id=settlement_log_id,
+                                        amount=from_cents(cents), settled_at=log.timestamp))
+            self.session.commit()
+            self.session.refresh(item)
+            return from_cents(cents), item.outstanding
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def record_settlement(self,
+        item_id: int,
+        amount: float | None = None,
+        note: str | None = None,
+        timestamp: datetime | None = None,
+        category_id: int | None = None
+    ) -> tuple[FinanceLog, Decimal] | None:
+        """新增沖銷日誌（應收為收入、應付為支出）並沖銷項目，同一交易
+
+        Args:
+            item_id: 應收應付項目（日誌ID）
+            amount: 沖銷金額；None 表示全部未結金額
+            category_id: 沖銷日誌的類別；None 表示沿用項目的類別
+        Returns:
+            tuple | None: (沖銷日誌, 項目剩餘未結金額)；項目不存在時回傳 None
+        """
+        try:
+            item = self.session.get(OpenItem, item_id)
+            if item is None:
+                return None
+            cents = to_cents(item.outstanding) if amount is None else to_cents(amount)
+            if cents <= 0:
+                raise ValueError("項目已結清" if amount is None else "沖銷金額必須大於 0")
+            if cents > to_cents(item.outstanding):
+                raise ValueError("沖銷金額超過項目的未結金額")
+            log = FinanceLog(
+                category_id=item.category_id if category_id is None else category_id,
+                actual_type=SETTLEMENT_TYPES[item.direction],
+                amount=from_cents(cents),
+                note=note,
+                timestamp=timestamp or datetime.utcnow(),
+            )
+            self.session.add(log)
+            self.session.flush()
+            self.session.add(Settlement(item_id=item_id, settlement_log_id=log.id,
+                                        amount=from_cents(cents), settled_at=log.timestamp))
+            self.session.commit()
+            self.session.refresh(log)
+            self.session.refresh(item)
+            return log, item.outstanding
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def auto_settle(self, settlement_log_id: int, filters: dict | None = None, batch_size: int = 500) -> list[tuple[int, Decimal]] | None:
+        """把沖銷日誌未分配的金額依先進先出（opened_at 由舊到新）分配給同方向的未結項目
+
+        候選項目由部分索引 ix_open_item_open 依序取出，已結清的歷史不會被讀取；
+        每批寫入後全數沖銷的項目離開索引，下一批直接從剩下的最舊項目開始。
+        Args:
+            settlement_log_id: 沖銷日誌ID（收入沖應收、支出沖應付）
+            filters: 項目過濾條件（direction 以外的 open_items 條件）；None 表示與日誌同類別
+            batch_size: 每批讀取的項目數
+        Returns:
+            list | None: [(項目ID, 沖銷金額), ...]；日誌不存在時回傳 None
+        """
+        try:
+            log = self.session.get(FinanceLog, settlement_log_id)
+            if log is None:
+                return None
+            direction = {v: k for k, v in SETTLEMENT_TYPES.items()}.get(log.actual_type)
+            if direction is None:
+                raise ValueError("只有收入或支出日誌可以沖銷")
+            if filters is None:
+                filters = {"category_id": log.category_id}
+            stmt = (
+                select(OpenItem.log_id, type_coerce(OpenItem.outstanding, Integer))
+                .where(OpenItem.direction == direction, self._OPEN_NOW)
+                .order_by(OpenItem.opened_at, OpenItem.log_id)
+                .limit(batch_size)
+            )
+            stmt = self._apply_open_item_filters(stmt, {k: v for k, v in filters.items() if k != "direction"})
+            available = self._unallocated(log)
+            allocations = []
+            while available > 0:
+                batch = []
+                for item_id, outstanding in self.session.execute(stmt).all():
+                    cents = min(outstanding, available)
+                    batch.append({"item_id": item_id, "settlement_log_id": log.id,
+                                  "amount": from_cents(cents), "settled_at": log.timestamp})
+                    available -= cents
+                    if available == 0:
+                        break
+                if not batch:
+                    break
+                self.session.execute(insert(Settlement), batch)
+                allocations.extend((b["item_id"], b["amount"]) for b in batch)
+            self.session.commit()
+            return allocations
+        except Exception:
+            self.session.rollback()
+            raise
+
+    # 目前未結：字面常數 0 與部分索引的條件相同，查詢規劃器才會使用該索引
+    _OPEN_NOW = OpenItem.outstanding > literal_column("0")
+
+    @staticmethod
+    def _apply_open_item_filters(stmt, filters: dict | None):
+        """套用項目過濾條件（direction, counterparty, category_id）"""
+        if not filters:
+            return stmt
+        if "direction" in filters:
+            stmt = stmt.where(OpenItem.direction == filters["direction"])
+        if "counterparty" in filters:
+            stmt = stmt.where(OpenItem.counterparty == filters["counterparty"])
+        if "category_id" in filters:
+            stmt = stmt.where(OpenItem.category_id == filters["category_id"])
+        return stmt
+
+    @classmethod
+    def _open_as_of(cls, as_of: datetime | None):
+        """(條件, 未結金額整數分運算式)
+
+        as_of 為 None 時直接使用觸發器維護的 outstanding（部分索引）；否則只看 as_of 時仍未結清的項目
+        （closed_at 為 NULL 或晚於 as_of，走 ix_open_item_closed），未結金額由該項目 as_of 以前的沖銷回推。
+        """
+        if as_of is None:
+            return cls._OPEN_NOW, type_coerce(OpenItem.outstanding, Integer)
+        settled = (
+            select(func.coalesce(func.sum(type_coerce(Settlement.amount, Integer)), 0))
+            .where(Settlement.item_id == OpenItem.log_id, Settlement.settled_at <= as_of)
+            .scalar_subquery()
+        )
+        outstanding = type_coerce(OpenItem.amount, Integer) - settled
+        condition = and_(
+            or_(OpenItem.closed_at.is_(None), OpenItem.closed_at > as_of),
+            OpenItem.opened_at <= as_of,
+            outstanding > 0,
+        )
+        return condition, outstanding
+
+    def open_items(self, as_of: datetime | None = None, filters: dict | None = None, limit: int | None = None) -> list[tuple]:
+        """列出未結項目（opened_at 由舊到新）
+
+        Args:
+            as_of: 時間點（None 表示目前）
+            filters: 過濾條件字典（direction, counterparty, category_id）
+            limit: 限制回傳筆數（None 表示不限制）
+        Returns:
+            list[Row]: log_id, direction, category_id, category, counterparty, opened_at, amount, note, outstanding
+        """
+        try:
+            condition, outstanding = self._open_as_of(as_of)
+            stmt = (
+                select(
+                    OpenItem.log_id, OpenItem.direction, OpenItem.category_id, Category.name.label("category"),
+                    OpenItem.counterparty, OpenItem.opened_at, OpenItem.amount, FinanceLog.note,
+                    type_coerce(outstanding, Money).label("outstanding"),
+                )
+                .join(FinanceLog, FinanceLog.id == OpenItem.log_id)
+                .outerjoin(Category, OpenItem.category_id == Category.id)
+                .where(condition)
+                .order_by(OpenItem.opened_at, OpenItem.log_id)
+            )
+            stmt = self._apply_open_item_filters(stmt, filters)
+            if limit is not None and limit > 0:
+                stmt = stmt.limit(limit)
+            return self.session.execute(stmt).all()
+        except Exception:
+            raise
+
+    def aging(self,
+        as_of: datetime | None = None,
+        buckets: tuple[int, ...] = (30, 60, 90),
+        filters: dict | None = None,
+        group_by: str | None = None
+    ) -> list[tuple]:
+        """依帳齡（as_of 與 opened_at 相差天數）分組加總未結金額
+
+        帳齡分組以 opened_at 與各分界時間比較（CASE），在資料庫端一次彙總。
+        Args:
+            as_of: 時間點（None 表示目前）
+            buckets: 遞增的天數分界，例如 (30, 60, 90) 產生 0–30、31–60、61–90、90 以上四組
+            filters: 過濾條件字典（direction, counterparty, category_id）
+            group_by: None、"counterparty" 或 "category"（類別ID）
+        Returns:
+            list[tuple]: (direction, [分組鍵,] 帳齡組索引, 未結金額 Decimal, 項目數)
+        """
+        if list(buckets) != sorted(set(buckets)) or any(b <= 0 for b in buckets):
+            raise ValueError("buckets 必須為遞增的正整數天數")
+        keys = {None: (), "counterparty": (OpenItem.counterparty,), "category": (OpenItem.category_id,)}
+        if group_by not in keys:
+            raise ValueError("group_by 必須為 None、'counterparty' 或 'category'")
+        try:
+            ref = as_of or datetime.utcnow()
+            condition, outstanding = self._open_as_of(as_of)
+            bucket = case(
+                *((OpenItem.opened_at >= ref - timedelta(days=days), i) for i, days in enumerate(buckets)),
+                else_=len(buckets),
+            ).label("bucket")
+            group = (OpenItem.direction, *keys[group_by], bucket)
+            stmt = (
+                select(*group, type_coerce(func.sum(outstanding), Money), func.count())
+                .where(condition)
+                .group_by(*group)
+                .order_by(*group)
+            )
+            return self.session.execute(self._apply_open_item_filters(stmt, filters)).all()
+        except Exception:
+            raise
+
+    def outstanding_balances(self, group_by: str | None = "counterparty", filters: dict | None = None) -> list[tuple]:
+        """由未結餘額彙總表取得目前各鍵的未結金額（不讀取項目明細）
+
+        Args:
+            group_by: None、"counterparty" 或 "category"（類別ID）
+            filters: 過濾條件字典（direction, counterparty, category_id）
+        Returns:
+            list[tuple]: (direction, [分組鍵,] 未結金額 Decimal, 未結項目數)
+        """
+        ob = OutstandingBalance
+        keys = {None: (), "counterparty": (ob.counterparty,), "category": (ob.category_id,)}
+        if group_by not in keys:
+            raise ValueError("group_by 必須為 None、'counterparty' 或 'category'")
+        try:
+            group = (ob.direction, *keys[group_by])
+            stmt = select(*group, type_coerce(func.sum(type_coerce(ob.outstanding, Integer)), Money), func.sum(ob.open_count))
+            if filters:
+                if "direction" in filters:
+                    stmt = stmt.where(ob.direction == filters["direction"])
+                if "counterparty" in filters:
+                    stmt = stmt.where(ob.counterparty == filters["counterparty"])
+                if "category_id" in filters:
+                    stmt = stmt.where(ob.category_id == filters["category_id"])
+            return self.session.execute(stmt.group_by(*group).order_by(*group)).all()
+        except Exception:
+            raise
+
+# 可修改的日誌欄位（update_logs_where）
+LOG_CHANGE_FIELDS = ("category_id", "actual_type", "amount", "note", "timestamp")
+
+# 日誌字典欄位（匯出 CSV 時的欄位順序）
+LOG_FIELDS = ["id", "category_id", "category", "actual_type", "amount", "note", "timestamp"]
+
+class CachedCategory(NamedTuple):
+    """類別快取項目"""
+    id: int
+    name: str
+    default_type: Direction
+
+class _CategoryCache:
+    """類別快取狀態（同一個 FinanceService 的各工作單元共用）"""
+    def __init__(self):
+        self.by_name: dict[str, CachedCategory] | None = None
+        self.name_by_id: dict[int, str] = {}
+        self.version = -1
+        self.checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        # lock 在重新載入期間持有；命中統計另用一把鎖，快取有效時的讀取不必等待載入
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+
+    def count(self, hit: bool):
+        """記錄一次命中或未命中（多執行緒同時查詢時 += 不是原子操作）"""
+        with self.stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+class _ResultCache:
+    """查詢結果 LRU 快取（同一個 FinanceService 的各工作單元共用）
+
+    任何經由 FinanceService 的寫入都會遞增 generation 並清空快取；
+    查詢開始後 generation 改變的結果不會寫入，避免與寫入交錯時存入舊資料。
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+@instrument_methods("unit_of_work", "close")
+class FinanceService:
+    """邏輯層：使用 FinanceDB 提供高階功能，處理商業邏輯並回傳格式化資料"""
+    def __init__(self,
+        db: FinanceDB,
+        category_cache_ttl: float = 1.0,
+        result_cache_size: int = 256,
+        result_cache_ttl: float = 5.0
+    ):
+        """
+        Args:
+            db: 資料層
+            category_cache_ttl: 類別快取檢查資料版本的間隔秒數（0 表示每次查詢都檢查）
+            result_cache_size: 查詢結果快取的項目上限（0 表示停用）
+            result_cache_ttl: 查詢結果快取的存活秒數（其他程序的寫入最多延遲這麼久才看得到）
+        """
+        self.db = db
+        self.category_cache_ttl = category_cache_ttl
+        self._cat_cache = _CategoryCache()
+        self._result_cache = _ResultCache(result_cache_size, result_cache_ttl)
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator["FinanceService"]:
+        """取得使用獨立 session 的 FinanceService（共用類別快取），適合每個請求一個"""
+        with self.db.unit_of_work() as db:
+            service = copy.copy(self)
+            service.db = db
+            yield service
+
+    @property
+    def metrics(self) -> FinanceMetrics | None:
+        """資料層的查詢量測（未啟用時為 None）"""
+        return self.db.metrics
+
+    # 類別快取
+    def _invalidate_categories(self):
+        """清除類別快取（類別異動後呼叫）"""
+        self._cat_cache.by_name = None
+
+    def _categories(self) -> dict[str, CachedCategory]:
+        """取得 name→類別 快取；資料版本改變（含其他程序的異動）時重新載入"""
+        cache = self._cat_cache
+        now = time.monotonic()
+        by_name = cache.by_name
+        if by_name is not None and now - cache.checked_at < self.category_cache_ttl:
+            cache.count(hit=True)
+            return by_name
+        with cache.lock:
+            version = self.db.get_category_version()
+            cache.checked_at = now
+            if cache.by_name is not None and version == cache.version:
+                cache.count(hit=True)
+                return cache.by_name
+            cache.count(hit=False)
+            cats = self.db.get_all_categories()
+            cache.name_by_id = {c.id: c.name for c in cats}
+            cache.by_name = {c.name: CachedCategory(c.id, c.name, c.default_type) for c in cats}
+            cache.version = version
+            return cache.by_name
+
+    def _get_category(self, name: str) -> CachedCategory | None:
+        """由快取以名稱查詢類別"""
+        return self._categories().get(name)
+
+    def get_category(self, name: str) -> CachedCategory | None:
+        """由快取以名稱查詢類別（id, name, default_type）"""
+        return self._get_category(name)
+
+    def get_category_name(self, category_id: int) -> str | None:
+        """由快取以ID查詢類別名稱"""
+        self._categories()
+        return self._cat_cache.name_by_id.get(category_id)
+
+    def category_cache_stats(self) -> dict:
+        """類別快取統計（命中、未命中、項目數、資料版本）"""
+        cache = self._cat_cache
+        with cache.stats_lock:
+            hits, misses = cache.hits, cache.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "size": len(cache.by_name or {}),
+            "version": cache.version,
+        }
+
+    # 查詢結果快取
+    def _report(self, compute):
+        """在 FinanceDB.reader() 上執行報表查詢 compute(db)（設定唯讀來源時不與寫入爭用主資料庫）"""
+        with self.db.reader() as db:
+            return compute(db)
+
+    def _invalidate_results(self):
+        """任何寫入後呼叫：遞增 generation 並清空查詢結果快取"""
+        cache = self._result_cache
+        with cache.lock:
+            cache.generation += 1
+            cache.entries.clear()
+
+    @staticmethod
+    def _filters_key(filters: dict) -> tuple:
+        """將過濾條件正規化為快取鍵（金額以分比較，100 與 100.0 視為相同）"""
+        items = []
+        for k, v in sorted(filters.items()):
+            if k in ("min_amount", "max_amount"):
+                v = to_cents(v)
+            items.append((k, v))
+        return tuple(items)
+
+    def _cached(self, key: tuple, compute):
+        """由快取取得結果，未命中或過期時呼叫 compute() 並存入；回傳值為複本，可自由修改"""
+        cache = self._result_cache
+        if cache.max_size <= 0:
+            return compute()
+        now = time.monotonic()
+        with cache.lock:
+            entry = cache.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if now < expires_at:
+                    cache.entries.move_to_end(key)
+                    cache.hits += 1
+                    return copy.deepcopy(value)
+                del cache.entries[key]
+                cache.expirations += 1
+            cache.misses += 1
+            generation = cache.generation
+        value = compute()
+        with cache.lock:
+            if generation == cache.generation:
+                cache.entries[key] = (now + cache.ttl, copy.deepcopy(value))
+                cache.entries.move_to_end(key)
+                while len(cache.entries) > cache.max_size:
+                    cache.entries.popitem(last=False)
+                    cache.evictions += 1
+        return value
+
+    def result_cache_stats(self) -> dict:
+        """查詢結果快取統計（命中、未命中、命中率、淘汰、過期、項目數、generation）"""
+        cache = self._result_cache
+        lookups = cache.hits + cache.misses
+        return {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "hit_ratio": (cache.hits / lookups if lookups else 0.0),
+            "evictions": cache.evictions,
+            "expirations": cache.expirations,
+            "size": len(cache.entries),
+            "max_size": cache.max_size,
+            "generation": cache.generation,
+        }
+
+    def close(self):
+        """關閉資料庫連接"""
+        self.db.close()
+
+    @staticmethod
+    def _log_to_dict(l: FinanceLog) -> dict:
+        """轉換日誌為字典格式"""
+        return {
+            "id": l.id,
+            "category_id": l.category_id,
+            "category": (l.category.name if l.category else None),
+            "actual_type": (l.actual_type.value if l.actual_type else None),
+            "amount": (float(l.amount) if l.amount is not None else None),
+            "note": l.note,
+            "timestamp": (l.timestamp.isoformat() if l.timestamp else None),
+        }
+
+    @staticmethod
+    def _row_to_dict(r) -> dict:
+        """轉換欄位 Row（LOG_ROW_COLUMNS）為字典格式"""
+        return {
+            "id": r.id,
+            "category_id": r.category_id,
+            "category": r.category,
+            "actual_type": (r.actual_type.value if r.actual_type else None),
+            "amount": (float(r.amount) if r.amount is not None else None),
+            "note": r.note,
+            "timestamp": (r.timestamp.isoformat() if r.timestamp else None),
+        }
+
+    # Category 高階功能
+    def add_category(self, name: str, default_type: Direction) -> dict:
+        """新增類別（高階功能）"""
+        if not name or not isinstance(name, str):
+            raise ValueError("name 必須為非空字串")
+        if not isinstance(default_type, Direction):
+            raise ValueError("default_type 必須為 Direction")
+        if self._get_category(name):
+            raise ValueError("category 已存在")
+        cat = self.db.create_category(name, default_type)
+        self._invalidate_categories()
+        self._invalidate_results()
+        return {"id": cat.id, "name": cat.name, "default_type": cat.default_type.value}
+
+    def delete_category(self, name: str) -> bool:
+        """刪除類別（高階功能）"""
+        cat = self._get_category(name)
+        if not cat:
+            return False
+        deleted = self.db.delete_category_by_id(cat.id)
+        self._invalidate_categories()
+        self._invalidate_results()
+        return deleted
+
+    def merge_categories(self, src: str, dst: str) -> dict | None:
+        """把類別 src 的日誌併入 dst 並刪除 src（高階功能）
+
+        日誌保留原本的交易方向。
+        Returns:
+            dict | None: {"count": 移動的日誌筆數}；任一類別不存在時回傳 None
+        """
+        src_cat, dst_cat = self._get_category(src), self._get_category(dst)
+        if not src_cat or not dst_cat:
+            return None
+        if src_cat.id == dst_cat.id:
+            raise ValueError("來源與目標類別不可相同")
+        count = self.db.merge_categories(src_cat.id, dst_cat.id)
+        self._invalidate_categories()
+        self._invalidate_results()
+        return None if count is None else {"count": count}
+
+    def get_all_categories(self) -> list[dict]:
+        """取得所有類別（高階功能）"""
+        cats = self.db.get_all_categories()
+        return [{"id": c.id, "name": c.name, "default_type": c.default_type.value} for c in cats]
+    # Log 高階功能
+    @staticmethod
+    def _validate_log_fields(category_name, amount, actual_type, note, actuall_time) -> None:
+        """檢查新增日誌的欄位型別"""
+        if not category_name or not isinstance(category_name, str):
+            raise ValueError("category_name 必須為非空字串")
+        if not isinstance(amount, (int, float, Decimal)):
+            raise ValueError("amount 必須為數字")
+        if actual_type is not None and not isinstance(actual_type, Direction):
+            raise ValueError("actual_type 必須為 Direction 或 None")
+        if note is not None and not isinstance(note, str):
+            raise ValueError("note 必須為字串或 None")
+        if actuall_time is not None and not isinstance(actuall_time, datetime):
+            raise ValueError("actuall_time 必須為 datetime 或 None")
+
+    def add_log(self, category_name: str, amount: float, actual_type: Direction | None = None, note: str | None = None, actuall_time: datetime | None = None) -> dict:
+        """新增財務日誌（高階功能）"""
+        self._validate_log_fields(category_name, amount, actual_type, note, actuall_time)
+
+        cat = self._get_category(category_name)
+        if not cat:
+            raise ValueError(f"找不到類別 '{category_name}'")
+            
+        use_type = actual_type or cat.default_type
+        log = self.db.create_log(
+            category_id=cat.id, 
+            actual_type=use_type, 
+            amount=amount, 
+            note=note,
+            timestamp=actuall_time  # 傳遞時間參數給 create_log
+        )
+        self._invalidate_results()
+        return self._log_to_dict(log)
+
+    def add_logs_bulk(self, logs: Iterable[dict], chunk_size: int = 5000) -> dict:
+        """批次新增財務日誌（高階功能）
+
+        整批先驗證、類別名稱只查詢一次，再以單一交易分段寫入。
+
+        Args:
+            logs: 與 add_log 參數同名的字典（category_name, amount, actual_type, note, actuall_time），
+                  匯入時可另帶 import_hash 供日後去重
+            chunk_size: 每次寫入的筆數
+        Returns:
+            dict: {"count": 新增筆數, "ids": 新增日誌ID清單}
+        """
+        cats = self._categories()
+        rows = []
+        for i, item in enumerate(logs):
+            category_name = item.get("category_name")
+            amount = item.get("amount")
+            actual_type = item.get("actual_type")
+            note = item.get("note")
+            actuall_time = item.get("actuall_time")
+            try:
+                self._validate_log_fields(category_name, amount, actual_type, note, actuall_time)
+            except ValueError as e:
+                raise ValueError(f"第 {i} 筆資料錯誤：{e}") from None
+            cat = cats.get(category_name)
+            if not cat:
+                raise ValueError(f"第 {i} 筆資料錯誤：找不到類別 '{category_name}'")
+            rows.append({
+                "category_id": cat.id,
+                "actual_type": actual_type or cat.default_type,
+                "amount": amount,
+                "note": note,
+                "timestamp": actuall_time,
+                "import_hash": item.get("import_hash"),
+            })
+        ids = self.db.create_logs_bulk(rows, chunk_size=chunk_size)
+        self._invalidate_results()
+        return {"count": len(ids), "ids": ids}
+
+    def get_log_by_id(self, log_id: int) -> dict | None:
         """依ID查詢單筆日誌（字典格式）"""
         log = self.db.get_log_by_id(log_id)
         return self._log_to_dict(log) if log else None
 
+    def _build_filters(self,
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        note_keyword: str | None = None
+    ) -> dict | None:
+        """將高階過濾參數轉為 FinanceDB 過濾條件；類別不存在時回傳 None"""
+        filters = {}
+
+        if category_name:
+            cat = self._get_category(category_name)
+            if not cat:
+                return None
+            filters['category_id'] = cat.id
+
+        if direction:
+            filters['actual_type'] = direction
+        if min_amount is not None:
+            filters['min_amount'] = min_amount
+        if max_amount is not None:
+            filters['max_amount'] = max_amount
+        if start_date:
+            filters['start_date'] = start_date
+        if end_date:
+            filters['end_date'] = end_date
+        if note_keyword:
+            filters['note_keyword'] = note_keyword
+        return filters
+
     def get_filtered_and_sorted_logs(self,
         category_name: str | None = None,
         direction: Direction | None = None,
@@ -322,7 +1689,8 @@ class FinanceService:
         note_keyword: str | None = None,
         sort_by: SortField = SortField.TIMESTAMP,
         reverse: bool = True,
-        limit: int | None = None
+        limit: int | None = None,
+        after: tuple | None = None
     ) -> list[dict]:
         """取得過濾並排序後的日誌清單
         
@@ -337,51 +1705,287 @@ class FinanceService:
             sort_by: 排序欄位（預設為時間戳記）
             reverse: 是否降序（預設為是）
             limit: 限制回傳筆數（可選）
+            after: keyset 游標 (排序值, id)，可由 log_cursor 取得（可選）
         Returns:
             list[dict]: 日誌清單
         """
         # 準備過濾條件
-        filters = {}
-        
-        if category_name:
-            cat = self.db.get_category_by_name(category_name)
-            if not cat:
-                return []
-            filters['category_id'] = cat.id
+        filters = self._build_filters(category_name, direction, min_amount, max_amount, start_date, end_date, note_keyword)
+        if filters is None:
+            return []
 
-        if direction:
-            filters['actual_type'] = direction
-        if min_amount is not None:
-            filters['min_amount'] = min_amount
-        if max_amount is not None:
-            filters['max_amount'] = max_amount
-        if start_date:
-            filters['start_date'] = start_date
-        if end_date:
-            filters['end_date'] = end_date
-        if note_keyword:
-            filters['note_keyword'] = note_keyword
+        # 取得排序後的日誌（limit 於 SQL 端套用），相同查詢在下次寫入前直接由快取回傳
+        key = ("logs", self._filters_key(filters), sort_by, reverse, limit, after)
+        return self._cached(key, lambda: [
+            self._row_to_dict(r) for r in self.db.get_log_rows(sort_by, reverse, filters, limit, after)
+        ])
 
-        # 取得排序後的日誌
-        logs = self.db.get_logs_with_sorting(sort_by, reverse, filters)
-        
-        # 轉換為字典格式
-        result = [self._log_to_dict(l) for l in logs]
-        
-        # 如果有指定 limit，只回傳前 N 筆
-        if limit is not None and limit > 0:
-            result = result[:limit]
-            
-        return result
+    def iter_logs(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        batch_size: int = 1000,
+        **filter_kwargs
+    ) -> Iterator[dict]:
+        """逐筆產生日誌字典（資料庫端分批讀取），適合大量匯出
+
+        Args:
+            sort_by: 排序欄位
+            reverse: 是否降序
+            batch_size: 每批從資料庫讀取的筆數
+            **filter_kwargs: 與 get_filtered_and_sorted_logs 相同的過濾參數
+        """
+        filters = self._build_filters(**filter_kwargs)
+        if filters is None:
+            return
+        for r in self.db.iter_log_rows(sort_by, reverse, filters, batch_size):
+            yield self._row_to_dict(r)
+
+    def search_notes(self, query: str, limit: int | None = 50, **filter_kwargs) -> list[dict]:
+        """全文搜尋備註，依相關度排序
+
+        Args:
+            query: 以空白分隔的搜尋詞（全部須出現，各為子字串比對）
+            limit: 限制回傳筆數
+            **filter_kwargs: 與 get_filtered_and_sorted_logs 相同的過濾參數
+        Returns:
+            list[dict]: 日誌清單，另含 rank（越小越相關）
+        """
+        filters = self._build_filters(**filter_kwargs)
+        if filters is None:
+            return []
+        return [{**self._row_to_dict(r), "rank": r.rank} for r in self.db.search_notes(query, filters, limit)]
+
+    def to_arrays(self, batch_size: int = 65536, **filter_kwargs):
+        """以 numpy 陣列取得日誌欄位（需要 numpy），不建立逐筆字典
+
+        Args:
+            batch_size: 每批從 cursor 讀取的筆數
+            **filter_kwargs: 與 get_filtered_and_sorted_logs 相同的過濾參數
+        Returns:
+            LogArrays: 見 dataBase.FinanceArrays，可交給 group_totals / period_summary 做向量化彙總
+        """
+        # FinanceArrays 依賴本模組，於呼叫時才載入
+        from dataBase.FinanceArrays import fetch_log_arrays, empty_log_arrays
+        filters = self._build_filters(**filter_kwargs)
+        if filters is None:
+            return empty_log_arrays()
+        return self._report(lambda db: fetch_log_arrays(db, filters, batch_size))
+
+    def to_dataframe(self, **filter_kwargs):
+        """以 pandas DataFrame 取得日誌（需要 numpy 與 pandas），參數同 to_arrays"""
+        from dataBase.FinanceArrays import to_dataframe
+        return to_dataframe(self.to_arrays(**filter_kwargs))
+
+    def export_logs(self,
+        fp: IO[str],
+        fmt: str = "csv",
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        batch_size: int = 1000,
+        **filter_kwargs
+    ) -> int:
+        """將日誌串流寫入文字檔（CSV 或 JSON Lines）
+
+        Args:
+            fp: 已開啟的文字檔（CSV 請以 newline="" 開啟）
+            fmt: "csv" 或 "jsonl"
+            sort_by: 排序欄位
+            reverse: 是否降序
+            batch_size: 每批從資料庫讀取的筆數
+            **filter_kwargs: 與 get_filtered_and_sorted_logs 相同的過濾參數
+        Returns:
+            int: 匯出筆數
+        """
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError("fmt 必須為 'csv' 或 'jsonl'")
+        filters = self._build_filters(**filter_kwargs)
+        count = 0
+        with self.db.reader() as db:
+            rows = () if filters is None else (
+                self._row_to_dict(r) for r in db.iter_log_rows(sort_by, reverse, filters, batch_size)
+            )
+            if fmt == "csv":
+                writer = csv.DictWriter(fp, fieldnames=LOG_FIELDS)
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for row in rows:
+                    fp.write(json.dumps(row, ensure_ascii=False))
+                    fp.write("\n")
+                    count += 1
+        return count
+
+    @staticmethod
+    def log_cursor(log: dict, sort_by: SortField = SortField.TIMESTAMP) -> tuple:
+        """由日誌字典取得 keyset 游標 (排序值, id)"""
+        value = log[sort_by.value]
+        if sort_by == SortField.TIMESTAMP and value is not None:
+            value = datetime.fromisoformat(value)
+        elif sort_by == SortField.DIRECTION and value is not None:
+            value = Direction(value)
+        return (value, log["id"])
+
+    def get_logs_page(self,
+        limit: int = 50,
+        after: tuple | None = None,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        **filter_kwargs
+    ) -> dict:
+        """以 keyset 分頁取得日誌，深層頁數與第一頁成本相同
 
-    def get_total_by_type(self) -> dict:
+        Args:
+            limit: 每頁筆數
+            after: 上一頁回傳的 next_after（第一頁為 None）
+            sort_by: 排序欄位
+            reverse: 是否降序
+            **filter_kwargs: 與 get_filtered_and_sorted_logs 相同的過濾參數
+        Returns:
+            dict: {"items": 日誌清單, "next_after": 下一頁游標（無下一頁時為 None）}
+        """
+        if not isinstance(limit, int) or limit <= 0:
+            raise ValueError("limit 必須為正整數")
+        items = self.get_filtered_and_sorted_logs(sort_by=sort_by, reverse=reverse, limit=limit, after=after, **filter_kwargs)
+        next_after = self.log_cursor(items[-1], sort_by) if len(items) == limit else None
+        return {"items": items, "next_after": next_after}
+
+    def get_totals(self, group_by: str = "direction", **filter_kwargs) -> dict:
+        """依指定方式計算總金額（由資料庫 GROUP BY 完成）
+
+        group_by 為 "direction" 時是各方向的總金額；其他分組會同時依方向分組，
+        回傳淨額（收入 − 支出），收入與支出不會直接相加。
+        Args:
+            group_by: 分組方式（"direction"、"category"、"day"、"month"、"year"）
+            **filter_kwargs: 與 get_filtered_and_sorted_logs 相同的過濾參數
+        Returns:
+            dict: {分組鍵: 總金額或淨額}
+        """
+        filters = self._build_filters(**filter_kwargs)
+        if filters is None:
+            return {}
+        key = ("totals", self._filters_key(filters), group_by)
+        group = self._totals_group(group_by)
+        return self._cached(key, lambda: self._totals_from_rows(self._report(lambda db: db.sum_by(group, filters))))
+
+    @staticmethod
+    def _totals_group(group_by: str) -> str | tuple[str, ...]:
+        """get_totals 實際使用的 sum_by 分組（非 direction 時加上 direction）"""
+        return group_by if group_by == "direction" else (group_by, "direction")
+
+    @staticmethod
+    def _totals_from_rows(rows: list[tuple]) -> dict:
+        """將 sum_by 結果轉為 {分組鍵: 總金額}；含方向的分組轉為淨額（方向為 NULL 的不計入）"""
+        result = {}
+        for key, *rest in rows:
+            if isinstance(key, Direction):
+                key = key.value
+            key = key if key is not None else "Unknown"
+            if len(rest) == 2:
+                result[key] = float(rest[0])
+                continue
+            direction, total, _count = rest
+            sign = 1 if direction == Direction.Income else -1 if direction == Direction.Expenditure else 0
+            result[key] = result.get(key, 0) + sign * total
+        return {k: float(v) for k, v in result.items()}
+
+    def get_total_by_type(self, **filter_kwargs) -> dict:
         """計算各交易方向的總金額"""
-        logs = self.db.get_all_logs()
-        result: dict[str, float] = {}
-        for l in logs:
-            key = (l.actual_type.value if l.actual_type else "Unknown")
-            result[key] = result.get(key, 0) + (l.amount or 0)
-        return result
+        return self.get_totals("direction", **filter_kwargs)
+
+    def balance_at(self, ts: datetime) -> float:
+        """指定時間點（含）的淨餘額：收入 − 支出（應收、應付不計入）"""
+        if not isinstance(ts, datetime):
+            raise ValueError("ts 必須為 datetime")
+        return self._cached(("balance_at", ts), lambda: float(self._report(lambda db: db.balance_at(ts))))
+
+    def running_balance(self, limit: int | None = None, **filter_kwargs) -> list[dict]:
+        """依時間升序列出日誌，並附上累計餘額
+
+        有 start_date 時，累計由 start_date 之前（符合其餘過濾條件）的淨額開始。
+        Args:
+            limit: 限制回傳筆數
+            **filter_kwargs: 與 get_filtered_and_sorted_logs 相同的過濾參數
+        Returns:
+            list[dict]: 日誌清單，另含 balance
+        """
+        filters = self._build_filters(**filter_kwargs)
+        if filters is None:
+            return []
+        key = ("running_balance", self._filters_key(filters), limit)
+        return self._cached(key, lambda: [
+            {**self._row_to_dict(r), "balance": float(r.balance)}
+            for r in self._report(lambda db: db.running_balance(filters, limit))
+        ])
+
+    def period_summary(self, year: int, granularity: str = "month") -> dict:
+        """產生指定年份的收入/支出摘要（單一分組查詢）
+
+        每個期間為半開區間 [月初, 下月初)（年為 [1/1, 隔年 1/1)），依日誌時間的年月分組。
+        舊的逐月迴圈以 end_date=當月最後一天 00:00 為止，會漏掉最後一天其餘時間的日誌。
+        Args:
+            year: 年份
+            granularity: "month"（每月一筆，含無資料月份）或 "year"
+        Returns:
+            dict: {期間鍵: {"Totals": {...}, "Income Categories": {...}, "Expenditure Categories": {...}}}
+                  金額為兩位小數的 Decimal
+        """
+        periods, filters = self._period_range(year, granularity)
+        return self._cached(
+            ("summary", year, granularity),
+            lambda: self._build_period_summary(
+                periods, self._report(lambda db: db.sum_by((granularity, "direction", "category"), filters))
+            ),
+        )
+
+    @staticmethod
+    def _period_range(year: int, granularity: str) -> tuple[list[str], dict]:
+        """取得摘要的期間鍵清單與對應的日期過濾條件"""
+        if granularity == "month":
+            periods = [f"{year}-{m:02d}" for m in range(1, 13)]
+        elif granularity == "year":
+            periods = [f"{year}"]
+        else:
+            raise ValueError("granularity 必須為 'month' 或 'year'")
+        filters = {
+            "start_date": datetime(year, 1, 1),
+            "end_date": datetime(year, 12, 31, 23, 59, 59, 999999),
+        }
+        return periods, filters
+
+    @staticmethod
+    def _build_period_summary(periods: list[str], rows: list[tuple]) -> dict:
+        """由 (期間, 方向, 類別, 金額, 筆數) 分組結果組成摘要字典"""
+        summary = {}
+        for p in periods:
+            summary[p] = {
+                "Totals": {},
+                "Income Categories": {},
+                "Expenditure Categories": {},
+            }
+        zero = Decimal("0.00")
+        totals = {p: {Direction.Income: zero, Direction.Expenditure: zero} for p in periods}
+
+        for period, direction, category, total, _count in rows:
+            if direction == Direction.Income:
+                section = "Income Categories"
+            elif direction == Direction.Expenditure:
+                section = "Expenditure Categories"
+            else:
+                continue
+            summary[period][section][category] = total
+            totals[period][direction] += total
+
+        for p in periods:
+            income = totals[p][Direction.Income]
+            expenditure = totals[p][Direction.Expenditure]
+            summary[p]["Totals"] = {
+                "Total Income": income,
+                "Total Expenditure": expenditure,
+                "Remaining Amount": income - expenditure,
+            }
+        return summary
 
     def update_category(self, category_id: int, name: str | None = None, default_type: Direction | None = None) -> dict | None:
         """修改類別（高階功能）"""
@@ -392,6 +1996,8 @@ class FinanceService:
             raise ValueError("default_type 必須為 Direction")
             
         cat = self.db.update_category(category_id, name, default_type)
+        self._invalidate_categories()
+        self._invalidate_results()
         if not cat:
             return None
         return {"id": cat.id, "name": cat.name, "default_type": cat.default_type.value}
@@ -410,7 +2016,7 @@ class FinanceService:
         if category_name is not None:
             if not isinstance(category_name, str) or not category_name:
                 raise ValueError("category_name 必須為非空字串")
-            cat = self.db.get_category_by_name(category_name)
+            cat = self._get_category(category_name)
             if not cat:
                 raise ValueError(f"找不到類別 '{category_name}'")
             category_id = cat.id
@@ -418,7 +2024,7 @@ class FinanceService:
         if actual_type is not None and not isinstance(actual_type, Direction):
             raise ValueError("actual_type 必須為 Direction")
             
-        if amount is not None and not isinstance(amount, (int, float)):
+        if amount is not None and not isinstance(amount, (int, float, Decimal)):
             raise ValueError("amount 必須為數字")
             
         if note is not None and not isinstance(note, str):
@@ -428,9 +2034,355 @@ class FinanceService:
             raise ValueError("timestamp 必須為 datetime")
             
         log = self.db.update_log(log_id, category_id, actual_type, amount, note, timestamp)
+        self._invalidate_results()
         if not log:
             return None
         return self._log_to_dict(log)
 
+    def delete_log(self, log_id: int) -> bool:
+        """刪除財務日誌（高階功能）"""
+        deleted = self.db.delete_log_by_id(log_id)
+        if deleted:
+            self._invalidate_results()
+        return deleted
+
+    def _log_changes(self,
+        category_name: str | None = None,
+        actual_type: Direction | None = None,
+        amount: float | None = None,
+        note: str | None = None,
+        timestamp: datetime | None = None
+    ) -> dict:
+        """驗證日誌修改欄位，回傳 FinanceDB 欄位字典（類別名稱轉為 category_id，None 表示不修改）"""
+        changes = {}
+        if category_name is not None:
+            if not isinstance(category_name, str) or not category_name:
+                raise ValueError("category_name 必須為非空字串")
+            cat = self._get_category(category_name)
+            if not cat:
+                raise ValueError(f"找不到類別 '{category_name}'")
+            changes["category_id"] = cat.id
+        if actual_type is not None:
+            if not isinstance(actual_type, Direction):
+                raise ValueError("actual_type 必須為 Direction")
+            changes["actual_type"] = actual_type
+        if amount is not None:
+            if not isinstance(amount, (int, float, Decimal)):
+                raise ValueError("amount 必須為數字")
+            changes["amount"] = amount
+        if note is not None:
+            if not isinstance(note, str):
+                raise ValueError("note 必須為字串")
+            changes["note"] = note
+        if timestamp is not None:
+            if not isinstance(timestamp, datetime):
+                raise ValueError("timestamp 必須為 datetime")
+            changes["timestamp"] = timestamp
+        return changes
+
+    def update_logs_where(self, filters: dict, **changes) -> dict:
+        """以單一 UPDATE 修改所有符合過濾條件的日誌（高階功能）
+
+        例：update_logs_where({"category_name": "Food", "note_keyword": "Uber Eats"}, category_name="Delivery")
+
+        Args:
+            filters: 與 get_filtered_and_sorted_logs 相同的過濾參數字典（至少一個）
+            **changes: 與 update_log 同名的欄位（category_name, actual_type, amount, note, timestamp）
+        Returns:
+            dict: {"count": 修改筆數}；沒有要修改的欄位時不執行，回傳 0
+        """
+        unknown = set(changes) - {"category_name", "actual_type", "amount", "note", "timestamp"}
+        if unknown:
+            raise ValueError(f"不支援修改的欄位：{', '.join(sorted(unknown))}")
+        values = self._log_changes(**changes)
+        db_filters = self._build_filters(**filters)
+        if db_filters is None:
+            return {"count": 0}
+        if not db_filters:
+            raise ValueError("至少需要一個過濾條件")
+        if not values:
+            return {"count": 0}
+        count = self.db.update_logs_where(db_filters, **values)
+        if count:
+            self._invalidate_results()
+        return {"count": count}
+
+    def delete_logs_where(self, filters: dict) -> dict:
+        """以單一 DELETE 刪除所有符合過濾條件的日誌（高階功能）
+
+        Args:
+            filters: 與 get_filtered_and_sorted_logs 相同的過濾參數字典（至少一個）
+        Returns:
+            dict: {"count": 刪除筆數}
+        """
+        db_filters = self._build_filters(**filters)
+        if db_filters is None:
+            return {"count": 0}
+        if not db_filters:
+            raise ValueError("至少需要一個過濾條件")
+        count = self.db.delete_logs_where(db_filters)
+        if count:
+            self._invalidate_results()
+        return {"count": count}
+
+    def update_logs_bulk(self, updates: Iterable[dict], chunk_size: int = 5000) -> dict:
+        """批次修改財務日誌（高階功能）
+
+        Args:
+            updates: 每筆包含 id，以及與 update_log 同名的欄位（category_name, actual_type, amount, note, timestamp）
+            chunk_size: 每次寫入的筆數
+        Returns:
+            dict: {"count": 修改筆數}
+        """
+        changes = []
+        for i, item in enumerate(updates):
+            log_id = item.get("id")
+            if not isinstance(log_id, int):
+                raise ValueError(f"第 {i} 筆資料錯誤：id 必須為整數")
+            change = {"id": log_id}
+            try:
+                change.update(self._log_changes(
+                    item.get("category_name"), item.get("actual_type"), item.get("amount"), item.get("note"), item.get("timestamp")
+                ))
+            except ValueError as e:
+                raise ValueError(f"第 {i} 筆資料錯誤：{e}") from None
+            if len(change) > 1:
+                changes.append(change)
+        count = self.db.update_logs_bulk(changes, chunk_size=chunk_size) if changes else 0
+        if count:
+            self._invalidate_results()
+        return {"count": count}
+
+    # 應收應付 高階功能
+    def _open_item_filters(self,
+        direction: Direction | None = None,
+        counterparty: str | None = None,
+        category_name: str | None = None
+    ) -> dict | None:
+        """將高階過濾參數轉為項目過濾條件；類別不存在時回傳 None"""
+        filters = {}
+        if direction is not None:
+            if direction not in OPEN_ITEM_TYPES:
+                raise ValueError("direction 必須為 Receivable 或 Payable")
+            filters["direction"] = direction
+        if counterparty is not None:
+            filters["counterparty"] = counterparty
+        if category_name:
+            cat = self._get_category(category_name)
+            if not cat:
+                return None
+            filters["category_id"] = cat.id
+        return filters
 
+    @staticmethod
+    def _open_item_to_dict(r) -> dict:
+        """轉換項目 Row（FinanceDB.open_items）為字典格式"""
+        return {
+            "id": r.log_id,
+            "direction": r.direction.value,
+            "category_id": r.category_id,
+            "category": r.category,
+            "counterparty": r.counterparty,
+            "opened_at": (r.opened_at.isoformat() if r.opened_at else None),
+            "amount": float(r.amount),
+            "outstanding": float(r.outstanding),
+            "note": r.note,
+        }
+
+    @staticmethod
+    def _aging_labels(buckets: tuple[int, ...]) -> list[str]:
+        """帳齡組名稱，例如 (30, 60) → ["0-30", "31-60", "60+"]"""
+        labels, low = [], 0
+        for days in buckets:
+            labels.append(f"{low}-{days}")
+            low = days + 1
+        labels.append(f"{buckets[-1]}+" if buckets else "0+")
+        return labels
+
+    def add_open_item(self,
+        category_name: str,
+        direction: Direction,
+        amount: float,
+        counterparty: str | None = None,
+        note: str | None = None,
+        actuall_time: datetime | None = None
+    ) -> dict:
+        """新增應收／應付項目（高階功能）"""
+        self._validate_log_fields(category_name, amount, direction, note, actuall_time)
+        if direction not in OPEN_ITEM_TYPES:
+            raise ValueError("direction 必須為 Receivable 或 Payable")
+        if counterparty is not None and not isinstance(counterparty, str):
+            raise ValueError("counterparty 必須為字串或 None")
+        cat = self._get_category(category_name)
+        if not cat:
+            raise ValueError(f"找不到類別 '{category_name}'")
+        log = self.db.create_open_item(cat.id, direction, amount, counterparty, note, actuall_time)
+        self._invalidate_results()
+        return {**self._log_to_dict(log), "counterparty": counterparty, "outstanding": float(log.amount)}
+
+    def set_counterparty(self, item_id: int, counterparty: str | None) -> bool:
+        """設定項目的交易對象（高階功能）"""
+        if counterparty is not None and not isinstance(counterparty, str):
+            raise ValueError("counterparty 必須為字串或 None")
+        updated = self.db.set_counterparty(item_id, counterparty)
+        if updated:
+            self._invalidate_results()
+        return updated
+
+    def settle(self, item_id: int, settlement_log_id: int, amount: float | None = None) -> dict | None:
+        """以既有的收入／支出日誌沖銷項目（高階功能）
+
+        Returns:
+            dict | None: {"item_id", "settlement_log_id", "amount", "outstanding"}；項目或日誌不存在時回傳 None
+        """
+        if amount is not None and not isinstance(amount, (int, float, Decimal)):
+            raise ValueError("amount 必須為數字或 None")
+        result = self.db.settle(item_id, settlement_log_id, amount)
+        if result is None:
+            return None
+        self._invalidate_results()
+        settled, outstanding = result
+        return {"item_id": item_id, "settlement_log_id": settlement_log_id,
+                "amount": float(settled), "outstanding": float(outstanding)}
+
+    def record_settlement(self,
+        item_id: int,
+        amount: float | None = None,
+        note: str | None = None,
+        actuall_time: datetime | None = None,
+        category_name: str | None = None
+    ) -> dict | None:
+        """新增沖銷日誌並沖銷項目（高階功能）
+
+        Args:
+            amount: 沖銷金額；None 表示全部未結金額
+            category_name: 沖銷日誌的類別；None 表示沿用項目的類別
+        Returns:
+            dict | None: {"item_id", "log": 沖銷日誌, "amount", "outstanding"}；項目不存在時回傳 None
+        """
+        if amount is not None and not isinstance(amount, (int, float, Decimal)):
+            raise ValueError("amount 必須為數字或 None")
+        if note is not None and not isinstance(note, str):
+            raise ValueError("note 必須為字串或 None")
+        if actuall_time is not None and not isinstance(actuall_time, datetime):
+            raise ValueError("actuall_time 必須為 datetime 或 None")
+        category_id = None
+        if category_name is not None:
+            cat = self._get_category(category_name)
+            if not cat:
+                raise ValueError(f"找不到類別 '{category_name}'")
+            category_id = cat.id
+        result = self.db.record_settlement(item_id, amount, note, actuall_time, category_id)
+        if result is None:
+            return None
+        self._invalidate_results()
+        log, outstanding = result
+        return {"item_id": item_id, "log": self._log_to_dict(log),
+                "amount": float(log.amount), "outstanding": float(outstanding)}
+
+    def auto_settle(self, settlement_log_id: int, counterparty: str | None = None, category_name: str | None = None) -> dict | None:
+        """把沖銷日誌未分配的金額依先進先出分配給未結項目（高階功能）
+
+        Args:
+            counterparty: 只沖銷此交易對象的項目
+            category_name: 只沖銷此類別的項目；兩者皆未指定時為沖銷日誌的類別
+        Returns:
+            dict | None: {"allocations": [{"item_id", "amount"}], "count", "amount"}；日誌不存在時回傳 None
+        """
+        filters = None
+        if counterparty is not None or category_name is not None:
+            filters = self._open_item_filters(counterparty=counterparty, category_name=category_name)
+            if filters is None:
+                raise ValueError(f"找不到類別 '{category_name}'")
+        allocations = self.db.auto_settle(settlement_log_id, filters)
+        if allocations is None:
+            return None
+        if allocations:
+            self._invalidate_results()
+        return {
+            "allocations": [{"item_id": item_id, "amount": float(amount)} for item_id, amount in allocations],
+            "count": len(allocations),
+            "amount": float(sum((amount for _id, amount in allocations), Decimal(0))),
+        }
+
+    def open_items(self,
+        as_of: datetime | None = None,
+        direction: Direction | None = None,
+        counterparty: str | None = None,
+        category_name: str | None = None,
+        limit: int | None = None
+    ) -> list[dict]:
+        """列出指定時間點（預設目前）的未結項目，依 opened_at 由舊到新
+
+        Returns:
+            list[dict]: {"id", "direction", "category_id", "category", "counterparty", "opened_at", "amount", "outstanding", "note"}
+        """
+        if as_of is not None and not isinstance(as_of, datetime):
+            raise ValueError("as_of 必須為 datetime 或 None")
+        filters = self._open_item_filters(direction, counterparty, category_name)
+        if filters is None:
+            return []
+        key = ("open_items", as_of, self._filters_key(filters), limit)
+        return self._cached(key, lambda: [
+            self._open_item_to_dict(r) for r in self._report(lambda db: db.open_items(as_of, filters, limit))
+        ])
+
+    def aging(self,
+        as_of: datetime | None = None,
+        buckets: tuple[int, ...] = (30, 60, 90),
+        direction: Direction | None = None,
+        counterparty: str | None = None,
+        category_name: str | None = None,
+        group_by: str | None = None
+    ) -> list[dict]:
+        """帳齡分析：依帳齡組（與交易對象或類別）加總未結金額
+
+        Args:
+            as_of: 時間點（None 表示目前）
+            buckets: 遞增的天數分界，預設為 0-30、31-60、61-90、90+
+            group_by: None、"counterparty" 或 "category"
+        Returns:
+            list[dict]: {"direction", ["counterparty" | "category",] "bucket", "outstanding", "count"}
+        """
+        if as_of is not None and not isinstance(as_of, datetime):
+            raise ValueError("as_of 必須為 datetime 或 None")
+        buckets = tuple(buckets)
+        filters = self._open_item_filters(direction, counterparty, category_name)
+        if filters is None:
+            return []
+        labels = self._aging_labels(buckets)
+
+        def compute():
+            result = []
+            for row in self._report(lambda db: db.aging(as_of, buckets, filters, group_by)):
+                item = {"direction": row[0].value}
+                if group_by == "counterparty":
+                    item["counterparty"] = row[1]
+                elif group_by == "category":
+                    item["category"] = self.get_category_name(row[1])
+                bucket, outstanding, count = row[-3:]
+                item.update({"bucket": labels[bucket], "outstanding": float(outstanding), "count": count})
+                result.append(item)
+            return result
+        return self._cached(("aging", as_of, buckets, self._filters_key(filters), group_by), compute)
+
+    def outstanding_balances(self, group_by: str | None = "counterparty", direction: Direction | None = None) -> list[dict]:
+        """目前各交易對象（或類別）的未結金額，由未結餘額彙總表取得
+
+        Returns:
+            list[dict]: {"direction", ["counterparty" | "category",] "outstanding", "count"}
+        """
+        filters = self._open_item_filters(direction)
 
+        def compute():
+            result = []
+            for row in self._report(lambda db: db.outstanding_balances(group_by, filters)):
+                item = {"direction": row[0].value}
+                if group_by == "counterparty":
+                    item["counterparty"] = row[1]
+                elif group_by == "category":
+                    item["category"] = self.get_category_name(row[1])
+                item.update({"outstanding": float(row[-2]), "count": row[-1]})
+                result.append(item)
+            return result
+        return self._cached(("outstanding_balances", group_by, self._filters_key(filters)), compute)
@@ -0,0 +1,272 @@
+from dataBase.FinanceDB import FinanceService, Direction, to_cents, from_cents
+from concurrent.futures import Executor, ProcessPoolExecutor
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+
+# CSV 必要欄位（表頭名稱）；actual_type、note 為選用
+CSV_REQUIRED = ("timestamp", "amount", "category")
+_OFX_BLOCK = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.S | re.I)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def import_hash(timestamp: datetime, cents: int, note: str | None) -> str:
+    """匯入去重用雜湊：(時間, 金額分, 備註)"""
+    return hashlib.sha1(f"{timestamp.isoformat()}|{cents}|{note or ''}".encode()).hexdigest()
+
+
+# 讀取：只在主程序切出原始紀錄，轉換與驗證交給工作程序
+def read_csv_records(path: str) -> Iterator[dict]:
+    """逐筆讀取 CSV（第一列為表頭），產生 {欄位: 字串}"""
+    with open(path, newline="", encoding="utf-8-sig") as fp:
+        reader = csv.DictReader(fp)
+        missing = [c for c in CSV_REQUIRED if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV 缺少欄位：{', '.join(missing)}")
+        yield from reader
+
+
+def read_ofx_records(path: str, block_size: int = 1 << 20) -> Iterator[str]:
+    """逐段讀取 OFX/QFX，產生每筆 <STMTTRN> 區塊的內容"""
+    with open(path, encoding="utf-8", errors="replace") as fp:
+        buf = ""
+        while chunk := fp.read(block_size):
+            buf += chunk
+            end = 0
+            for m in _OFX_BLOCK.finditer(buf):
+                yield m.group(1)
+                end = m.end()
+            buf = buf[end:]
+
+
+# 轉換：在工作程序執行，必須是模組層級函式才能 pickle
+def _finish_record(ts: datetime, amount, category, actual_type, note) -> dict:
+    """共用的金額方向處理：未指定方向的負數金額視為支出並取絕對值"""
+    cents = to_cents(amount)
+    digest = import_hash(ts, cents, note)
+    if actual_type is None and cents < 0:
+        actual_type = Direction.Expenditure
+    return {
+        "category_name": category,
+        "amount": from_cents(abs(cents)),
+        "actual_type": actual_type,
+        "note": note,
+        "actuall_time": ts,
+        "import_hash": digest,
+    }
+
+
+def parse_csv_chunk(args: tuple[int, list[dict], str | None]) -> tuple[list[tuple[int, dict]], list[tuple[int, str]]]:
+    """轉換並驗證一段 CSV 紀錄
+
+    Args:
+        args: (第一筆的紀錄序號, 原始紀錄, 預設類別)
+    Returns:
+        ([(紀錄序號, add_logs_bulk 的字典)], [(紀錄序號, 錯誤訊息)])
+    """
+    start, records, default_category = args
+    logs, errors = [], []
+    for i, rec in enumerate(records, start):
+        try:
+            ts = datetime.fromisoformat(rec["timestamp"].strip())
+            category = (rec.get("category") or "").strip() or default_category
+            if not category:
+                raise ValueError("缺少類別")
+            actual_type = (rec.get("actual_type") or "").strip()
+            note = (rec.get("note") or "").strip() or None
+            logs.append((i, _finish_record(ts, rec["amount"].strip(), category, Direction(actual_type) if actual_type else None, note)))
+        except Exception as e:
+            errors.append((i, str(e)))
+    return logs, errors
+
+
+def _parse_ofx_datetime(value: str) -> datetime:
+    """OFX 日期：YYYYMMDD[HHMMSS[.XXX]][時區]，只取前 14 位數字"""
+    digits = re.match(r"\d{8,14}", value.strip())
+    if not digits:
+        raise ValueError(f"日期格式錯誤：{value}")
+    return datetime.strptime(digits.group(0).ljust(14, "0"), "%Y%m%d%H%M%S")
+
+
+def parse_ofx_chunk(args: tuple[int, list[str], str | None]) -> tuple[list[tuple[int, dict]], list[tuple[int, str]]]:
+    """轉換並驗證一段 OFX 交易（參數與回傳同 parse_csv_chunk）
+
+    類別一律使用預設類別；正數金額（入帳）記為收入，負數記為支出。
+    """
+    start, blocks, default_category = args
+    logs, errors = [], []
+    for i, block in enumerate(blocks, start):
+        try:
+            if not default_category:
+                raise ValueError("OFX 匯入需要指定預設類別")
+            fields = {k.upper(): v.strip() for k, v in _OFX_FIELD.findall(block)}
+            ts = _parse_ofx_datetime(fields["DTPOSTED"])
+            note = fields.get("MEMO") or fields.get("NAME") or None
+            amount = fields["TRNAMT"]
+            actual_type = None if amount.startswith("-") else Direction.Income
+            logs.append((i, _finish_record(ts, amount, default_category, actual_type, note)))
+        except KeyError as e:
+            errors.append((i, f"缺少欄位 {e.args[0]}"))
+        except Exception as e:
+            errors.append((i, str(e)))
+    return logs, errors
+
+
+FORMATS = {
+    "csv": (read_csv_records, parse_csv_chunk),
+    "ofx": (read_ofx_records, parse_ofx_chunk),
+}
+
+
+def detect_format(path: str) -> str:
+    """由副檔名判斷格式（.ofx / .qfx 為 OFX，其餘為 CSV）"""
+    return "ofx" if os.path.splitext(path)[1].lower() in (".ofx", ".qfx") else "csv"
+
+
+# 檢查點
+def checkpoint_path(path: str) -> str:
+    return path + ".checkpoint.json"
+
+
+def _load_checkpoint(path: str) -> dict | None:
+    """讀取檢查點；來源檔大小改變時視為不同檔案，從頭匯入"""
+    cp = checkpoint_path(path)
+    if not os.path.exists(cp):
+        return None
+    with open(cp, encoding="utf-8") as fp:
+        state = json.load(fp)
+    if state.get("size") != os.path.getsize(path):
+        return None
+    return state
+
+
+def _save_checkpoint(path: str, state: dict):
+    """先寫暫存檔再取代，程序中斷時不會留下半個檢查點"""
+    cp = checkpoint_path(path)
+    tmp = cp + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        json.dump(state, fp)
+    os.replace(tmp, cp)
+
+
+def _chunks(records: Iterable, chunk_size: int, start: int, default_category: str | None) -> Iterator[tuple]:
+    it = iter(records)
+    while batch := list(islice(it, chunk_size)):
+        yield (start, batch, default_category)
+        start += len(batch)
+
+
+def import_file(
+    service: FinanceService,
+    path: str,
+    fmt: str | None = None,
+    default_category: str | None = None,
+    chunk_size: int = 5000,
+    workers: int | None = None,
+    resume: bool = True,
+    progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """串流匯入 CSV 或 OFX 檔
+
+    主程序讀取原始紀錄並分段，工作程序負責轉換與驗證，結果依序交由主程序（唯一寫入者）
+    去重後以 add_logs_bulk 寫入；每段提交後更新檢查點，中斷後再次執行會從檢查點繼續。
+
+    Args:
+        service: 寫入用的 FinanceService（類別由其快取查詢）
+        path: 來源檔路徑
+        fmt: "csv" 或 "ofx"（None 表示依副檔名判斷）
+        default_category: CSV 類別欄空白時，以及 OFX 所有交易使用的類別
+        chunk_size: 每段紀錄數（也是每次交易寫入的上限）
+        workers: 工作程序數（None 表示 CPU 數，0 表示在主程序轉換）
+        resume: 是否從檢查點繼續
+        progress: 每段完成後呼叫，參數為目前統計
+    Returns:
+        dict: {"records", "inserted", "duplicates", "errors", "error_samples", "seconds", "rows_per_sec"}
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError("fmt 必須為 'csv' 或 'ofx'")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必須為正整數")
+    reader, parser = FORMATS[fmt]
+
+    state = (_load_checkpoint(path) if resume else None) or {
+        "size": os.path.getsize(path), "records": 0, "inserted": 0, "duplicates": 0, "errors": 0,
+    }
+    done = state["records"]
+    records = islice(reader(path), done, None)
+    chunks = _chunks(records, chunk_size, done, default_category)
+    samples: list[tuple[int, str]] = []
+    t0 = time.perf_counter()
+    processed = 0
+
+    def write(result: tuple[list[tuple[int, dict]], list[tuple[int, str]]], count: int):
+        nonlocal processed
+        logs, errors = result
+        # 批內與資料庫中已存在的雜湊都略過；類別由 FinanceService 的快取查詢
+        seen = service.db.existing_import_hashes(log["import_hash"] for _i, log in logs)
+        fresh, duplicates = [], 0
+        for i, log in logs:
+            if log["import_hash"] in seen:
+                duplicates += 1
+            elif service.get_category(log["category_name"]) is None:
+                errors.append((i, f"找不到類別 '{log['category_name']}'"))
+            else:
+                seen.add(log["import_hash"])
+                fresh.append(log)
+        if fresh:
+            service.add_logs_bulk(fresh, chunk_size=chunk_size)
+        state["records"] += count
+        state["inserted"] += len(fresh)
+        state["duplicates"] += duplicates
+        state["errors"] += len(errors)
+        samples.extend(errors[: max(0, 20 - len(samples))])
+        _save_checkpoint(path, state)
+        processed += count
+        if progress:
+            progress(_stats(state, samples, processed, time.perf_counter() - t0))
+
+    if workers == 0:
+        for args in chunks:
+            write(parser(args), len(args[1]))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            _run_pool(pool, parser, chunks, write, workers * 2)
+
+    # 空檔或只有表頭時不會寫過檢查點
+    if os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    return _stats(state, samples, processed, time.perf_counter() - t0)
+
+
+def _run_pool(pool: Executor, parser, chunks: Iterator[tuple], write, max_pending: int):
+    """限制同時送出的分段數（避免整個檔案一次讀進記憶體），並依原順序寫入"""
+    pending = deque()
+    for args in chunks:
+        pending.append((pool.submit(parser, args), len(args[1])))
+        if len(pending) >= max_pending:
+            future, count = pending.popleft()
+            write(future.result(), count)
+    while pending:
+        future, count = pending.popleft()
+        write(future.result(), count)
+
+
+def _stats(state: dict, samples: list, processed: int, seconds: float) -> dict:
+    return {
+        "records": state["records"],
+        "inserted": state["inserted"],
+        "duplicates": state["duplicates"],
+        "errors": state["errors"],
+        "error_samples": samples,
+        "seconds": seconds,
+        "rows_per_sec": processed / seconds if seconds > 0 else 0.0,
+    }
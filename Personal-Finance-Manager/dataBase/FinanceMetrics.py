@@ -0,0 +1,269 @@
+from sqlalchemy import event
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Iterator
+import bisect
+import functools
+import inspect
+import threading
+import time
+
+# 延遲直方圖的上界（毫秒），最後一格為 +Inf
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# 會附上執行計畫的語句種類
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class LatencyHistogram:
+    """固定分格的延遲直方圖（毫秒）"""
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, pct: float) -> float:
+        """由分格估計百分位數（取所在分格的上界，不超過最大值）"""
+        if not self.count:
+            return 0.0
+        target = pct / 100 * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {str(b): n for b, n in zip((*BUCKETS_MS, "inf"), self.counts)},
+        }
+
+
+class _MethodStats:
+    """單一方法的延遲與每次呼叫執行的 SQL 語句數"""
+    __slots__ = ("latency", "statements", "max_statements")
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statements = 0
+        self.max_statements = 0
+
+
+class _Call:
+    """進行中的方法呼叫（巢狀呼叫各有一個，語句會計入每一層）"""
+    __slots__ = ("name", "statements")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.statements = 0
+
+
+# 目前執行緒／工作的呼叫堆疊
+_calls: ContextVar[tuple[_Call, ...]] = ContextVar("finance_metrics_calls", default=())
+
+
+class FinanceMetrics:
+    """FinanceDB 查詢量測：方法延遲直方圖、每次呼叫的語句數、慢查詢紀錄（附執行計畫）
+
+    以 FinanceDB(metrics=FinanceMetrics()) 啟用；語句由 engine 事件量測，
+    方法由 instrument_methods 包裝（未啟用時只多一次屬性檢查）。
+    語句耗時為 cursor.execute 的時間，不含之後逐批取回結果的時間。
+    """
+    def __init__(self, slow_query_ms: float | None = 100.0, explain: bool = True, slow_log_size: int = 100):
+        """
+        Args:
+            slow_query_ms: 慢查詢門檻毫秒數（None 表示不記錄）
+            explain: 慢查詢是否附上 EXPLAIN 執行計畫
+            slow_log_size: 保留的慢查詢筆數上限（保留最新的）
+        """
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.slow_queries: deque[dict] = deque(maxlen=slow_log_size)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清除所有統計"""
+        with self.lock:
+            self.statements: dict[str, LatencyHistogram] = {}
+            self.methods: dict[str, _MethodStats] = {}
+            self.slow_total = 0
+            self.slow_queries.clear()
+
+    # engine 事件
+    def attach(self, engine):
+        """在 engine 上註冊語句量測事件"""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def detach(self, engine):
+        event.remove(engine, "before_cursor_execute", self._before_execute)
+        event.remove(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        ms = (time.perf_counter() - context._metrics_started) * 1000
+        calls = _calls.get()
+        for call in calls:
+            call.statements += 1
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        with self.lock:
+            hist = self.statements.get(kind)
+            if hist is None:
+                hist = self.statements[kind] = LatencyHistogram()
+            hist.add(ms)
+        if self.slow_query_ms is not None and ms >= self.slow_query_ms:
+            # cursor.executemany 的參數是多組，只以第一組取得執行計畫
+            if executemany and isinstance(parameters, list):
+                parameters = parameters[0] if parameters else ()
+            plan = self._explain(conn, statement, parameters) if self.explain and kind in _EXPLAINABLE else None
+            entry = {
+                "at": datetime.now().isoformat(timespec="seconds"),
+                "ms": round(ms, 3),
+                "method": calls[-1].name if calls else None,
+                "statement": statement,
+                "parameters": repr(parameters)[:200],
+                "executemany": executemany,
+                "plan": plan,
+            }
+            with self.lock:
+                self.slow_total += 1
+                self.slow_queries.append(entry)
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters) -> list[str]:
+        """以原始 DBAPI cursor 取得執行計畫（不經過 engine 事件，也不影響原查詢尚未取回的結果）"""
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        cur = conn.connection.dbapi_connection.cursor()
+        try:
+            cur.execute(prefix + statement, parameters or ())
+            return [str(r[-1]) for r in cur.fetchall()]
+        except Exception as e:
+            return [f"EXPLAIN 失敗：{e}"]
+        finally:
+            cur.close()
+
+    # 方法量測
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        """量測一段呼叫的延遲與其間執行的語句數"""
+        call = _Call(name)
+        token = _calls.set(_calls.get() + (call,))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            _calls.reset(token)
+            with self.lock:
+                stats = self.methods.get(name)
+                if stats is None:
+                    stats = self.methods[name] = _MethodStats()
+                stats.latency.add(ms)
+                stats.statements += call.statements
+                stats.max_statements = max(stats.max_statements, call.statements)
+
+    # 輸出
+    def snapshot(self) -> dict:
+        """目前統計（JSON 可序列化）
+
+        Returns:
+            dict: {"statements": {種類: 直方圖}, "methods": {方法: {"latency", "statements", "mean_statements", "max_statements"}},
+                   "slow_query_ms", "slow_total", "slow_queries": [...]}
+        """
+        with self.lock:
+            return {
+                "statements": {kind: h.snapshot() for kind, h in sorted(self.statements.items())},
+                "methods": {
+                    name: {
+                        "latency": s.latency.snapshot(),
+                        "statements": s.statements,
+                        "mean_statements": round(s.statements / s.latency.count, 3) if s.latency.count else 0.0,
+                        "max_statements": s.max_statements,
+                    }
+                    for name, s in sorted(self.methods.items())
+                },
+                "slow_query_ms": self.slow_query_ms,
+                "slow_total": self.slow_total,
+                "slow_queries": list(self.slow_queries),
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文字格式（直方圖單位為秒）"""
+        lines = []
+
+        def histogram(metric: str, help_text: str, items: list[tuple[str, LatencyHistogram]]):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, h in items:
+                cumulative = 0
+                for bound, n in zip((*BUCKETS_MS, None), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound is None else f"{bound / 1000:g}"
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{labels}}} {h.total_ms / 1000:.6f}")
+                lines.append(f"{metric}_count{{{labels}}} {h.count}")
+
+        with self.lock:
+            histogram("financedb_statement_duration_seconds", "SQL statement execution time",
+                      [(f'kind="{k}"', h) for k, h in sorted(self.statements.items())])
+            methods = sorted(self.methods.items())
+            histogram("financedb_method_duration_seconds", "FinanceDB / FinanceService method latency",
+                      [(f'method="{name}"', s.latency) for name, s in methods])
+            lines.append("# HELP financedb_method_statements_total SQL statements executed inside the method")
+            lines.append("# TYPE financedb_method_statements_total counter")
+            lines.extend(f'financedb_method_statements_total{{method="{name}"}} {s.statements}' for name, s in methods)
+            lines.append("# HELP financedb_method_statements_max Most statements executed by a single call")
+            lines.append("# TYPE financedb_method_statements_max gauge")
+            lines.extend(f'financedb_method_statements_max{{method="{name}"}} {s.max_statements}' for name, s in methods)
+            lines.append("# HELP financedb_slow_queries_total Statements slower than the slow query threshold")
+            lines.append("# TYPE financedb_slow_queries_total counter")
+            lines.append(f"financedb_slow_queries_total {self.slow_total}")
+        return "\n".join(lines) + "\n"
+
+
+def _instrumented(func, name: str):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return func(self, *args, **kwargs)
+        with metrics.track(name):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
+def instrument_methods(*exclude: str):
+    """類別裝飾器：以 self.metrics 量測所有公開方法
+
+    產生器方法（串流）與 exclude 列出的方法不包裝；靜態方法與屬性不受影響。
+    """
+    def decorate(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith("_") or name in exclude:
+                continue
+            if not inspect.isfunction(func) or inspect.isgeneratorfunction(func):
+                continue
+            setattr(cls, name, _instrumented(func, f"{cls.__name__}.{name}"))
+        return cls
+    return decorate
@@ -0,0 +1,205 @@
+"""資料模型：ORM 資料表、金額型別與列舉（FinanceDB 與 FinanceBackend 共用，不依賴任何後端）"""
+from sqlalchemy import Column, Integer, BigInteger, String, Enum, ForeignKey, DateTime, Index, TypeDecorator, func, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import enum
+
+Base = declarative_base()
+
+def to_cents(value) -> int:
+    """將金額（int、float、Decimal 或數字字串）四捨五入到分，回傳整數分；無法轉換時拋出 ValueError"""
+    if isinstance(value, float):
+        value = str(value)  # 以十進位表示取整，避免 2.675 變成 2.67
+    try:
+        return int((Decimal(value) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"金額格式錯誤：{value!r}") from None
+
+def from_cents(cents: int) -> Decimal:
+    """整數分轉為兩位小數的 Decimal"""
+    return Decimal(int(cents)).scaleb(-2)
+
+class Money(TypeDecorator):
+    """金額欄位：資料庫存整數分（SUM 為精確整數運算），Python 端為兩位小數 Decimal"""
+    # SQLite 的 INTEGER 本來就是 64 位元；PostgreSQL 的 INTEGER 只有 32 位元（約 2147 萬元）
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_literal_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_cents(value)
+
+# 期間：(SQLite strftime 格式, PostgreSQL to_char 格式)，鍵文字與 daily_rollup.day 的前綴相同
+PERIOD_FORMATS = {"day": ("%Y-%m-%d", "YYYY-MM-DD"), "month": ("%Y-%m", "YYYY-MM"), "year": ("%Y", "YYYY")}
+
+class period_key(FunctionElement):
+    """時間欄位的期間鍵文字（'YYYY-MM-DD'、'YYYY-MM'、'YYYY'），依方言編譯"""
+    type = String()
+    inherit_cache = True
+    # 期間不是 SQL 參數，需列入快取鍵，否則不同期間會共用同一份編譯結果
+    _traverse_internals = FunctionElement._traverse_internals + [("unit", InternalTraversal.dp_string)]
+
+    def __init__(self, unit: str, ts):
+        if unit not in PERIOD_FORMATS:
+            raise ValueError("期間必須為 day、month 或 year")
+        self.unit = unit
+        super().__init__(ts)
+
+class period_group(period_key):
+    """期間分組運算式：SQLite 與期間鍵相同；PostgreSQL 以 date_trunc 截斷時間，
+    GROUP BY 截斷後的時間比逐列 to_char 快，SELECT 的 period_key 只對分組結果格式化"""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(period_key)
+def _period_key_default(element, compiler, **kw):
+    return compiler.process(func.strftime(PERIOD_FORMATS[element.unit][0], *element.clauses), **kw)
+
+@compiles(period_key, "postgresql")
+def _period_key_postgresql(element, compiler, **kw):
+    # 期間與格式直接寫入 SQL：與 GROUP BY 的 date_trunc 必須是相同的運算式（參數會被視為不同）
+    return f"to_char(date_trunc('{element.unit}', {compiler.process(element.clauses, **kw)}), '{PERIOD_FORMATS[element.unit][1]}')"
+
+@compiles(period_group, "postgresql")
+def _period_group_postgresql(element, compiler, **kw):
+    return f"date_trunc('{element.unit}', {compiler.process(element.clauses, **kw)})"
+
+class Direction(enum.Enum):
+    Income = "Income"
+    Expenditure = "Expenditure"
+    Receivable = "Receivable"  # 應收
+    Payable = "Payable"        # 應付
+class SortField(enum.Enum):
+    """財務日誌排序欄位"""
+    TIMESTAMP = "timestamp"
+    AMOUNT = "amount"
+    ID = "id"
+    CATEGORY = "category_id"
+    DIRECTION = "actual_type"  # 新增依交易方向排序
+class Category(Base):
+    __tablename__ = "category"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    default_type = Column("default_type", Enum(Direction), nullable=False)
+    # 刪除類別時由資料庫 ON DELETE CASCADE 刪除日誌，不先把整個集合載入 session
+    logs = relationship("FinanceLog", back_populates="category", cascade="all, delete-orphan", passive_deletes=True)
+
+class FinanceLog(Base):
+    __tablename__ = "finance_log"
+    id = Column(Integer, primary_key=True)
+    category_id = Column(Integer, ForeignKey("category.id", ondelete="CASCADE"))
+    actual_type = Column("actual_type", Enum(Direction))
+    amount = Column(Money)  # 整數分
+    note = Column(String, nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    import_hash = Column(String(40), nullable=True)  # 匯入去重用：(時間, 金額, 備註) 的 SHA-1
+    category = relationship("Category", back_populates="logs")
+
+    # 對應 get_logs_with_sorting 的過濾與排序路徑
+    __table_args__ = (
+        Index("ix_finance_log_timestamp", "timestamp"),
+        Index("ix_finance_log_category_timestamp", "category_id", "timestamp"),
+        Index("ix_finance_log_actual_type_timestamp", "actual_type", "timestamp"),
+        Index("ix_finance_log_amount", "amount"),
+        Index("ux_finance_log_import_hash", "import_hash", unique=True),
+    )
+
+class CategoryVersion(Base):
+    """類別資料版本（由觸發器在 category 異動時遞增，供跨程序快取判斷是否過期）"""
+    __tablename__ = "category_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class DailyRollup(Base):
+    """每日彙總（日, 類別, 方向）→ 總金額與筆數，由 finance_log 觸發器以差額即時維護"""
+    __tablename__ = "daily_rollup"
+    id = Column(Integer, primary_key=True)
+    day = Column(String(10))
+    category_id = Column(Integer)
+    actual_type = Column(Enum(Direction))
+    total = Column(Money, nullable=False, default=0)  # 整數分
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_rollup_key", "day", "category_id", "actual_type"),
+    )
+
+class BalanceCheckpoint(Base):
+    """月底淨餘額檢查點（含該月以前所有日誌），查詢時依需要補建，日誌異動時由觸發器刪除受影響的月份"""
+    __tablename__ = "balance_checkpoint"
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    balance = Column(Money, nullable=False)      # 整數分
+
+OPEN_ITEM_TYPES = (Direction.Receivable, Direction.Payable)
+# 沖銷應收的是收入、沖銷應付的是支出
+SETTLEMENT_TYPES = {Direction.Receivable: Direction.Income, Direction.Payable: Direction.Expenditure}
+
+class OpenItem(Base):
+    """應收應付項目：每筆 Receivable / Payable 日誌一列，金額、沖銷與未結餘額由觸發器維護"""
+    __tablename__ = "open_item"
+    log_id = Column(Integer, ForeignKey("finance_log.id", ondelete="CASCADE"), primary_key=True)
+    direction = Column(Enum(Direction), nullable=False)
+    category_id = Column(Integer)
+    counterparty = Column(String, nullable=True)        # 交易對象
+    opened_at = Column(DateTime)                        # 日誌時間
+    amount = Column(Money, nullable=False)              # 整數分
+    settled = Column(Money, nullable=False, default=0)  # 已沖銷金額
+    outstanding = Column(Money, nullable=False)         # 未結金額 = amount - settled
+    closed_at = Column(DateTime, nullable=True)         # 全數沖銷的時間（最後一筆沖銷的時間），未結清為 NULL
+
+    __table_args__ = (
+        # 部分索引只含未結項目：目前未結清單與先進先出沖銷不必掃描已結清的歷史
+        Index("ix_open_item_open", "direction", "opened_at",
+              sqlite_where=text("outstanding > 0"), postgresql_where=text("outstanding > 0")),
+        # 歷史時點的未結清單：該時點之後才結清（或尚未結清）的項目
+        Index("ix_open_item_closed", "closed_at", "opened_at"),
+        Index("ix_open_item_counterparty", "counterparty", "direction"),
+    )
+
+class Settlement(Base):
+    """沖銷紀錄：一筆收入／支出日誌沖銷應收應付項目的金額（可部分沖銷、一筆沖多項）"""
+    __tablename__ = "settlement"
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("open_item.log_id", ondelete="CASCADE"), nullable=False)
+    settlement_log_id = Column(Integer, ForeignKey("finance_log.id", ondelete="CASCADE"), nullable=False)
+    amount = Column(Money, nullable=False)  # 整數分
+    settled_at = Column(DateTime)           # 沖銷日誌的時間（觸發器同步）
+
+    __table_args__ = (
+        Index("ix_settlement_item", "item_id", "settled_at"),
+        Index("ix_settlement_log", "settlement_log_id"),
+    )
+
+class OutstandingBalance(Base):
+    """未結餘額彙總（方向, 類別, 交易對象）→ 未結金額與未結項目數，由 open_item 觸發器以差額維護"""
+    __tablename__ = "outstanding_balance"
+    id = Column(Integer, primary_key=True)
+    direction = Column(Enum(Direction), nullable=False)
+    category_id = Column(Integer)
+    counterparty = Column(String, nullable=True)
+    outstanding = Column(Money, nullable=False, default=0)  # 整數分
+    open_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_outstanding_balance_key", "direction", "category_id", "counterparty"),
+    )
+
+# 唯讀清單查詢的欄位投影（日誌欄位 + 類別名稱）
+LOG_ROW_COLUMNS = (
+    FinanceLog.id,
+    FinanceLog.category_id,
+    Category.name.label("category"),
+    FinanceLog.actual_type,
+    FinanceLog.amount,
+    FinanceLog.note,
+    FinanceLog.timestamp,
+)
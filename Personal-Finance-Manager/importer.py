@@ -0,0 +1,52 @@
+"""匯入 CSV / OFX 交易紀錄
+
+用法：
+    python importer.py statement.csv --db-url sqlite:///dataBase/DB/finance.db
+    python importer.py bank.ofx --default-category Food --workers 4
+    python importer.py statement.csv --no-resume   （忽略檢查點，從頭匯入；已匯入的紀錄仍會被去重）
+
+CSV 第一列為表頭，必要欄位 timestamp（ISO 格式）、amount、category，選用欄位 actual_type、note。
+未指定 actual_type 的負數金額視為支出並取絕對值。
+"""
+from dataBase.FinanceDB import FinanceDB, FinanceService
+from dataBase.FinanceImporter import import_file
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FinanceDB 匯入指令")
+    parser.add_argument("path", help="CSV 或 OFX/QFX 檔案")
+    parser.add_argument("--db-url", default="sqlite:///dataBase/DB/finance.db")
+    parser.add_argument("--format", choices=["csv", "ofx"], help="預設依副檔名判斷")
+    parser.add_argument("--default-category", help="CSV 類別欄空白時與 OFX 交易使用的類別")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, help="解析用的程序數（預設為 CPU 數，0 表示不使用程序池）")
+    parser.add_argument("--no-resume", action="store_true", help="忽略檢查點")
+    args = parser.parse_args()
+
+    def progress(stats: dict):
+        print(f"  已處理 {stats['records']:>10} 筆  新增 {stats['inserted']:>10}  重複 {stats['duplicates']:>8}"
+              f"  錯誤 {stats['errors']:>6}  {stats['rows_per_sec']:10.0f} rows/s")
+
+    service = FinanceService(FinanceDB(db_url=args.db_url, journal_mode="WAL"))
+    try:
+        stats = import_file(
+            service,
+            args.path,
+            fmt=args.format,
+            default_category=args.default_category,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            resume=not args.no_resume,
+            progress=progress,
+        )
+    finally:
+        service.close()
+    print(f"完成：{stats['records']} 筆，新增 {stats['inserted']}，重複 {stats['duplicates']}，錯誤 {stats['errors']}，"
+          f"{stats['seconds']:.2f} s（{stats['rows_per_sec']:.0f} rows/s）")
+    for record, message in stats["error_samples"]:
+        print(f"  第 {record} 筆：{message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""資料庫維護指令
+
+用法：
+    python maintenance.py rebuild-rollups --db-url sqlite:///DB/test.db
+    python maintenance.py rebuild-fts --db-url sqlite:///DB/test.db
+"""
+from dataBase.FinanceDB import FinanceDB
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FinanceDB 維護指令")
+    parser.add_argument("--db-url", default="sqlite:///dataBase/DB/finance.db")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild-rollups", help="由 finance_log 重建 daily_rollup")
+    sub.add_parser("rebuild-fts", help="由 finance_log 重建備註全文索引")
+
+    args = parser.parse_args()
+    db = FinanceDB(db_url=args.db_url)
+    try:
+        if args.cmd == "rebuild-rollups":
+            print(f"daily_rollup 已重建：{db.rebuild_rollups()} 列")
+        elif args.cmd == "rebuild-fts":
+            db.rebuild_note_index()
+            print("備註全文索引已重建")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
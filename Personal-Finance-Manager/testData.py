@@ -143,11 +143,8 @@ print_table("金額 >= 1000 的交易（依金額降序）", big_trades)
 asc_by_amount = service.get_filtered_and_sorted_logs(sort_by=SortField.AMOUNT, reverse=False)
 print_table("依金額升序（前5筆）", asc_by_amount, limit=5)
 
-# 計算各方向總額（由 service 回傳的日誌計算）
-totals = {}
-for l in all_logs:
-    key = l["actual_type"] or "Unknown"
-    totals[key] = totals.get(key, 0) + (l["amount"] or 0)
+# 計算各方向總額（由資料庫 GROUP BY 彙總）
+totals = service.get_total_by_type()
 
 # 將 totals 轉為表格顯示
 totals_rows = [{"direction": k, "total": f"{v:.2f}"} for k, v in totals.items()]
@@ -0,0 +1,16 @@
+"""pytest 共用設定與 fixture（於專案根目錄執行 python -m pytest）"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataBase.FinanceDB import FinanceDB, FinanceService
+import pytest
+
+
+@pytest.fixture
+def service(tmp_path):
+    """暫存資料夾中的空 SQLite 檔（停用查詢結果快取）"""
+    service = FinanceService(FinanceDB(db_url=f"sqlite:///{tmp_path / 'test.db'}"), result_cache_size=0)
+    yield service
+    service.close()
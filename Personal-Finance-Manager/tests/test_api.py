@@ -0,0 +1,29 @@
+"""REST API：資料庫只在應用啟動時開啟"""
+from fastapi.testclient import TestClient
+import importlib
+import os
+import sys
+
+
+def test_import_does_not_open_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FINANCE_DB_URL", f"sqlite:///{tmp_path / 'api.db'}")
+    for name in ("app", "api.DataBaseAPI"):
+        sys.modules.pop(name, None)
+    importlib.import_module("app")
+    assert os.listdir(tmp_path) == []
+
+
+def test_lifespan_opens_configured_database(tmp_path, monkeypatch):
+    path = tmp_path / "api.db"
+    monkeypatch.setenv("FINANCE_DB_URL", f"sqlite:///{path}")
+    from app import app
+    with TestClient(app) as client:
+        assert path.exists()
+        assert client.post("/db/categories", json={"name": "Food", "default_type": "Expenditure"}).status_code == 201
+        assert client.post("/db/logs", json={"category_name": "Food", "amount": "12.50"}).status_code == 201
+        page = client.get("/db/logs").json()
+        assert [log["amount"] for log in page["items"]] == [12.5]
+        assert client.get("/db/totals").json() == {"Expenditure": 12.5}
+        assert len(client.get("/db/logs/stream").text.splitlines()) == 1
+        assert "results" in client.get("/db/cache").json()
@@ -0,0 +1,35 @@
+"""AsyncFinanceService.add_logs_bulk：經由後端的 insert_logs 寫入，保留輸入順序與匯入雜湊"""
+from dataBase.AsyncFinanceDB import AsyncFinanceDB, AsyncFinanceService
+from dataBase.FinanceDB import Direction, FinanceDB
+from datetime import datetime, timedelta
+import asyncio
+
+
+def test_async_bulk_insert(tmp_path):
+    path = tmp_path / "async.db"
+    logs = [
+        {"category_name": "Food", "amount": i + 1, "note": f"n{i}",
+         "actuall_time": datetime(2025, 1, 1) + timedelta(hours=i), "import_hash": f"{i:040x}"}
+        for i in range(25)
+    ]
+
+    async def run():
+        db = AsyncFinanceDB(db_url=f"sqlite+aiosqlite:///{path}")
+        await db.init_schema()
+        service = AsyncFinanceService(db)
+        try:
+            await service.add_category("Food", Direction.Expenditure)
+            result = await service.add_logs_bulk(logs, chunk_size=10)
+            return result, [await service.get_log_by_id(log_id) for log_id in result["ids"]]
+        finally:
+            await service.close()
+
+    result, stored = asyncio.run(run())
+    assert result["count"] == 25
+    assert [log["note"] for log in stored] == [f"n{i}" for i in range(25)]
+
+    sync_db = FinanceDB(db_url=f"sqlite:///{path}")
+    try:
+        assert sync_db.existing_import_hashes(log["import_hash"] for log in logs) == {log["import_hash"] for log in logs}
+    finally:
+        sync_db.close()
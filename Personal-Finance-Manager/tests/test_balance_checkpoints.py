@@ -0,0 +1,55 @@
+"""餘額檢查點：補建不會提交或回滾呼叫端的交易；唯讀副本上也會儲存"""
+from dataBase.FinanceDB import Direction, FinanceDB, FinanceService
+from datetime import datetime
+from sqlalchemy import text
+import pytest
+
+
+def seed(service):
+    service.add_category("Food", Direction.Expenditure)
+    service.add_category("Salary", Direction.Income)
+    for month in (1, 2, 3):
+        service.add_log("Salary", 100, actuall_time=datetime(2025, month, 1))
+        service.add_log("Food", 30, actuall_time=datetime(2025, month, 15))
+
+
+def checkpoints(db) -> list:
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT month, balance FROM balance_checkpoint ORDER BY month")).all()
+
+
+def test_pending_writes_are_not_committed(service):
+    seed(service)
+    with service.db.unit_of_work() as uow:
+        uow.session.execute(text("UPDATE category SET name = 'Groceries' WHERE name = 'Food'"))
+        assert uow.balance_at(datetime(2025, 4, 1)) == 210
+        # 同一交易內看得到檢查點，但呼叫端尚未提交的更新仍可回滾
+        assert uow.session.execute(text("SELECT COUNT(*) FROM balance_checkpoint")).scalar() == 3
+        uow.session.rollback()
+    assert service.db.session.execute(text("SELECT name FROM category ORDER BY id")).scalars().all() == ["Food", "Salary"]
+    assert checkpoints(service.db) == []
+
+
+def test_checkpoints_are_stored_without_caller_transaction(service):
+    seed(service)
+    service.db.session.commit()
+    assert service.db.balance_at(datetime(2025, 3, 20)) == 210
+    # 其他連線看得到：呼叫前沒有交易時，補建的檢查點已提交
+    assert [m for m, _b in checkpoints(service.db)] == ["2025-01", "2025-02"]
+
+
+@pytest.mark.parametrize("replica", ["wal", "backup"])
+def test_replica_reports_store_checkpoints_on_primary(tmp_path, replica):
+    service = FinanceService(FinanceDB(db_url=f"sqlite:///{tmp_path / 'ledger.db'}", read_replica=replica), result_cache_size=0)
+    try:
+        seed(service)
+        service.db.refresh_replica()
+        with service.db.reader() as ro:
+            ro.session.execute(text("SELECT COUNT(*) FROM finance_log")).scalar()
+            assert ro.balance_at(datetime(2025, 4, 1)) == 210
+            # 副本的讀取交易與快照保留到 reader() 結束
+            assert ro.session.in_transaction()
+        assert [m for m, _b in checkpoints(service.db)] == ["2025-01", "2025-02", "2025-03"]
+        assert service.balance_at(datetime(2025, 4, 1)) == 210
+    finally:
+        service.close()
@@ -0,0 +1,21 @@
+"""update_logs_bulk：同一筆日誌的多次修改依輸入順序套用"""
+from dataBase.FinanceDB import Direction
+from decimal import Decimal
+
+
+def test_repeated_id_keeps_input_order(service):
+    service.add_category("Food", Direction.Expenditure)
+    first = service.add_log("Food", 1, note="a")
+    other = service.add_log("Food", 2, note="b")
+    result = service.update_logs_bulk([
+        {"id": first["id"], "amount": 5},
+        {"id": first["id"], "amount": 7, "note": "x"},
+        {"id": other["id"], "note": "y"},
+        {"id": first["id"], "amount": 9},
+    ])
+    assert result == {"count": 4}
+    assert service.get_log_by_id(first["id"])["amount"] == 9
+    assert service.get_log_by_id(first["id"])["note"] == "x"
+    assert service.get_log_by_id(other["id"])["note"] == "y"
+    assert service.get_totals("direction") == {"Expenditure": 11.0}
+    assert service.db.sum_by("direction") == [(Direction.Expenditure, Decimal("11.00"), 2)]
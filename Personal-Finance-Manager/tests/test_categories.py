@@ -0,0 +1,88 @@
+"""merge_categories 與 delete_category：日誌搬移、錯誤處理，以及刪除類別時的 ON DELETE CASCADE"""
+from dataBase.FinanceDB import Direction
+from datetime import datetime
+from sqlalchemy import text
+from test_logs_where import assert_checkpoints_valid
+from test_open_items import assert_outstanding_matches
+from test_rollup import assert_rollup_matches
+import pytest
+
+
+def count(db, sql, **params) -> int:
+    return db.session.execute(text(sql), params).scalar()
+
+
+@pytest.fixture
+def books(service):
+    service.add_category("Food", Direction.Expenditure)
+    service.add_category("Dining", Direction.Expenditure)
+    service.add_category("Sales", Direction.Income)
+    service.add_category("Misc", Direction.Income)
+    for day in (1, 2, 3):
+        service.add_log("Food", 10 * day, actuall_time=datetime(2025, 1, day))
+        service.add_log("Dining", 100, actuall_time=datetime(2025, 2, day))
+    # 類別預設方向之外的日誌：合併後保留原方向
+    service.add_log("Food", 7, actual_type=Direction.Income, actuall_time=datetime(2025, 1, 5))
+    service.balance_at(datetime(2025, 3, 1))
+    return service
+
+
+def test_merge_moves_logs_and_deletes_source(books):
+    db = books.db
+    food = books.get_category("Food").id
+    assert books.merge_categories("Food", "Dining") == {"count": 4}
+    assert books.get_category("Food") is None
+    assert count(db, "SELECT COUNT(*) FROM category WHERE id = :id", id=food) == 0
+    assert count(db, "SELECT COUNT(*) FROM finance_log WHERE category_id = :id", id=food) == 0
+    dining = books.get_filtered_and_sorted_logs(category_name="Dining")
+    assert len(dining) == 7
+    assert [log["actual_type"] for log in dining].count("Income") == 1
+    assert books.get_totals("category") == {"Dining": -(60 + 300 - 7)}
+    assert_rollup_matches(db)
+    assert_checkpoints_valid(db)
+
+
+def test_merge_open_items_follow_category(books):
+    item = books.add_open_item("Misc", Direction.Receivable, 50, counterparty="ACME", actuall_time=datetime(2025, 1, 1))["id"]
+    books.settle(item, books.add_log("Misc", 20, actuall_time=datetime(2025, 1, 9))["id"])
+    assert books.merge_categories("Misc", "Sales") == {"count": 2}
+    assert [i["category"] for i in books.open_items() if i["id"] == item] == ["Sales"]
+    assert_outstanding_matches(books.db)
+
+
+def test_merge_rejects_missing_and_same_category(books):
+    db = books.db
+    food = books.get_category("Food").id
+    assert books.merge_categories("Food", "Rent") is None
+    assert books.merge_categories("Rent", "Food") is None
+    with pytest.raises(ValueError):
+        books.merge_categories("Food", "Food")
+    assert db.merge_categories(food, 999) is None
+    assert db.merge_categories(999, food) is None
+    with pytest.raises(ValueError):
+        db.merge_categories(food, food)
+    # 都沒有改變任何資料
+    assert count(db, "SELECT COUNT(*) FROM finance_log WHERE category_id = :id", id=food) == 4
+    assert len(books.get_all_categories()) == 4
+
+
+def test_delete_category_cascades(books):
+    db = books.db
+    item = books.add_open_item("Sales", Direction.Receivable, 90, counterparty="ACME", actuall_time=datetime(2025, 1, 1))["id"]
+    books.add_open_item("Misc", Direction.Receivable, 30, counterparty="ACME", actuall_time=datetime(2025, 1, 2))
+    payment = books.add_log("Misc", 40, actuall_time=datetime(2025, 1, 10))["id"]
+    books.settle(item, payment, 40)
+    misc = books.get_category("Misc").id
+    assert count(db, "SELECT COUNT(*) FROM daily_rollup WHERE category_id = :id", id=misc) == 2
+
+    assert books.delete_category("Misc") is True
+    assert count(db, "SELECT COUNT(*) FROM finance_log WHERE category_id = :id", id=misc) == 0
+    assert count(db, "SELECT COUNT(*) FROM daily_rollup WHERE category_id = :id", id=misc) == 0
+    assert count(db, "SELECT COUNT(*) FROM open_item WHERE category_id = :id", id=misc) == 0
+    # 沖銷日誌在被刪除的類別：沖銷一併刪除，Sales 的項目恢復未結
+    assert count(db, "SELECT COUNT(*) FROM settlement") == 0
+    assert [i["outstanding"] for i in books.open_items()] == [90.0]
+    assert_outstanding_matches(db)
+    assert_rollup_matches(db)
+    assert_checkpoints_valid(db)
+    assert books.delete_category("Misc") is False
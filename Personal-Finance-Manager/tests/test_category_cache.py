@@ -0,0 +1,102 @@
+"""類別快取：其他連線的類別異動經由 category_version 使快取失效；命中與未命中統計"""
+from dataBase.AsyncFinanceDB import AsyncFinanceDB, AsyncFinanceService
+from dataBase.FinanceDB import Direction, FinanceDB, FinanceService
+from sqlalchemy import text
+import asyncio
+import threading
+
+
+def other_connection(path, sql):
+    """以另一條連線（另一個 engine）直接修改資料庫"""
+    db = FinanceDB(db_url=f"sqlite:///{path}")
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text(sql))
+    finally:
+        db.close()
+
+
+def test_other_connection_invalidates_cache(tmp_path, service):
+    service.category_cache_ttl = 0
+    service.add_category("Food", Direction.Expenditure)
+    assert service.get_category("Food").default_type == Direction.Expenditure
+    version = service.category_cache_stats()["version"]
+
+    other = FinanceService(FinanceDB(db_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    try:
+        other.add_category("Rent", Direction.Expenditure)
+    finally:
+        other.close()
+    other_connection(tmp_path / "test.db", "UPDATE category SET name = 'Groceries' WHERE name = 'Food'")
+
+    before = service.category_cache_stats()
+    assert service.get_category("Food") is None
+    assert service.get_category("Groceries") is not None and service.get_category("Rent") is not None
+    after = service.category_cache_stats()
+    # 兩次異動各由觸發器遞增版本；只重新載入一次
+    assert after["version"] == version + 2
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 2
+    assert after["size"] == 2
+
+
+def test_ttl_skips_version_check(tmp_path, service):
+    service.category_cache_ttl = 60
+    service.add_category("Food", Direction.Expenditure)
+    service.get_category("Food")
+    other_connection(tmp_path / "test.db", "INSERT INTO category (name, default_type) VALUES ('Rent', 'Expenditure')")
+    # TTL 內不檢查版本：看不到其他連線的新類別
+    assert service.get_category("Rent") is None
+    service.category_cache_ttl = 0
+    assert service.get_category("Rent") is not None
+
+
+def test_hit_and_miss_counters(service):
+    service.category_cache_ttl = 60
+    service.add_category("Food", Direction.Expenditure)
+    service.get_category("Food")
+    base = service.category_cache_stats()
+    assert base["misses"] >= 1
+
+    def lookups():
+        for _ in range(2000):
+            service.get_category("Food")
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = service.category_cache_stats()
+    assert stats["hits"] == base["hits"] + 16_000
+    assert stats["misses"] == base["misses"]
+
+    # 本服務的類別異動直接清除快取：下一次查詢為未命中
+    service.add_category("Rent", Direction.Expenditure)
+    service.get_category("Rent")
+    assert service.category_cache_stats()["misses"] == base["misses"] + 1
+
+
+def test_async_service_sees_other_connection(tmp_path):
+    path = tmp_path / "async.db"
+
+    async def run():
+        db = AsyncFinanceDB(db_url=f"sqlite+aiosqlite:///{path}")
+        await db.init_schema()
+        service = AsyncFinanceService(db, category_cache_ttl=0)
+        try:
+            await service.add_category("Food", Direction.Expenditure)
+            assert await service._get_category("Food") is not None
+            before = service.category_cache_stats()
+            await service._get_category("Food")
+            other_connection(path, "UPDATE category SET name = 'Groceries' WHERE name = 'Food'")
+            assert await service._get_category("Food") is None
+            assert await service._get_category("Groceries") is not None
+            return before, service.category_cache_stats()
+        finally:
+            await service.close()
+
+    before, after = asyncio.run(run())
+    assert after["hits"] == before["hits"] + 2
+    assert after["misses"] == before["misses"] + 1
+    assert after["version"] == before["version"] + 1
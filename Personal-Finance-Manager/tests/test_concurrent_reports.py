@@ -0,0 +1,63 @@
+"""寫入與報表同時執行
+
+- 另一個程序不斷跑報表時，兩端都沒有錯誤、都有進度，且寫入不會卡在對方的鎖上
+- 只有 WAL 與唯讀副本保證：讀到一半的報表不會擋住寫入，並且維持讀取開始時的快照
+- 報表端會在主資料庫補建餘額檢查點（唯讀副本模式也一樣），這些寫入同樣不會擋住寫入端
+"""
+from benchmarks.scenarios import REPORT_MODES, open_temp_service, run_report_mode
+from dataBase.FinanceDB import FinanceDB
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+import pytest
+
+ROWS, SECONDS = 5_000, 1.5
+# 單筆寫入的上限；等待對方的鎖直到 busy_timeout（5 秒）或逾時錯誤都會失敗
+MAX_WRITE_MS = 500
+# 報表讀到一半時只有這些模式的寫入能提交；"delete"（rollback journal）的讀者持有 SHARED 鎖
+SNAPSHOT_MODES = {"wal", "replica-wal", "replica-backup"}
+
+
+@pytest.mark.parametrize("mode", list(REPORT_MODES))
+def test_writer_not_blocked_by_reports(tmp_path, mode):
+    write_ms, report_ms, errors = run_report_mode(str(tmp_path), mode, ROWS, SECONDS)
+    assert errors == []
+    assert len(write_ms) > 10 and len(report_ms) > 0
+    assert max(write_ms) < MAX_WRITE_MS, max(write_ms)
+    # 寫入端只寫 12 月；1 月的檢查點只可能是報表端（年底餘額）寫入主資料庫的
+    db = FinanceDB(db_url=f"sqlite:///{tmp_path / f'{mode}.db'}")
+    try:
+        months = db.session.execute(text("SELECT month FROM balance_checkpoint")).scalars().all()
+        assert "2025-01" in months
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("mode", list(REPORT_MODES))
+def test_open_report_blocks_writer_only_without_snapshot(tmp_path, mode):
+    writer_config, report_config = REPORT_MODES[mode]
+    writer = open_temp_service(str(tmp_path), "ledger.db", busy_timeout=100, **writer_config)
+    report = FinanceDB(db_url=f"sqlite:///{tmp_path / 'ledger.db'}", busy_timeout=100, **report_config)
+    try:
+        writer.add_logs_bulk([{"category_name": "Food", "amount": 1, "actuall_time": datetime(2025, 1, 1) + timedelta(minutes=i)}
+                              for i in range(500)])
+        report.refresh_replica()
+        with report.reader() as ro:
+            rows = ro.iter_log_rows(batch_size=50)
+            seen = sum(1 for _ in zip(range(100), rows))
+            # 報表的查詢仍在進行中
+            if mode in SNAPSHOT_MODES:
+                writer.add_log("Food", 2, actuall_time=datetime(2025, 2, 1))
+            else:
+                with pytest.raises(OperationalError, match="locked"):
+                    writer.add_log("Food", 2, actuall_time=datetime(2025, 2, 1))
+            seen += sum(1 for _ in rows)
+        # 讀到一半的報表看到的是寫入之前的一致快照
+        assert seen == 500
+        report.refresh_replica()
+        with report.reader() as ro:
+            expected = 501 if mode in SNAPSHOT_MODES else 500
+            assert ro.session.execute(text("SELECT COUNT(*) FROM finance_log")).scalar() == expected
+    finally:
+        report.close()
+        writer.close()
@@ -0,0 +1,37 @@
+"""CSV 匯入：空檔、格式錯誤的金額與重複匯入"""
+from dataBase.FinanceDB import Direction
+from dataBase.FinanceImporter import checkpoint_path, import_file
+import os
+
+
+def write_csv(path, lines):
+    path.write_text("\n".join(["timestamp,amount,category,note", *lines]) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_header_only_file(service, tmp_path):
+    path = write_csv(tmp_path / "empty.csv", [])
+    stats = import_file(service, path, workers=0)
+    assert (stats["records"], stats["inserted"], stats["errors"]) == (0, 0, 0)
+    assert not os.path.exists(checkpoint_path(path))
+
+
+def test_bad_amount_names_row_and_value(service, tmp_path):
+    service.add_category("Food", Direction.Expenditure)
+    path = write_csv(tmp_path / "bad.csv", [
+        "2025-01-01T10:00:00,12.50,Food,ok",
+        "2025-01-01T12:00:00,abc,Food,bad",
+    ])
+    stats = import_file(service, path, workers=0)
+    assert (stats["records"], stats["inserted"], stats["errors"]) == (2, 1, 1)
+    assert stats["error_samples"] == [(1, "金額格式錯誤：'abc'")]
+    assert not os.path.exists(checkpoint_path(path))
+
+
+def test_reimport_skips_duplicates(service, tmp_path):
+    service.add_category("Food", Direction.Expenditure)
+    path = write_csv(tmp_path / "logs.csv", [f"2025-01-0{d}T10:00:00,-{d}.25,Food,n{d}" for d in range(1, 6)])
+    assert import_file(service, path, workers=0, chunk_size=2)["inserted"] == 5
+    stats = import_file(service, path, workers=0, chunk_size=2)
+    assert (stats["inserted"], stats["duplicates"]) == (0, 5)
+    assert service.get_totals("direction") == {"Expenditure": 16.25}
@@ -0,0 +1,115 @@
+"""update_logs_where／delete_logs_where（資料層與邏輯層）：過濾條件、回傳筆數、錯誤，以及之後的彙總與餘額檢查點"""
+from dataBase.FinanceDB import Direction, FinanceLog
+from datetime import datetime
+from sqlalchemy import func, select, text
+from test_rollup import assert_rollup_matches
+import pytest
+
+
+def assert_checkpoints_valid(db):
+    """儲存的月底檢查點與 balance_at 都等於直接掃描 finance_log 的淨額"""
+    def scanned(before: datetime):
+        return db.session.execute(text(
+            "SELECT COALESCE(SUM(CASE actual_type WHEN 'Income' THEN amount WHEN 'Expenditure' THEN -amount ELSE 0 END), 0) "
+            "FROM finance_log WHERE timestamp < :ts"
+        ), {"ts": before}).scalar()
+
+    for month, balance in db.session.execute(text("SELECT month, balance FROM balance_checkpoint")).all():
+        year, mon = int(month[:4]), int(month[5:7])
+        assert balance == scanned(datetime(year + mon // 12, mon % 12 + 1, 1)), month
+    for ts in (datetime(2025, 2, 1), datetime(2025, 3, 15), datetime(2025, 5, 1)):
+        assert db.balance_at(ts, inclusive=False) * 100 == scanned(ts)
+
+
+@pytest.fixture
+def ledger(service):
+    service.add_category("Food", Direction.Expenditure)
+    service.add_category("Transport", Direction.Expenditure)
+    service.add_category("Salary", Direction.Income)
+    for month in (1, 2, 3, 4):
+        service.add_log("Salary", 1000, note="salary", actuall_time=datetime(2025, month, 1))
+        service.add_log("Food", 80, note="Uber Eats dinner", actuall_time=datetime(2025, month, 10))
+        service.add_log("Food", 40, note="午餐 便當", actuall_time=datetime(2025, month, 12))
+        service.add_log("Transport", 15, note="Uber ride", actuall_time=datetime(2025, month, 20))
+    # 先建立檢查點，批次修改之後必須由觸發器使其失效
+    service.balance_at(datetime(2025, 5, 1))
+    assert service.db.session.execute(text("SELECT COUNT(*) FROM balance_checkpoint")).scalar() == 4
+    return service
+
+
+def notes(service, **filters):
+    return sorted((log["note"], log["amount"]) for log in service.get_filtered_and_sorted_logs(**filters))
+
+
+def test_service_update_filters_and_counts(ledger):
+    # 類別 + 關鍵字：只改 Food 中的 Uber Eats，不動 Transport 的 Uber ride
+    assert ledger.update_logs_where({"category_name": "Food", "note_keyword": "uber"}, category_name="Transport") == {"count": 4}
+    assert len(ledger.get_filtered_and_sorted_logs(category_name="Transport")) == 8
+    assert notes(ledger, category_name="Food") == [("午餐 便當", 40.0)] * 4
+    # 日期區間（兩端都包含）
+    result = ledger.update_logs_where({"start_date": datetime(2025, 2, 1), "end_date": datetime(2025, 3, 1)}, amount=1200)
+    assert result == {"count": 5}  # 2 月的四筆與 3/1 的薪水
+    assert [log["amount"] for log in ledger.get_filtered_and_sorted_logs(category_name="Salary")] == [1000.0, 1200.0, 1200.0, 1000.0]
+    # 中文關鍵字與方向改變
+    assert ledger.update_logs_where({"note_keyword": "便當"}, actual_type=Direction.Income)["count"] == 4
+    # 收入：薪水 4400 + 便當（40 + 1200 + 40 + 40）；支出：各月其餘兩筆（2 月為 1200 × 2）
+    assert ledger.get_totals("direction") == {"Income": 5720.0, "Expenditure": 2685.0}
+    assert_rollup_matches(ledger.db)
+    assert_checkpoints_valid(ledger.db)
+
+
+def test_service_delete_filters_and_counts(ledger):
+    assert ledger.delete_logs_where({"category_name": "Food", "start_date": datetime(2025, 3, 1)}) == {"count": 4}
+    assert ledger.delete_logs_where({"note_keyword": "Uber", "end_date": datetime(2025, 1, 31)}) == {"count": 2}
+    assert len(ledger.get_filtered_and_sorted_logs()) == 10
+    # 不存在的類別：沒有符合的日誌
+    assert ledger.delete_logs_where({"category_name": "Rent"}) == {"count": 0}
+    assert_rollup_matches(ledger.db)
+    assert_checkpoints_valid(ledger.db)
+
+
+def test_service_rejects_bad_requests(ledger):
+    generation = ledger.result_cache_stats()["generation"]
+    with pytest.raises(ValueError):
+        ledger.update_logs_where({"category_name": "Food"}, category="Transport")
+    with pytest.raises(ValueError):
+        ledger.update_logs_where({"category_name": "Food"}, category_name="Rent")
+    with pytest.raises(ValueError):
+        ledger.update_logs_where({"category_name": "Food"}, amount="12")
+    with pytest.raises(ValueError):
+        ledger.update_logs_where({}, amount=1)
+    with pytest.raises(ValueError):
+        ledger.delete_logs_where({})
+    # 沒有要修改的欄位：不執行
+    assert ledger.update_logs_where({"category_name": "Food"}) == {"count": 0}
+    assert ledger.update_logs_where({"category_name": "Rent"}, amount=1) == {"count": 0}
+    assert ledger.result_cache_stats()["generation"] == generation
+    assert len(ledger.get_filtered_and_sorted_logs()) == 16
+    assert_checkpoints_valid(ledger.db)
+
+
+def test_db_update_and_delete_where(ledger):
+    db = ledger.db
+    food = ledger.get_category("Food").id
+    transport = ledger.get_category("Transport").id
+    assert db.update_logs_where({"category_id": food, "note_keyword": "eats"}, category_id=transport,
+                                timestamp=datetime(2025, 4, 30)) == 4
+    assert db.session.scalar(select(func.count()).where(FinanceLog.category_id == transport)) == 8
+    assert db.update_logs_where({"min_amount": 1000}, note="pay") == 4
+    assert db.update_logs_where(None, note="all") == 16
+    assert db.update_logs_where({"category_id": food}) == 0
+    with pytest.raises(ValueError):
+        db.update_logs_where({"category_id": food}, category="x")
+    with pytest.raises(ValueError):
+        db.update_logs_where({"category_id": food}, category_id=999)
+    assert_rollup_matches(db)
+    assert_checkpoints_valid(db)
+
+    assert db.delete_logs_where({"start_date": datetime(2025, 4, 1), "end_date": datetime(2025, 4, 30)}) == 7
+    assert db.delete_logs_where({"actual_type": Direction.Income}) == 3
+    assert db.delete_logs_where({"category_id": food, "max_amount": 10}) == 0
+    assert_rollup_matches(db)
+    assert_checkpoints_valid(db)
+    assert db.delete_logs_where(None) == 6
+    assert db.session.execute(text("SELECT COUNT(*) FROM daily_rollup")).scalar() == 0
+    assert db.balance_at(datetime(2025, 5, 1)) == 0
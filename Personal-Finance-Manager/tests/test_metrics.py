@@ -0,0 +1,84 @@
+"""查詢量測：被包裝的方法與執行的語句出現在 Prometheus 文字輸出（FinanceMetrics 與 /metrics）"""
+from dataBase.FinanceDB import Direction, FinanceDB, FinanceService
+from dataBase.FinanceMetrics import BUCKETS_MS, FinanceMetrics
+from fastapi.testclient import TestClient
+import re
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def parse(exposition: str) -> tuple[dict, dict]:
+    """解析 Prometheus 文字格式：({(指標, 標籤字串): 值}, {指標: TYPE})"""
+    samples, types = {}, {}
+    for line in exposition.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, metric, kind = line.split()
+            types[metric] = kind
+        elif line and not line.startswith("#"):
+            name, labels, value = SAMPLE.match(line).groups()
+            samples[(name, labels or "")] = float(value)
+    return samples, types
+
+
+def buckets(samples: dict, metric: str, label: str) -> list[float]:
+    return [samples[(f"{metric}_bucket", f'{label},le="{le}"')] for le in (*(f"{b / 1000:g}" for b in BUCKETS_MS), "+Inf")]
+
+
+def test_instrumented_methods_in_prometheus_output(tmp_path):
+    metrics = FinanceMetrics(slow_query_ms=0)
+    service = FinanceService(FinanceDB(db_url=f"sqlite:///{tmp_path / 'metrics.db'}", metrics=metrics), result_cache_size=0)
+    try:
+        service.add_category("Food", Direction.Expenditure)
+        for amount in (1, 2, 3):
+            service.add_log("Food", amount)
+        service.get_totals("direction")
+    finally:
+        service.close()
+
+    samples, types = parse(metrics.to_prometheus())
+    assert types == {
+        "financedb_statement_duration_seconds": "histogram",
+        "financedb_method_duration_seconds": "histogram",
+        "financedb_method_statements_total": "counter",
+        "financedb_method_statements_max": "gauge",
+        "financedb_slow_queries_total": "counter",
+    }
+    method = "financedb_method_duration_seconds"
+    for name, calls in (("FinanceService.add_log", 3), ("FinanceDB.create_log", 3), ("FinanceService.get_totals", 1)):
+        label = f'method="{name}"'
+        counts = buckets(samples, method, label)
+        # 分格為累計值，+Inf 等於呼叫次數
+        assert counts == sorted(counts) and counts[-1] == calls
+        assert samples[(f"{method}_count", label)] == calls
+        assert samples[(f"{method}_sum", label)] > 0
+        assert samples[("financedb_method_statements_total", label)] >= calls
+    # 巢狀呼叫：外層服務方法也計入內層 FinanceDB 方法執行的語句
+    assert samples[("financedb_method_statements_total", 'method="FinanceService.add_log"')] >= \
+        samples[("financedb_method_statements_total", 'method="FinanceDB.create_log"')]
+    inserts = buckets(samples, "financedb_statement_duration_seconds", 'kind="INSERT"')
+    assert inserts[-1] == samples[("financedb_statement_duration_seconds_count", 'kind="INSERT"')] >= 4
+    # 門檻 0：每個語句都是慢查詢
+    statement_total = sum(v for (name, _labels), v in samples.items() if name == "financedb_statement_duration_seconds_count")
+    assert samples[("financedb_slow_queries_total", "")] == statement_total
+
+
+def test_metrics_route(tmp_path, monkeypatch):
+    monkeypatch.setenv("FINANCE_DB_URL", f"sqlite:///{tmp_path / 'api.db'}")
+    monkeypatch.setenv("FINANCE_METRICS", "1")
+    from app import app
+    with TestClient(app) as client:
+        assert client.post("/db/categories", json={"name": "Food", "default_type": "Expenditure"}).status_code == 201
+        assert client.post("/db/logs", json={"category_name": "Food", "amount": "12.50"}).status_code == 201
+        response = client.get("/db/metrics", params={"format": "prometheus"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        samples, types = parse(response.text)
+        assert types["financedb_method_duration_seconds"] == "histogram"
+        assert samples[("financedb_method_duration_seconds_count", 'method="FinanceService.add_log"')] == 1
+        assert samples[("financedb_method_statements_total", 'method="FinanceService.add_log"')] > 0
+        assert samples[("financedb_statement_duration_seconds_count", 'kind="INSERT"')] >= 1
+        assert client.get("/db/metrics").json()["methods"]["FinanceService.add_log"]["latency"]["count"] == 1
+
+        assert client.delete("/db/metrics").status_code == 204
+        samples, _types = parse(client.get("/db/metrics", params={"format": "prometheus"}).text)
+        assert not any(name == "financedb_method_duration_seconds_count" for name, _labels in samples)
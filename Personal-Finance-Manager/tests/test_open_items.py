@@ -0,0 +1,162 @@
+"""應收應付項目：沖銷、守衛觸發器、先進先出自動沖銷、歷史時點與未結餘額彙總"""
+from dataBase.FinanceDB import Direction
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+import pytest
+
+DAY = datetime(2025, 1, 1)
+
+
+def assert_outstanding_matches(db):
+    """outstanding_balance 等於 open_item 未結項目的 GROUP BY，且每個項目的 outstanding = amount − 沖銷合計"""
+    stored = db.session.execute(text(
+        "SELECT direction, category_id, counterparty, outstanding, open_count FROM outstanding_balance "
+        "WHERE open_count > 0 ORDER BY 1, 2, 3"
+    )).all()
+    scanned = db.session.execute(text(
+        "SELECT direction, category_id, counterparty, SUM(outstanding), COUNT(*) FROM open_item "
+        "WHERE outstanding > 0 GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+    )).all()
+    assert stored == scanned
+    assert db.session.execute(text(
+        "SELECT COUNT(*) FROM open_item i WHERE i.settled <> (SELECT COALESCE(SUM(amount), 0) FROM settlement WHERE item_id = i.log_id) "
+        "OR i.outstanding <> i.amount - i.settled OR (i.outstanding > 0) <> (i.closed_at IS NULL)"
+    )).scalar() == 0
+
+
+@pytest.fixture
+def books(service):
+    service.add_category("Sales", Direction.Income)
+    service.add_category("Supplies", Direction.Expenditure)
+    return service
+
+
+def receivable(service, amount, day, counterparty="ACME"):
+    return service.add_open_item("Sales", Direction.Receivable, amount, counterparty=counterparty,
+                                 actuall_time=datetime(2025, 1, day))["id"]
+
+
+def income(service, amount, day):
+    return service.add_log("Sales", amount, actual_type=Direction.Income, actuall_time=datetime(2025, 1, day))["id"]
+
+
+def outstanding(service, item_id, as_of=None):
+    return {i["id"]: i["outstanding"] for i in service.open_items(as_of=as_of)}.get(item_id, 0.0)
+
+
+def test_partial_then_full_settle(books):
+    item = receivable(books, 100, 1)
+    pay = income(books, 150, 10)
+    assert books.settle(item, pay, 40) == {"item_id": item, "settlement_log_id": pay, "amount": 40.0, "outstanding": 60.0}
+    assert outstanding(books, item) == 60
+    assert_outstanding_matches(books.db)
+    # amount=None：項目未結金額與日誌未分配金額的較小者
+    assert books.settle(item, pay)["amount"] == 60
+    assert outstanding(books, item) == 0
+    assert books.db.session.execute(text(f"SELECT closed_at FROM open_item WHERE log_id = {item}")).scalar() is not None
+    assert_outstanding_matches(books.db)
+    with pytest.raises(ValueError):
+        books.settle(item, pay)
+    assert books.settle(item, 9999) is None
+
+
+def test_settle_rejects_over_settlement_and_wrong_direction(books):
+    item = receivable(books, 100, 1)
+    pay = income(books, 30, 2)
+    spend = books.add_log("Supplies", 50, actual_type=Direction.Expenditure, actuall_time=datetime(2025, 1, 3))["id"]
+    with pytest.raises(ValueError):
+        books.settle(item, pay, 31)   # 超過日誌未分配的金額
+    with pytest.raises(ValueError):
+        books.settle(item, spend, 10)  # 應收只能以收入沖銷
+    second = income(books, 500, 4)
+    with pytest.raises(ValueError):
+        books.settle(item, second, 101)  # 超過項目未結金額
+    assert_outstanding_matches(books.db)
+
+
+def test_guard_triggers_reject_inconsistent_writes(books):
+    """繞過 Python 檢查直接寫入時，由觸發器拒絕"""
+    db = books.db
+    item = receivable(books, 100, 1)
+    pay = income(books, 80, 2)
+    books.settle(item, pay, 60)
+
+    def rejected(sql):
+        with pytest.raises(IntegrityError):
+            db.session.execute(text(sql))
+        db.session.rollback()
+
+    rejected(f"INSERT INTO settlement (item_id, settlement_log_id, amount, settled_at) VALUES ({item}, {pay}, 4100, NULL)")
+    rejected(f"INSERT INTO settlement (item_id, settlement_log_id, amount, settled_at) VALUES ({item}, {pay}, 2100, NULL)")
+    rejected(f"UPDATE finance_log SET amount = 5000 WHERE id = {item}")         # 低於已沖銷金額
+    rejected(f"UPDATE finance_log SET actual_type = 'Payable' WHERE id = {item}")  # 已有沖銷的項目改方向
+    rejected(f"UPDATE finance_log SET amount = 5000 WHERE id = {pay}")          # 沖銷日誌低於已分配金額
+    rejected(f"UPDATE finance_log SET actual_type = 'Expenditure' WHERE id = {pay}")
+    assert outstanding(books, item) == 40
+    assert_outstanding_matches(db)
+
+
+def test_auto_settle_is_fifo(books):
+    items = [receivable(books, amount, day) for amount, day in ((50, 3), (30, 1), (40, 2))]
+    other = receivable(books, 70, 1, counterparty="Globex")
+    pay = income(books, 100, 10)
+    result = books.auto_settle(pay, counterparty="ACME")
+    # opened_at 由舊到新：1/1 的 30、1/2 的 40，剩下 30 給 1/3 的項目
+    assert result["allocations"] == [
+        {"item_id": items[1], "amount": 30.0}, {"item_id": items[2], "amount": 40.0}, {"item_id": items[0], "amount": 30.0},
+    ]
+    assert result["amount"] == 100
+    assert [outstanding(books, i) for i in items] == [20, 0, 0]
+    assert outstanding(books, other) == 70
+    # 日誌已全數分配
+    assert books.auto_settle(pay)["count"] == 0
+    assert_outstanding_matches(books.db)
+
+
+def test_open_items_as_of(books):
+    item = receivable(books, 100, 1)
+    pay = income(books, 100, 15)
+    books.settle(item, pay, 30)
+    assert outstanding(books, item, as_of=datetime(2024, 12, 31)) == 0  # 尚未開立
+    assert outstanding(books, item, as_of=datetime(2025, 1, 10)) == 100
+    assert outstanding(books, item, as_of=datetime(2025, 1, 15)) == 70
+    books.settle(item, pay, 70)
+    assert outstanding(books, item, as_of=datetime(2025, 1, 10)) == 100
+    assert outstanding(books, item, as_of=datetime(2025, 1, 20)) == 0
+    assert outstanding(books, item) == 0
+    # 沖銷日誌改時間：settled_at 與結清時間跟著移動
+    books.update_log(pay, timestamp=datetime(2025, 2, 1))
+    assert outstanding(books, item, as_of=datetime(2025, 1, 20)) == 100
+    assert outstanding(books, item, as_of=datetime(2025, 2, 1)) == 0
+
+
+def test_outstanding_balance_after_updates_and_deletes(books):
+    db = books.db
+    a = receivable(books, 100, 1)
+    b = receivable(books, 60, 2, counterparty="Globex")
+    c = books.add_open_item("Supplies", Direction.Payable, 45, counterparty="ACME", actuall_time=DAY)["id"]
+    pay = income(books, 120, 5)
+    books.auto_settle(pay, category_name="Sales")
+    assert_outstanding_matches(db)
+
+    books.update_log(b, amount=80)                      # 項目金額
+    assert_outstanding_matches(db)
+    books.update_log(c, category_name="Sales")          # 項目類別
+    assert_outstanding_matches(db)
+    books.set_counterparty(b, "ACME")                   # 交易對象
+    assert_outstanding_matches(db)
+    books.update_log(c, actual_type=Direction.Expenditure)  # 未沖銷的項目改為一般支出：離開 open_item
+    assert outstanding(books, c) == 0
+    assert_outstanding_matches(db)
+    books.update_log(pay, amount=150)                   # 沖銷日誌增加金額
+    assert_outstanding_matches(db)
+
+    assert books.delete_log(pay)                        # 刪除沖銷日誌：沖銷串聯刪除，項目恢復未結
+    assert outstanding(books, a) == 100 and outstanding(books, b) == 80
+    assert_outstanding_matches(db)
+    assert books.delete_log(a)                          # 刪除項目日誌
+    assert_outstanding_matches(db)
+    assert books.outstanding_balances() == [
+        {"direction": "Receivable", "counterparty": "ACME", "outstanding": 80.0, "count": 1},
+    ]
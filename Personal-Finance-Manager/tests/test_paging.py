@@ -0,0 +1,64 @@
+"""keyset 分頁：逐頁取完的結果必須與一次查詢相同（含排序欄位為 NULL 的日誌）"""
+from dataBase.AsyncFinanceDB import AsyncFinanceDB, AsyncFinanceService
+from dataBase.FinanceDB import Direction, SortField
+from datetime import datetime, timedelta
+from sqlalchemy import text
+import asyncio
+import pytest
+
+
+def seed_with_nulls(service):
+    """10 筆日誌，部分的類別、方向、金額、時間為 NULL，且有重複的排序值"""
+    service.add_category("Food", Direction.Expenditure)
+    service.add_category("Salary", Direction.Income)
+    for i in range(10):
+        service.add_log("Food" if i % 3 else "Salary", 10 + i % 4, note=f"log {i}",
+                        actuall_time=datetime(2025, 1, 1) + timedelta(days=i % 5))
+    service.db.session.execute(text("UPDATE finance_log SET category_id = NULL WHERE id IN (1, 2)"))
+    service.db.session.execute(text("UPDATE finance_log SET actual_type = NULL WHERE id IN (3, 7)"))
+    service.db.session.execute(text("UPDATE finance_log SET amount = NULL WHERE id IN (4, 9)"))
+    service.db.session.execute(text("UPDATE finance_log SET timestamp = NULL WHERE id IN (5, 6)"))
+    service.db.session.commit()
+
+
+def collect_pages(service, sort_by: SortField, reverse: bool, limit: int) -> list[int]:
+    ids, after = [], None
+    while True:
+        page = service.get_logs_page(limit=limit, after=after, sort_by=sort_by, reverse=reverse)
+        ids += [log["id"] for log in page["items"]]
+        after = page["next_after"]
+        if after is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3])
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("sort_by", list(SortField))
+def test_pages_cover_all_rows(service, sort_by, reverse, limit):
+    seed_with_nulls(service)
+    expected = [log["id"] for log in service.get_filtered_and_sorted_logs(sort_by=sort_by, reverse=reverse)]
+    assert len(expected) == 10
+    assert collect_pages(service, sort_by, reverse, limit) == expected
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("sort_by", [SortField.CATEGORY, SortField.TIMESTAMP])
+def test_async_pages_cover_all_rows(service, sort_by, reverse):
+    seed_with_nulls(service)
+    expected = [log["id"] for log in service.get_filtered_and_sorted_logs(sort_by=sort_by, reverse=reverse)]
+
+    async def collect() -> list[int]:
+        db = AsyncFinanceDB(db_url=service.db.engine.url.set(drivername="sqlite+aiosqlite"))
+        async_service = AsyncFinanceService(db)
+        ids, after = [], None
+        try:
+            while True:
+                page = await async_service.get_logs_page(limit=3, after=after, sort_by=sort_by, reverse=reverse)
+                ids += [log["id"] for log in page["items"]]
+                after = page["next_after"]
+                if after is None:
+                    return ids
+        finally:
+            await async_service.close()
+
+    assert asyncio.run(collect()) == expected
@@ -0,0 +1,126 @@
+"""PostgresBackend：在暫時建立的資料庫上驗證升級、COPY 批次寫入、彙總觸發器、備註搜尋、餘額與分頁
+
+設定 FINANCE_TEST_PG_URL 為可建立資料庫的連接字串（例如 postgresql+psycopg2://postgres@localhost/postgres）；
+未設定或無法連線時略過。
+"""
+from dataBase.FinanceBackend import POSTGRES_TRIGGERS
+from dataBase.FinanceDB import Direction, FinanceDB, FinanceService, SortField
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from test_paging import collect_pages, seed_with_nulls
+import os
+import uuid
+import pytest
+
+
+@pytest.fixture
+def pg_url():
+    """每個測試一個新資料庫，結束後刪除"""
+    admin_url = os.environ.get("FINANCE_TEST_PG_URL")
+    if not admin_url:
+        pytest.skip("未設定 FINANCE_TEST_PG_URL")
+    admin = create_engine(admin_url, isolation_level="AUTOCOMMIT")
+    name = f"finance_test_{uuid.uuid4().hex[:12]}"
+    try:
+        with admin.connect() as conn:
+            conn.exec_driver_sql(f"CREATE DATABASE {name}")
+    except DBAPIError as e:
+        admin.dispose()
+        pytest.skip(f"無法連線 PostgreSQL：{e.orig}")
+    try:
+        yield make_url(admin_url).set(database=name)
+    finally:
+        with admin.connect() as conn:
+            conn.exec_driver_sql(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        admin.dispose()
+
+
+@pytest.fixture
+def pg_service(pg_url):
+    service = FinanceService(FinanceDB(db_url=pg_url), result_cache_size=0)
+    service.add_category("Food", Direction.Expenditure)
+    service.add_category("Salary", Direction.Income)
+    yield service
+    service.close()
+
+
+def test_migrate_installs_triggers_and_is_idempotent(pg_url):
+    for _ in range(2):
+        db = FinanceDB(db_url=pg_url)
+        try:
+            assert db.backend.name == "postgresql"
+            triggers = set(db.session.execute(text("SELECT tgname FROM pg_trigger WHERE NOT tgisinternal")).scalars())
+            assert set(POSTGRES_TRIGGERS) <= triggers
+        finally:
+            db.close()
+
+
+def test_bulk_insert_keeps_order_and_import_hash(pg_service):
+    logs = [
+        {"category_name": "Food", "amount": i + 0.25, "note": f"tab\tnote\\{i}" if i % 7 == 0 else None,
+         "actuall_time": datetime(2025, 1, 1) + timedelta(hours=i), "import_hash": f"{i:040x}"}
+        for i in range(1200)
+    ]
+    result = pg_service.add_logs_bulk(logs, chunk_size=500)
+    assert result["count"] == 1200
+    assert result["ids"] == sorted(result["ids"])
+    first, last = (pg_service.get_log_by_id(result["ids"][i]) for i in (0, -1))
+    assert (first["amount"], first["note"]) == (0.25, "tab\tnote\\0")
+    assert (last["amount"], last["note"]) == (1199.25, None)
+    hashes = {log["import_hash"] for log in logs}
+    assert pg_service.db.existing_import_hashes(hashes) == hashes
+
+
+def test_rollup_triggers_match_finance_log(pg_service):
+    def assert_rollup_matches():
+        for group in ("direction", "category", "day", "month"):
+            assert pg_service.db.sum_by(group) == pg_service.db.sum_by(group, use_rollup=False)
+
+    for i in range(30):
+        pg_service.add_log("Salary" if i % 5 == 0 else "Food", 10 + i, note=f"log {i}",
+                           actuall_time=datetime(2025, 1 + i % 3, 1 + i % 28))
+    assert_rollup_matches()
+    pg_service.db.update_logs_where({"category_id": pg_service.get_category("Food").id}, amount=3)
+    assert_rollup_matches()
+    pg_service.db.delete_logs_where({"note_keyword": "log 1"})
+    assert_rollup_matches()
+    assert pg_service.db.rebuild_rollups() > 0
+    assert_rollup_matches()
+
+
+def test_search_notes(pg_service):
+    for note in ("Coffee beans", "coffee shop", "Train ticket", "50%_off coffee"):
+        pg_service.add_log("Food", 5, note=note)
+    assert {r["note"] for r in pg_service.search_notes("coffee")} == {"Coffee beans", "coffee shop", "50%_off coffee"}
+    assert [r["note"] for r in pg_service.search_notes("coff* bean")] == ["Coffee beans"]
+    # LIKE 的萬用字元照字面比對
+    assert [r["note"] for r in pg_service.search_notes("50%_")] == ["50%_off coffee"]
+    with pytest.raises(ValueError):
+        pg_service.search_notes("  ")
+
+
+def test_balance_and_checkpoint_invalidation(pg_service):
+    for month in (1, 2, 3):
+        pg_service.add_log("Salary", 100, actuall_time=datetime(2025, month, 1))
+        pg_service.add_log("Food", 30, actuall_time=datetime(2025, month, 15))
+    assert pg_service.balance_at(datetime(2025, 4, 1)) == 210
+    assert pg_service.balance_at(datetime(2025, 3, 10)) == 240
+    # 回溯寫入：之後月份的檢查點由觸發器刪除
+    pg_service.add_log("Food", 50, actuall_time=datetime(2025, 1, 20))
+    assert pg_service.balance_at(datetime(2025, 4, 1)) == 160
+    assert pg_service.balance_at(datetime(2025, 4, 1)) == float(pg_service.db.balance_at(datetime(2025, 4, 1)))
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("sort_by", list(SortField))
+def test_pages_with_nulls(pg_url, sort_by, reverse):
+    service = FinanceService(FinanceDB(db_url=pg_url), result_cache_size=0)
+    try:
+        seed_with_nulls(service)
+        expected = [log["id"] for log in service.get_filtered_and_sorted_logs(sort_by=sort_by, reverse=reverse)]
+        assert len(expected) == 10
+        assert collect_pages(service, sort_by, reverse, 3) == expected
+    finally:
+        service.close()
@@ -0,0 +1,70 @@
+"""日誌列表的查詢計畫：每個 SortField × 過濾條件都必須走索引（EXPLAIN QUERY PLAN）"""
+from benchmarks.ledger import LedgerSpec, seed_service
+from dataBase.FinanceDB import Direction, FinanceDB, FinanceService, SortField
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import text
+import pytest
+
+FILTERS = {
+    "none": {},
+    "category": {"category_id": 1},
+    "direction": {"actual_type": Direction.Income},
+    "amount": {"min_amount": 100, "max_amount": 110},
+    "date": {"start_date": datetime(2024, 3, 1), "end_date": datetime(2024, 3, 2)},
+    "category+date": {"category_id": 1, "start_date": datetime(2024, 3, 1), "end_date": datetime(2024, 3, 8)},
+}
+
+# 過濾條件以等號固定排序欄位時，實際排序只剩 id
+PINNED = {SortField.CATEGORY: "category_id", SortField.DIRECTION: "actual_type"}
+
+
+def uses_index(plan: list[str], sort_by: SortField, filters: dict) -> bool:
+    """計畫中的 finance_log 都經由索引存取
+
+    依 id 排序時，依 rowid（主鍵）順序 SCAN 本身就是索引順序，LIMIT 之後即停止。
+    """
+    by_rowid = sort_by is SortField.ID or PINNED.get(sort_by) in filters
+    for step in plan:
+        if "finance_log" not in step or "USING" in step:
+            continue
+        if by_rowid and step == "SCAN finance_log":
+            continue
+        return False
+    return True
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    service = FinanceService(FinanceDB(db_url=f"sqlite:///{path}"), result_cache_size=0)
+    seed_service(service, LedgerSpec(logs=20_000, start=datetime(2024, 1, 1)))
+    service.db.session.execute(text("ANALYZE"))
+    yield service.db
+    service.close()
+
+
+@pytest.mark.parametrize("label", list(FILTERS))
+@pytest.mark.parametrize("sort_by", list(SortField))
+@pytest.mark.parametrize("reverse", [True, False])
+def test_log_listing_uses_index(db, sort_by, label, reverse):
+    filters = FILTERS[label]
+    plan = db.explain_query_plan(db.logs_query(sort_by, reverse, filters, limit=50))
+    assert uses_index(plan, sort_by, filters), " | ".join(plan)
+
+
+CURSORS = {
+    SortField.TIMESTAMP: datetime(2024, 6, 1),
+    SortField.AMOUNT: Decimal("50.00"),
+    SortField.ID: 5000,
+    SortField.CATEGORY: 3,
+    SortField.DIRECTION: Direction.Income,
+}
+
+
+@pytest.mark.parametrize("sort_by", list(SortField))
+@pytest.mark.parametrize("reverse", [True, False])
+def test_keyset_cursor_is_range_search(db, sort_by, reverse):
+    """深層頁數從游標位置開始範圍搜尋，不從頭掃描"""
+    plan = db.explain_query_plan(db.logs_query(sort_by, reverse, None, limit=50, after=(CURSORS[sort_by], 5000)))
+    assert plan[0].startswith("SEARCH finance_log"), " | ".join(plan)
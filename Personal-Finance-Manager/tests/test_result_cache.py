@@ -0,0 +1,131 @@
+"""查詢結果快取：寫入遞增 generation 並清空、TTL 過期、result_cache_size=0 停用、LRU 淘汰"""
+from dataBase import FinanceDB as finance_db
+from dataBase.FinanceDB import Direction, FinanceDB, FinanceService
+from datetime import datetime
+from sqlalchemy import text
+import pytest
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """以可手動推進的時鐘取代 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(finance_db.time, "monotonic", lambda: now[0])
+    return now
+
+
+def open_service(tmp_path, **kwargs):
+    service = FinanceService(FinanceDB(db_url=f"sqlite:///{tmp_path / 'cache.db'}"), **kwargs)
+    service.add_category("Food", Direction.Expenditure)
+    service.add_category("Salary", Direction.Income)
+    service.add_log("Salary", 100, actuall_time=datetime(2025, 1, 1))
+    service.add_log("Food", 30, actuall_time=datetime(2025, 1, 2))
+    return service
+
+
+def write_elsewhere(tmp_path, sql):
+    """另一個程序的寫入：不經過這個 FinanceService，generation 不會改變"""
+    db = FinanceDB(db_url=f"sqlite:///{tmp_path / 'cache.db'}")
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text(sql))
+    finally:
+        db.close()
+
+
+def expenditure(service) -> float:
+    return service.get_totals("direction").get("Expenditure", 0)
+
+
+def food_in_january(service) -> float:
+    return service.period_summary(2025)["2025-01"]["Expenditure Categories"].get("Food", 0)
+
+
+WRITES = {
+    "add_log": lambda s, log_id: s.add_log("Food", 5, actuall_time=datetime(2025, 1, 3)),
+    "update_log": lambda s, log_id: s.update_log(log_id, amount=35),
+    "delete_log": lambda s, log_id: s.delete_log(log_id),
+    "update_logs_where": lambda s, log_id: s.update_logs_where({"category_name": "Food"}, amount=40),
+    "delete_logs_where": lambda s, log_id: s.delete_logs_where({"category_name": "Food"}),
+    "delete_category": lambda s, log_id: s.delete_category("Food"),
+}
+
+
+@pytest.mark.parametrize("write", list(WRITES))
+def test_write_bumps_generation_and_invalidates(tmp_path, write):
+    service = open_service(tmp_path)
+    try:
+        food_id = service.get_filtered_and_sorted_logs(category_name="Food")[0]["id"]
+        before = (expenditure(service), food_in_january(service))
+        assert (expenditure(service), food_in_january(service)) == before
+        stats = service.result_cache_stats()
+        assert stats["hits"] == 2 and stats["size"] == 3  # 另含 get_filtered_and_sorted_logs
+
+        WRITES[write](service, food_id)
+        stats_after = service.result_cache_stats()
+        assert stats_after["generation"] > stats["generation"]
+        assert stats_after["size"] == 0
+        fresh = FinanceService(service.db, result_cache_size=0)
+        assert (expenditure(service), food_in_january(service)) == (expenditure(fresh), food_in_january(fresh))
+        assert (expenditure(service), food_in_january(service)) != before
+    finally:
+        service.close()
+
+
+def test_ttl_expires_entries(tmp_path, clock):
+    service = open_service(tmp_path, result_cache_ttl=5.0)
+    try:
+        assert expenditure(service) == 30
+        write_elsewhere(tmp_path, "UPDATE finance_log SET amount = 4500 WHERE actual_type = 'Expenditure'")
+        clock[0] += 4.9
+        # 其他程序的寫入：TTL 內仍回傳快取的結果
+        assert expenditure(service) == 30
+        clock[0] += 0.2
+        assert expenditure(service) == 45
+        stats = service.result_cache_stats()
+        assert stats["expirations"] == 1 and stats["hits"] == 1 and stats["misses"] == 2
+    finally:
+        service.close()
+
+
+def test_cache_size_zero_disables_cache(tmp_path):
+    service = open_service(tmp_path, result_cache_size=0)
+    try:
+        assert expenditure(service) == 30
+        write_elsewhere(tmp_path, "UPDATE finance_log SET amount = 4500 WHERE actual_type = 'Expenditure'")
+        assert expenditure(service) == 45
+        assert food_in_january(service) == 45
+        stats = service.result_cache_stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (0, 0, 0)
+    finally:
+        service.close()
+
+
+def test_results_are_copies_and_lru_evicts(tmp_path):
+    service = open_service(tmp_path, result_cache_size=2)
+    try:
+        service.get_totals("direction")["Expenditure"] = -1
+        assert expenditure(service) == 30
+        service.get_totals("category")
+        service.period_summary(2025)
+        stats = service.result_cache_stats()
+        assert stats["size"] == 2 and stats["evictions"] == 1
+        # 最久未使用的 direction 已被淘汰
+        expenditure(service)
+        assert service.result_cache_stats()["misses"] == stats["misses"] + 1
+    finally:
+        service.close()
+
+
+def test_result_computed_across_a_write_is_not_stored(tmp_path):
+    service = open_service(tmp_path)
+    try:
+        def compute():
+            # 查詢進行中有寫入
+            service._invalidate_results()
+            return "stale"
+
+        assert service._cached(("probe",), compute) == "stale"
+        assert service.result_cache_stats()["size"] == 0
+    finally:
+        service.close()
@@ -0,0 +1,73 @@
+"""daily_rollup：每種寫入之後，彙總表與直接掃描 finance_log 的結果相同"""
+from dataBase.FinanceDB import Direction
+from datetime import datetime, timedelta
+from sqlalchemy import text
+import pytest
+
+GROUPS = ("direction", "category", "month", ("category", "month"))
+
+
+def assert_rollup_matches(db):
+    """sum_by 走 daily_rollup 與走 finance_log 相同，且彙總表逐列等於 finance_log 的 GROUP BY"""
+    for group in GROUPS:
+        assert db.sum_by(group, use_rollup=True) == db.sum_by(group, use_rollup=False), group
+    stored = db.session.execute(text(
+        "SELECT day, category_id, actual_type, total, count FROM daily_rollup ORDER BY 1, 2, 3"
+    )).all()
+    scanned = db.session.execute(text(
+        "SELECT substr(timestamp, 1, 10), category_id, actual_type, SUM(COALESCE(amount, 0)), COUNT(*) "
+        "FROM finance_log GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+    )).all()
+    assert stored == scanned
+
+
+@pytest.fixture
+def ledger(service):
+    service.add_category("Food", Direction.Expenditure)
+    service.add_category("Rent", Direction.Expenditure)
+    service.add_category("Salary", Direction.Income)
+    return service
+
+
+def test_rollup_tracks_every_write(ledger):
+    db = ledger.db
+    food = ledger.add_log("Food", 12.5, note="lunch", actuall_time=datetime(2025, 1, 3, 12))
+    ledger.add_log("Salary", 3000, actuall_time=datetime(2025, 1, 5))
+    assert_rollup_matches(db)
+
+    ids = ledger.add_logs_bulk([
+        {"category_name": name, "amount": 10 + i, "actuall_time": datetime(2025, 1, 1) + timedelta(days=3 * i)}
+        for i, name in enumerate(["Food", "Rent", "Salary"] * 10)
+    ])["ids"]
+    assert_rollup_matches(db)
+
+    for change in (
+        {"amount": 99.99},
+        {"category_name": "Rent"},
+        {"actual_type": Direction.Income},
+        {"timestamp": datetime(2025, 3, 31, 23, 59)},
+        {"note": "only the note"},
+    ):
+        assert ledger.update_log(food["id"], **change) is not None
+        assert_rollup_matches(db)
+    ledger.update_log(ids[0], amount=1, category_name="Salary", actual_type=Direction.Income,
+                      timestamp=datetime(2025, 2, 1))
+    assert_rollup_matches(db)
+
+    assert ledger.delete_log(food["id"])
+    assert not ledger.delete_log(food["id"])
+    assert_rollup_matches(db)
+
+    assert ledger.delete_category("Rent")
+    assert db.session.execute(text("SELECT COUNT(*) FROM finance_log WHERE category_id IS NULL")).scalar() == 0
+    assert_rollup_matches(db)
+    assert {r[0] for r in db.sum_by("category")} == {"Food", "Salary"}
+
+
+def test_rebuild_rollups_matches(ledger):
+    for i in range(20):
+        ledger.add_log("Food", i + 1, actuall_time=datetime(2025, 1 + i % 6, 1 + i))
+    ledger.db.session.execute(text("DELETE FROM daily_rollup"))
+    ledger.db.session.commit()
+    assert ledger.db.rebuild_rollups() > 0
+    assert_rollup_matches(ledger.db)
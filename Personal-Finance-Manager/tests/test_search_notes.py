@@ -0,0 +1,90 @@
+"""search_notes：中文與英文備註的子字串搜尋，結果與 note_keyword 過濾一致"""
+from dataBase.FinanceDB import Direction, FinanceDB
+from sqlalchemy import text
+import sqlite3
+import pytest
+
+NOTES = [
+    "午餐 漢堡 可樂",
+    "麥當勞漢堡套餐加大可樂",
+    "晚餐牛肉麵",
+    "Coffee beans",
+    "coffee shop 咖啡",
+    "Train ticket",
+    "50%_off coffee",
+    None,
+]
+
+
+@pytest.fixture
+def seeded(service):
+    service.add_category("Food", Direction.Expenditure)
+    for note in NOTES:
+        service.add_log("Food", 10, note=note)
+    return service
+
+
+def notes(service, query: str) -> set:
+    return {r["note"] for r in service.search_notes(query, limit=None)}
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("漢堡", {"午餐 漢堡 可樂", "麥當勞漢堡套餐加大可樂"}),
+    ("可樂", {"午餐 漢堡 可樂", "麥當勞漢堡套餐加大可樂"}),
+    ("漢堡套餐", {"麥當勞漢堡套餐加大可樂"}),
+    ("牛肉麵", {"晚餐牛肉麵"}),
+    ("咖啡", {"coffee shop 咖啡"}),
+    ("coffee", {"Coffee beans", "coffee shop 咖啡", "50%_off coffee"}),
+    ("COFF* bean", {"Coffee beans"}),
+    ("coffee 咖啡", {"coffee shop 咖啡"}),
+    ("50%_", {"50%_off coffee"}),
+    ("壽司", set()),
+])
+def test_substring_matches(seeded, query, expected):
+    assert notes(seeded, query) == expected
+
+
+@pytest.mark.parametrize("keyword", ["漢堡", "可樂", "牛肉麵", "coffee"])
+def test_matches_note_keyword_filter(seeded, keyword):
+    """與既有的 note_keyword（ILIKE）過濾結果相同"""
+    by_filter = {log["note"] for log in seeded.get_filtered_and_sorted_logs(note_keyword=keyword)}
+    assert notes(seeded, keyword) == by_filter
+
+
+def test_rejects_empty_query(seeded):
+    with pytest.raises(ValueError):
+        seeded.search_notes("  * ")
+
+
+def test_index_follows_updates_and_deletes(seeded):
+    log_id = seeded.search_notes("牛肉麵")[0]["id"]
+    seeded.update_log(log_id, note="晚餐排骨飯")
+    assert notes(seeded, "牛肉麵") == set()
+    assert notes(seeded, "排骨飯") == {"晚餐排骨飯"}
+    seeded.db.delete_logs_where({"note_keyword": "排骨"})
+    assert notes(seeded, "排骨飯") == set()
+
+
+def test_unicode61_index_is_rebuilt_as_trigram(tmp_path):
+    """舊版 unicode61 索引在開啟資料庫時改為 trigram 並重建"""
+    path = tmp_path / "old.db"
+    db = FinanceDB(db_url=f"sqlite:///{path}")
+    db.create_category("Food", Direction.Expenditure)
+    db.close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE finance_log_fts")
+    conn.execute(
+        "CREATE VIRTUAL TABLE finance_log_fts USING fts5("
+        "note, content='finance_log', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    conn.execute("INSERT INTO finance_log (category_id, amount, note) VALUES (1, 100, '午餐漢堡')")
+    conn.commit()
+    conn.close()
+
+    db = FinanceDB(db_url=f"sqlite:///{path}")
+    try:
+        sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'finance_log_fts'")).scalar()
+        assert "trigram" in sql
+        assert [r.note for r in db.search_notes("午餐漢堡")] == ["午餐漢堡"]
+    finally:
+        db.close()
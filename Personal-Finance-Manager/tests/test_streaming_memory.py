@@ -0,0 +1,64 @@
+"""串流匯出的記憶體峰值不隨筆數成長（tracemalloc）"""
+from benchmarks.ledger import LedgerSpec, seed_service
+from dataBase.FinanceDB import FinanceDB, FinanceService
+import tracemalloc
+import pytest
+
+SMALL, LARGE = 2_000, 20_000
+# 筆數為 10 倍時，串流路徑的峰值最多只能多這麼多（MB）
+SLACK_MB = 0.5
+
+
+def peak_mb(fn) -> float:
+    """執行 fn，回傳 tracemalloc 峰值（MB）"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+@pytest.fixture(scope="module")
+def services(tmp_path_factory):
+    """{筆數: FinanceService}"""
+    root = tmp_path_factory.mktemp("memory")
+    result = {}
+    for n in (SMALL, LARGE):
+        service = FinanceService(FinanceDB(db_url=f"sqlite:///{root / f'{n}.db'}"), result_cache_size=0)
+        seed_service(service, LedgerSpec(logs=n))
+        service.db.session.expunge_all()
+        result[n] = service
+    yield result
+    for service in result.values():
+        service.close()
+
+
+def export_to(path, fmt):
+    def run(service):
+        with open(path, "w", encoding="utf-8", newline="") as fp:
+            run.count = service.export_logs(fp, fmt=fmt, batch_size=500)
+    return run
+
+
+def iterate_orm(service):
+    for _log in service.db.iter_logs(batch_size=500):
+        pass
+
+
+@pytest.mark.parametrize("path", ["csv", "jsonl", "orm"])
+def test_streaming_peak_is_flat(services, tmp_path, path):
+    run = iterate_orm if path == "orm" else export_to(tmp_path / f"export.{path}", path)
+    peaks = {}
+    for n, service in services.items():
+        peaks[n] = peak_mb(lambda: run(service))
+        if path != "orm":
+            assert run.count == n
+    assert peaks[LARGE] <= peaks[SMALL] + SLACK_MB, peaks
+
+
+def test_list_path_grows(services):
+    """對照組：一次載入清單的峰值隨筆數成長，確認量測有效"""
+    peaks = {n: peak_mb(service.get_filtered_and_sorted_logs) for n, service in services.items()}
+    assert peaks[LARGE] > peaks[SMALL] * 5, peaks